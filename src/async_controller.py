@@ -0,0 +1,219 @@
+import asyncio
+import functools
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from src.check_list import CheckList
+from src.task import Task
+from src.task_controller import DEFAULT_EXPORT_PAGE_SIZE, TaskController
+
+DEFAULT_READERS = 4
+DEFAULT_MAX_GROUP = 500  # Writes committed together at most
+
+
+class AsyncTaskController(object):
+    """
+    asyncio front of a TaskController. Reads run on a thread pool over the
+    controller's read-only connections. Writes are queued and run on one
+    writer thread: every write that arrives while a group is being written
+    joins the next group, which is committed once. Under load many writes
+    share one commit; a lone write is committed immediately.
+    """
+
+    def __init__(
+        self,
+        task_controller: TaskController = None,
+        readers: int = DEFAULT_READERS,
+        max_group: int = DEFAULT_MAX_GROUP,
+    ):
+        """
+
+        :param task_controller: Controller to wrap, by default a new one
+            without read cache
+        :param readers: Threads and read-only connections used for reads
+        :param max_group: Maximum number of writes per commit
+        """
+        self.task_controller = task_controller or TaskController(cache_size=0)
+        self._readers = readers
+        self._max_group = max_group
+        self._read_executor = ThreadPoolExecutor(readers, "TasksRead")
+        self._write_executor = ThreadPoolExecutor(1, "TasksWrite")
+        # (method, arguments, future) of the writes waiting for a group
+        self._pending = []  # type: List[Tuple[Callable, tuple, asyncio.Future]]
+        self._writer = None  # type: Optional[asyncio.Task]
+        self.groups = 0
+        self.writes = 0
+
+    async def create_connection(
+        self, database_url: str, wal: bool = True, in_memory: bool = False
+    ) -> None:
+        """
+        Open the database with a pool of read-only connections.
+        :param database_url: Path of the database file
+        :param wal: Use the write-ahead log so that reads do not wait for writes
+        :param in_memory: Serve the database from memory without a pool, see
+            TaskController.create_connection
+        :return: None
+        """
+        await self._run(
+            self._write_executor,
+            self.task_controller.create_connection,
+            database_url,
+            wal=wal,
+            readers=self._readers,
+            in_memory=in_memory,
+        )
+
+    async def close_connection(self) -> None:
+        """
+        Wait for the queued writes, then close the database and the threads.
+        :return: None
+        """
+        while self._writer is not None:
+            await asyncio.shield(self._writer)
+        await self._run(self._write_executor, self.task_controller.close_connection)
+        self._read_executor.shutdown()
+        self._write_executor.shutdown()
+
+    @staticmethod
+    async def _run(executor: ThreadPoolExecutor, function: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if kwargs:
+            function = functools.partial(function, **kwargs)
+        return await loop.run_in_executor(executor, function, *args)
+
+    def _read(self, function: Callable, *args):
+        return self._run(self._read_executor, function, *args)
+
+    def _write(self, method: Callable, *args) -> asyncio.Future:
+        """
+        Queue a write for the next group commit.
+        :param method: TaskController method returning (Error, Message, ...)
+        :param args: Arguments of the method
+        :return: Future of the method's result
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((method, args, future))
+        if self._writer is None:
+            self._writer = asyncio.ensure_future(self._write_groups())
+        return future
+
+    async def _write_groups(self) -> None:
+        """
+        Write the queued writes group by group until the queue is empty.
+        :return: None
+        """
+        try:
+            while self._pending:
+                group = self._pending[: self._max_group]
+                del self._pending[: self._max_group]
+                try:
+                    results = await self._run(
+                        self._write_executor, self._write_group, group
+                    )
+                except Exception as e:
+                    # Fail this group's writes and go on with the queue
+                    for _, _, future in group:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                self.groups += 1
+                self.writes += len(group)
+                for (_, _, future), result in zip(group, results):
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self._writer = None
+
+    def _write_group(
+        self, group: List[Tuple[Callable, tuple, asyncio.Future]]
+    ) -> list:
+        """
+        Run the writes of a group in one transaction, on the writer thread.
+        A write that fails returns its error without affecting the others;
+        one that raises, e.g. on a field of the wrong type, is rolled back to
+        its savepoint and returns the exception as its error. If the commit
+        fails, every write of the group returns its error.
+        :param group: (method, arguments, future) of each write
+        :return: Result of each write
+        """
+        try:
+            with self.task_controller.transaction():
+                results = []
+                for method, args, _ in group:
+                    try:
+                        with self.task_controller.transaction():
+                            results.append(method(*args))
+                    except Exception as e:
+                        results.append((1, "Internal error: {0}".format(e)))
+                return results
+        except sqlite3.Error as e:
+            return [(1, "Database error: {0}".format(e))] * len(group)
+
+    async def add_task(self, task: Task) -> Tuple[int, str]:
+        """
+        Insert the task and set its tid.
+        :param task: Task object
+        :return: Tuple[Error, Message]
+        """
+        return await self._write(self.task_controller.add_task, task)
+
+    async def update_task(self, task: Task) -> Tuple[int, str]:
+        """
+        Write the fields of the task that changed since it was read.
+        :param task: Task object
+        :return: Tuple[Error, Message], the error is NOT_FOUND if the task
+            does not exist
+        """
+        return await self._write(self.task_controller.update_task, task)
+
+    async def add_check_list(self, check_list: CheckList) -> Tuple[int, str]:
+        """
+        Insert the check list and set its cid.
+        :param check_list: CheckList object
+        :return: Tuple[Error, Message]
+        """
+        return await self._write(self.task_controller.add_check_list, check_list)
+
+    async def get_tasks(self, check_list_id: int) -> Tuple[int, str, List[Task]]:
+        """
+
+        :param check_list_id: ID of the check list
+        :return: Tuple[Error, Message, Tasks]
+        """
+        return await self._read(self.task_controller.get_tasks, check_list_id)
+
+    async def get_check_lists(
+        self, with_counts: bool = False
+    ) -> Tuple[int, str, List[CheckList]]:
+        """
+
+        :param with_counts: Also read total, done and overdue counts
+        :return: Tuple[Error, Message, CheckLists]
+        """
+        return await self._read(self.task_controller.get_check_lists, with_counts)
+
+    async def iter_task_rows(
+        self, check_list_id: int = None, page_size: int = DEFAULT_EXPORT_PAGE_SIZE
+    ) -> AsyncIterator[List[tuple]]:
+        """
+        Read every task, or the tasks of one check list, page by page in ID
+        order without holding a read transaction between pages. Database
+        errors are raised as sqlite3.Error.
+        :param check_list_id: ID of the check list or None for all tasks
+        :param page_size: Number of rows per page
+        :return: Async iterator of lists of
+            (ID, check list name, description, dueDate, done)
+        """
+        rows = self.task_controller.iter_task_rows(check_list_id, page_size)
+
+        def next_page() -> List[tuple]:
+            return list(islice(rows, page_size))
+
+        while True:
+            page = await self._read(next_page)
+            if not page:
+                return
+            yield page
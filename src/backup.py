@@ -0,0 +1,266 @@
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+DEFAULT_BACKUP_PAGES = 1024  # Pages copied per step
+DEFAULT_BACKUP_SLEEP = 0.005  # Seconds between steps, lets writers in
+DEFAULT_KEEP = 7  # Snapshots kept by the rotation
+SNAPSHOT_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+# Called with (pages copied, total pages) after every step
+Progress = Callable[[int, int], None]
+
+
+class BackupCancelled(Exception):
+    """
+    Raised inside the copy loop to stop a cancelled backup.
+    """
+
+
+def snapshot_name(database_url: str, timestamp: float = None) -> str:
+    """
+
+    :param database_url: Path of the database file
+    :param timestamp: Time of the snapshot, defaults to now
+    :return: File name such as pytasks-20240101-120000-123456.db, with
+        microseconds so backups within one second do not overwrite each other
+    """
+    stem = Path(database_url).stem if database_url != ":memory:" else "memory"
+    if timestamp is None:
+        timestamp = time.time()
+    moment = time.strftime(SNAPSHOT_TIME_FORMAT, time.localtime(timestamp))
+    microseconds = int(timestamp % 1 * 1000000)
+    return "{0}-{1}-{2:06d}.db".format(stem, moment, microseconds)
+
+
+def list_snapshots(directory: str, database_url: str) -> List[str]:
+    """
+
+    :param directory: Backup directory
+    :param database_url: Path of the database file
+    :return: Paths of the database's snapshots, oldest first
+    """
+    stem = Path(database_url).stem if database_url != ":memory:" else "memory"
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(
+        name
+        for name in os.listdir(directory)
+        if name.startswith(stem + "-") and name.endswith(".db")
+    )
+    return [os.path.join(directory, name) for name in names]
+
+
+def rotate_snapshots(directory: str, database_url: str, keep: int) -> List[str]:
+    """
+    Delete all but the newest keep snapshots.
+    :param directory: Backup directory
+    :param database_url: Path of the database file
+    :param keep: Number of snapshots kept, 0 keeps all
+    :return: Paths of the deleted snapshots
+    """
+    if keep <= 0:
+        return []
+    removed = list_snapshots(directory, database_url)[:-keep]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def copy_database(
+    source: sqlite3.Connection,
+    target_path: str,
+    pages: int = DEFAULT_BACKUP_PAGES,
+    progress: Progress = None,
+    sleep: float = DEFAULT_BACKUP_SLEEP,
+    cancelled: threading.Event = None,
+) -> None:
+    """
+    Copy a database page by page with the backup API into a new file. The
+    copy is written under a temporary name and renamed when complete, so a
+    failed or cancelled backup never leaves a partial snapshot behind.
+    :param source: Connection to copy from
+    :param target_path: Path of the snapshot
+    :param pages: Pages copied per step
+    :param progress: Optional progress callback
+    :param sleep: Seconds to sleep between steps
+    :param cancelled: Event that stops the copy when set
+    :return: None
+    """
+    partial_path = target_path + ".partial"
+
+    def on_step(_, remaining: int, total: int) -> None:
+        if cancelled is not None and cancelled.is_set():
+            raise BackupCancelled()
+        if progress:
+            progress(total - remaining, total)
+
+    target = sqlite3.connect(partial_path)
+    try:
+        source.backup(target, pages=pages, progress=on_step, sleep=sleep)
+    except BaseException:
+        target.close()
+        os.remove(partial_path)
+        raise
+    target.close()
+    os.replace(partial_path, target_path)
+
+
+class BackupJob(object):
+    """
+    Backup running on a background thread. How the copy stays consistent
+    depends on the source open_source returns: a WAL mode source holding a
+    read transaction pins one snapshot, so concurrent writes neither wait
+    for the backup nor restart it; without one the backup API restarts the
+    copy whenever the database changes.
+    """
+
+    def __init__(
+        self,
+        open_source: Callable[[], Tuple[sqlite3.Connection, Callable[[], None]]],
+        target_path: str,
+        pages: int = DEFAULT_BACKUP_PAGES,
+        progress: Progress = None,
+        sleep: float = DEFAULT_BACKUP_SLEEP,
+        on_done: Callable[["BackupJob"], None] = None,
+    ):
+        """
+
+        :param open_source: Returns the connection to copy from and a function
+            releasing it
+        :param target_path: Path of the snapshot
+        :param pages: Pages copied per step
+        :param progress: Optional progress callback, called on the backup thread
+        :param sleep: Seconds to sleep between steps
+        :param on_done: Optional callback run on the backup thread at the end
+        """
+        self.target_path = target_path
+        self._open_source = open_source
+        self._pages = pages
+        self._progress = progress
+        self._sleep = sleep
+        self._on_done = on_done
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self.copied = 0
+        self.total = 0
+        self.result = None  # type: Optional[Tuple[int, str]]
+        self._thread = threading.Thread(
+            target=self._run, name="TasksBackup", daemon=True
+        )
+
+    def start(self) -> "BackupJob":
+        """
+
+        :return: self
+        """
+        self._thread.start()
+        return self
+
+    @property
+    def done(self) -> bool:
+        """
+
+        :return: Whether the backup finished, failed or was cancelled
+        """
+        return self._done.is_set()
+
+    def cancel(self) -> None:
+        """
+        Stop the copy after the current step.
+        :return: None
+        """
+        self._cancelled.set()
+
+    def wait(self, timeout: float = None) -> Optional[Tuple[int, str]]:
+        """
+
+        :param timeout: Seconds to wait, None waits until done
+        :return: Tuple[Error, Message] or None if still running
+        """
+        self._done.wait(timeout)
+        return self.result
+
+    def _on_progress(self, copied: int, total: int) -> None:
+        self.copied, self.total = copied, total
+        if self._progress:
+            self._progress(copied, total)
+
+    def _run(self) -> None:
+        try:
+            source, release = self._open_source()
+            try:
+                copy_database(
+                    source,
+                    self.target_path,
+                    pages=self._pages,
+                    progress=self._on_progress,
+                    sleep=self._sleep,
+                    cancelled=self._cancelled,
+                )
+            finally:
+                release()
+            self.result = 0, self.target_path
+        except BackupCancelled:
+            self.result = 1, "The backup was cancelled."
+        except Exception as e:
+            # Also errors of the progress callback, so wait() never hangs
+            self.result = 1, "Backup failed: {0}".format(e)
+        finally:
+            if self.result is None:
+                self.result = 1, "The backup was interrupted."
+            try:
+                if self._on_done:
+                    self._on_done(self)
+            finally:
+                self._done.set()
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    python -m src.backup backup|restore|list ...
+    :param argv: Command line arguments
+    :return: Exit status
+    """
+    from src.task_controller import TaskController
+
+    parser = argparse.ArgumentParser(prog="python -m src.backup")
+    parser.add_argument("--database", default="pytasks.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backup = commands.add_parser("backup", help="Write a snapshot")
+    backup.add_argument("directory")
+    backup.add_argument("--keep", type=int, default=DEFAULT_KEEP)
+    backup.add_argument("--pages", type=int, default=DEFAULT_BACKUP_PAGES)
+    restore = commands.add_parser("restore", help="Replace the database")
+    restore.add_argument("snapshot")
+    listing = commands.add_parser("list", help="List the snapshots")
+    listing.add_argument("directory")
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "list":
+        for path in list_snapshots(arguments.directory, arguments.database):
+            print(path)
+        return 0
+
+    task_controller = TaskController(cache_size=0)
+    task_controller.create_connection(arguments.database, wal=True)
+    try:
+        if arguments.command == "backup":
+            err, message = task_controller.backup(
+                arguments.directory, pages=arguments.pages, keep=arguments.keep
+            ).wait()
+        else:
+            err, message = task_controller.restore(arguments.snapshot)
+    finally:
+        task_controller.close_connection()
+    print(message or "Restored {0}.".format(arguments.snapshot), file=sys.stderr)
+    return err
+
+
+if __name__ == "__main__":
+    sys.exit(main())
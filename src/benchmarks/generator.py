@@ -0,0 +1,112 @@
+import os
+import random
+from datetime import date, timedelta
+from itertools import islice
+from typing import Iterator
+
+from src.check_list import CheckList
+from src.task import Task
+from src.task_controller import TaskController
+
+DEFAULT_SEED = 1
+DEFAULT_CHECK_LISTS = 100
+DEFAULT_DONE_RATIO = 0.3
+DEFAULT_DUE_RATIO = 0.8
+INSERT_BATCH = 100000  # Tasks per add_tasks call, bounds the returned ID lists
+FIRST_DUE_DATE = date(2024, 1, 1)
+DUE_DATE_SPAN = 730  # Days
+
+WORDS = (
+    "buy call email write review fix plan book clean pay order send read "
+    "update check prepare schedule renew cancel print sign return pick "
+    "milk bread report invoice doctor dentist car tyres garden budget "
+    "slides meeting tickets passport insurance taxes laundry groceries "
+    "birthday present backup server release notes contract landlord"
+).split()
+
+
+def generate_tasks(
+    count: int,
+    check_lists: int,
+    seed: int = DEFAULT_SEED,
+    done_ratio: float = DEFAULT_DONE_RATIO,
+    due_ratio: float = DEFAULT_DUE_RATIO,
+) -> Iterator[Task]:
+    """
+    Deterministic stream of tasks spread evenly over check list IDs
+    1..check_lists. The same arguments always give the same tasks.
+    :param count: Number of tasks
+    :param check_lists: Number of check lists
+    :param seed: Random seed
+    :param done_ratio: Share of done tasks
+    :param due_ratio: Share of tasks with a due date
+    :return: Iterator of Task objects without tid
+    """
+    rng = random.Random(seed)
+    for index in range(count):
+        description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6)))
+        due_date = ""
+        if rng.random() < due_ratio:
+            due_date = (
+                FIRST_DUE_DATE + timedelta(days=rng.randrange(DUE_DATE_SPAN))
+            ).isoformat()
+        yield Task(
+            description=description,
+            due_date=due_date,
+            check_list_id=index % check_lists + 1,
+            done=rng.random() < done_ratio,
+        )
+
+
+def database_name(tasks: int, check_lists: int, seed: int) -> str:
+    """
+
+    :param tasks: Number of tasks
+    :param check_lists: Number of check lists
+    :param seed: Random seed
+    :return: File name identifying the generated data set
+    """
+    return "tasks-{0}-{1}-{2}.db".format(tasks, check_lists, seed)
+
+
+def generate_database(
+    directory: str,
+    tasks: int,
+    check_lists: int = DEFAULT_CHECK_LISTS,
+    seed: int = DEFAULT_SEED,
+) -> str:
+    """
+    Build a database with the generated data set, or reuse the one built
+    earlier with the same arguments. The file is built under a temporary
+    name and renamed when complete, so an interrupted run is never reused.
+    :param directory: Directory of the database files
+    :param tasks: Number of tasks
+    :param check_lists: Number of check lists
+    :param seed: Random seed
+    :return: Path of the database
+    """
+    path = os.path.join(directory, database_name(tasks, check_lists, seed))
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    partial_path = path + ".partial"
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+    task_controller = TaskController(cache_size=0)
+    task_controller.create_connection(partial_path)
+    error, message, _ = task_controller.add_check_lists(
+        CheckList(name="List {0}".format(number), description="")
+        for number in range(1, check_lists + 1)
+    )
+    generated = generate_tasks(tasks, check_lists, seed)
+    while not error:
+        batch = list(islice(generated, INSERT_BATCH))
+        if not batch:
+            break
+        error, message, _ = task_controller.add_tasks(batch, bulk=True)
+    task_controller.close_connection()
+    if error:
+        raise RuntimeError(message)
+    os.replace(partial_path, path)
+    return path
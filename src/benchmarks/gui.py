@@ -0,0 +1,221 @@
+import os
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from src.task_controller import TaskController
+
+CANVAS_WIDTH = 800
+CANVAS_HEIGHT = 600
+
+
+class InlineDispatcher(object):
+    """
+    Stand-in for gui.dispatcher.Dispatcher that queues calls and runs them
+    on the calling thread when drained, so a benchmark times the work and
+    not the polling interval.
+    """
+
+    def __init__(self):
+        self._requests = []
+
+    @property
+    def pending(self) -> int:
+        return len(self._requests)
+
+    def submit(self, function: Callable, *args, callback: Callable = None, **kwargs):
+        self._requests.append((function, args, kwargs, callback))
+
+    def post(self, callback: Callable, value) -> None:
+        callback(value)
+
+    def drain(self) -> None:
+        """
+        Run the queued calls, including the ones their callbacks submit.
+        :return: None
+        """
+        while self._requests:
+            function, args, kwargs, callback = self._requests.pop(0)
+            result = function(*args, **kwargs)
+            if callback:
+                callback(result)
+
+    def close(self) -> None:
+        self._requests.clear()
+
+
+class FakeCanvas(object):
+    """
+    Records canvas items without drawing, for machines without a display.
+    """
+
+    def __init__(self, width: int = CANVAS_WIDTH, height: int = CANVAS_HEIGHT):
+        self._width = width
+        self._height = height
+        self._top = 0
+        self._items = {}
+        self._next_item = 0
+
+    def winfo_width(self) -> int:
+        return self._width
+
+    def winfo_height(self) -> int:
+        return self._height
+
+    def configure(self, **options) -> None:
+        pass
+
+    def canvasy(self, y: float) -> float:
+        return self._top + y
+
+    def yview_moveto(self, fraction: float) -> None:
+        self._top = 0
+
+    def _create(self, options: dict) -> int:
+        self._next_item += 1
+        self._items[self._next_item] = options
+        return self._next_item
+
+    def create_window(self, position, **options) -> int:
+        return self._create(options)
+
+    def create_text(self, x, y, **options) -> int:
+        return self._create(options)
+
+    def delete(self, item: int) -> None:
+        self._items.pop(item, None)
+
+    def itemconfigure(self, item: int, **options) -> None:
+        self._items[item].update(options)
+
+    def coords(self, item: int, x: float, y: float) -> None:
+        pass
+
+
+class FakeTaskElement(object):
+    """
+    Row without a widget, bound the same way as gui.main.TaskElement.
+    """
+
+    def __init__(self, master, task_list, task=None):
+        self._task = None
+        if task is not None:
+            self.bind_task(task)
+
+    @property
+    def tid(self) -> Optional[int]:
+        return self._task.tid if self._task else None
+
+    def bind_task(self, task) -> None:
+        self._task = task
+
+    def show_placeholder(self) -> None:
+        self._task = None
+
+    def destroy(self) -> None:
+        pass
+
+
+def _headless_master_class(gui) -> type:
+    """
+    TasksGUI without its window: Tasks only calls the request methods and
+    bind_mousewheel on its master, and those only need the controller, the
+    selected check list and a dispatcher.
+    :param gui: The src.gui.main module
+    :return: Subclass of gui.TasksGUI
+    """
+
+    class HeadlessTasksGUI(gui.TasksGUI):
+        def __init__(self, task_controller: TaskController, check_list_id: int):
+            # tk.Frame.__init__ is skipped on purpose, no window is needed
+            self._task_controller = task_controller
+            self._selected_cid = check_list_id
+            self._dispatcher = InlineDispatcher()
+
+        @property
+        def dispatcher(self) -> InlineDispatcher:
+            return self._dispatcher
+
+        def bind_mousewheel(self, widget) -> None:
+            pass
+
+    return HeadlessTasksGUI
+
+
+class HeadlessTasksView(object):
+    """
+    gui.main.Tasks driven by an InlineDispatcher. Uses real Tk widgets when
+    a display is available (for example under Xvfb), fake ones otherwise.
+    """
+
+    def __init__(self, task_controller: TaskController, check_list_id: int):
+        """
+
+        :param task_controller: TaskController Object
+        :param check_list_id: Check list to show
+        """
+        from src.gui import main as gui
+
+        self._gui_module = gui
+        self._root = None
+        self.uses_display = bool(os.environ.get("DISPLAY"))
+        if self.uses_display:
+            self._root = gui.tk.Tk()
+            self._canvas = gui.tk.Canvas(
+                self._root, width=CANVAS_WIDTH, height=CANVAS_HEIGHT
+            )
+            self._canvas.pack()
+            self._root.update()
+            self._element_class = gui.TaskElement
+        else:
+            self._canvas = FakeCanvas()
+            self._element_class = FakeTaskElement
+
+        self._master = _headless_master_class(gui)(task_controller, check_list_id)
+        self.tasks = None
+
+    @contextmanager
+    def _row_class(self) -> Iterator[None]:
+        """
+        Let Tasks build its rows from the element class of this view.
+        :return: None
+        """
+        gui = self._gui_module
+        task_element, gui.TaskElement = gui.TaskElement, self._element_class
+        try:
+            yield
+        finally:
+            gui.TaskElement = task_element
+
+    def build(self) -> None:
+        """
+        Construct the view and load its first page.
+        :return: None
+        """
+        with self._row_class():
+            self.tasks = self._gui_module.Tasks(
+                master=self._master, canvas=self._canvas
+            )
+            self.tasks.refresh()
+            self._master.dispatcher.drain()
+
+    def refresh(self) -> None:
+        """
+        Reload the first page of the list.
+        :return: None
+        """
+        with self._row_class():
+            self.tasks.refresh()
+            self._master.dispatcher.drain()
+        if self._root:
+            self._root.update_idletasks()
+
+    def destroy(self) -> None:
+        """
+
+        :return: None
+        """
+        if self.tasks:
+            for row in self.tasks._rows:
+                row.destroy()
+        if self._root:
+            self._root.destroy()
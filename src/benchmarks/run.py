@@ -0,0 +1,385 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from typing import Callable, Dict, List, Tuple
+
+from src.benchmarks.generator import (
+    DEFAULT_CHECK_LISTS,
+    DEFAULT_SEED,
+    generate_database,
+    generate_tasks,
+)
+from src.task import Task
+from src.task_controller import TaskController
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.2  # Allowed slowdown against the baseline
+BULK_SIZE = 1000
+REFERENCE_DATE = date(2025, 1, 1)
+
+# Benchmark name -> (function(context) returning the timed callable, calls
+# per measurement). The timed callable runs `number` times per repeat.
+Benchmark = Tuple[Callable[["Context"], Callable[[], object]], int]
+
+
+class Context(object):
+    """
+    Open controllers on a working copy of a generated database.
+    """
+
+    def __init__(self, path: str, check_lists: int, seed: int):
+        """
+
+        :param path: Working copy of a generated database, may be written to
+        :param check_lists: Number of check lists in the database
+        :param seed: Random seed of the benchmark inputs
+        """
+        self.path = path
+        self.check_lists = check_lists
+        self.rng = random.Random(seed)
+        self.cached = TaskController()
+        self.cached.create_connection(path, wal=True, readers=2)
+        self.uncached = TaskController(cache_size=0)
+        self.uncached.create_connection(path, wal=True, readers=2)
+        self.check_list_id = 1
+        _, _, self.tasks = self.uncached.get_tasks(self.check_list_id)
+        # The generator inserts the tasks with consecutive IDs from 1
+        _, _, counts = self.uncached.get_check_lists(with_counts=True)
+        self.max_tid = sum(check_list.total for check_list in counts)
+
+    def random_tids(self, count: int) -> List[int]:
+        """
+
+        :param count: Number of task IDs
+        :return: Random existing task IDs
+        """
+        return [self.rng.randint(1, self.max_tid) for _ in range(count)]
+
+    def close(self) -> None:
+        """
+
+        :return: None
+        """
+        self.cached.close_connection()
+        self.uncached.close_connection()
+
+
+def _add_task(context: Context) -> Callable[[], object]:
+    def run():
+        context.uncached.add_task(
+            Task(description="benchmark task", check_list_id=context.check_list_id)
+        )
+
+    return run
+
+
+def _add_tasks(context: Context) -> Callable[[], object]:
+    seed = context.rng.randrange(1 << 30)
+    return lambda: context.uncached.add_tasks(
+        generate_tasks(BULK_SIZE, context.check_lists, seed)
+    )
+
+
+def _get_tasks(context: Context) -> Callable[[], object]:
+    return lambda: context.uncached.get_tasks(context.check_list_id)
+
+
+def _get_tasks_cached(context: Context) -> Callable[[], object]:
+    context.cached.get_tasks(context.check_list_id)
+    return lambda: context.cached.get_tasks(context.check_list_id)
+
+
+def _get_tasks_page(context: Context) -> Callable[[], object]:
+    return lambda: context.uncached.get_tasks_page(context.check_list_id)
+
+
+def _count_tasks(context: Context) -> Callable[[], object]:
+    return lambda: context.uncached.count_tasks(context.check_list_id)
+
+
+def _update_task(context: Context) -> Callable[[], object]:
+    task = context.tasks[len(context.tasks) // 2]
+
+    def run():
+        task.done = not task.done
+        context.uncached.update_task(task)
+
+    return run
+
+
+def _update_tasks(context: Context) -> Callable[[], object]:
+    tasks = context.tasks[:BULK_SIZE]
+
+    def run():
+        for task in tasks:
+            task.done = not task.done
+        context.uncached.update_tasks(tasks)
+
+    return run
+
+
+def _queue_update_task(context: Context) -> Callable[[], object]:
+    context.cached.enable_write_behind()
+    task = context.tasks[len(context.tasks) // 3]
+
+    def run():
+        task.done = not task.done
+        context.cached.queue_update_task(task)
+        context.cached.flush()
+
+    return run
+
+
+def _set_done(context: Context) -> Callable[[], object]:
+    tids = context.random_tids(BULK_SIZE)
+    state = [False]
+
+    def run():
+        state[0] = not state[0]
+        context.uncached.set_done(tids, state[0])
+
+    return run
+
+
+def _get_check_lists(context: Context) -> Callable[[], object]:
+    return lambda: context.uncached.get_check_lists()
+
+
+def _get_check_lists_with_counts(context: Context) -> Callable[[], object]:
+    return lambda: context.uncached.get_check_lists(
+        with_counts=True, today=REFERENCE_DATE
+    )
+
+
+def _search_tasks(context: Context) -> Callable[[], object]:
+    return lambda: context.uncached.search_tasks("invoice doc")
+
+
+def _get_overdue(context: Context) -> Callable[[], object]:
+    return lambda: context.uncached.get_overdue(today=REFERENCE_DATE, limit=100)
+
+
+def _get_task_batch(context: Context) -> Callable[[], object]:
+    return lambda: context.uncached.get_task_batch(context.check_list_id)
+
+
+def _gui_tasks_build(context: Context) -> Callable[[], object]:
+    from src.benchmarks.gui import HeadlessTasksView
+
+    def run():
+        view = HeadlessTasksView(context.cached, context.check_list_id)
+        view.build()
+        view.destroy()
+
+    return run
+
+
+def _gui_tasks_refresh(context: Context) -> Callable[[], object]:
+    from src.benchmarks.gui import HeadlessTasksView
+
+    view = HeadlessTasksView(context.cached, context.check_list_id)
+    view.build()
+    return view.refresh
+
+
+BENCHMARKS = {
+    "add_task": (_add_task, 20),
+    "add_tasks": (_add_tasks, 1),
+    "get_tasks": (_get_tasks, 1),
+    "get_tasks_cached": (_get_tasks_cached, 10),
+    "get_tasks_page": (_get_tasks_page, 10),
+    "count_tasks": (_count_tasks, 10),
+    "update_task": (_update_task, 20),
+    "update_tasks": (_update_tasks, 1),
+    "queue_update_task": (_queue_update_task, 20),
+    "set_done": (_set_done, 1),
+    "get_check_lists": (_get_check_lists, 10),
+    "get_check_lists_with_counts": (_get_check_lists_with_counts, 10),
+    "search_tasks": (_search_tasks, 10),
+    "get_overdue": (_get_overdue, 10),
+    "get_task_batch": (_get_task_batch, 1),
+    "gui_tasks_build": (_gui_tasks_build, 1),
+    "gui_tasks_refresh": (_gui_tasks_refresh, 10),
+}  # type: Dict[str, Benchmark]
+
+
+def measure(function: Callable[[], object], repeat: int, number: int) -> dict:
+    """
+    Time number calls of function, repeat times.
+    :param function: Callable to time
+    :param repeat: Number of measurements
+    :param number: Calls per measurement
+    :return: Dict of seconds per call: min, median, mean and max
+    """
+    function()  # Warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "max": max(timings),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def run_size(
+    data_directory: str,
+    tasks: int,
+    check_lists: int,
+    seed: int,
+    repeat: int,
+    names: List[str],
+) -> Dict[str, dict]:
+    """
+    Run the benchmarks on a fresh copy of the generated database of a size.
+    :param data_directory: Directory of the generated databases
+    :param tasks: Number of tasks
+    :param check_lists: Number of check lists
+    :param seed: Random seed
+    :param repeat: Number of measurements per benchmark
+    :param names: Benchmarks to run
+    :return: Dict of benchmark name -> timings
+    """
+    source = generate_database(data_directory, tasks, check_lists, seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as work_directory:
+        for name in names:
+            path = os.path.join(work_directory, "{0}.db".format(name))
+            shutil.copyfile(source, path)
+            factory, number = BENCHMARKS[name]
+            context = Context(path, check_lists, seed)
+            try:
+                results[name] = measure(factory(context), repeat, number)
+            finally:
+                context.close()
+    return results
+
+
+def compare(
+    results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD
+) -> List[str]:
+    """
+    Compare median timings against a baseline file's.
+    :param results: Results of this run
+    :param baseline: Results of an earlier run
+    :param threshold: Allowed relative slowdown, 0.2 allows 20 %
+    :return: Descriptions of the regressions
+    """
+    regressions = []
+    for size, timings in sorted(results["results"].items(), key=lambda i: int(i[0])):
+        for name, timing in sorted(timings.items()):
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not base or not base["median"]:
+                continue
+            ratio = timing["median"] / base["median"]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    "{0} with {1} tasks: {2:.3g} s -> {3:.3g} s ({4:+.0%})".format(
+                        name, size, base["median"], timing["median"], ratio - 1
+                    )
+                )
+    return regressions
+
+
+def parse_arguments(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.benchmarks.run",
+        description="Time the task controller and the task view on generated data.",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=list(DEFAULT_SIZES),
+        help="Comma separated numbers of tasks, e.g. 1000,100000,10000000",
+    )
+    parser.add_argument("--check-lists", type=int, default=DEFAULT_CHECK_LISTS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument(
+        "--benchmarks",
+        type=lambda value: value.split(","),
+        default=list(BENCHMARKS),
+        help="Comma separated benchmark names, all by default",
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=os.path.join(tempfile.gettempdir(), "tasks-benchmarks"),
+        help="Where generated databases are kept for reuse",
+    )
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> int:
+    """
+
+    :param argv: Command line arguments
+    :return: Exit status, 1 if a benchmark regressed against the baseline
+    """
+    arguments = parse_arguments(sys.argv[1:] if argv is None else argv)
+    unknown = set(arguments.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        print("Unknown benchmarks: {0}".format(", ".join(sorted(unknown))))
+        return 2
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "check_lists": arguments.check_lists,
+            "seed": arguments.seed,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    for size in arguments.sizes:
+        timings = run_size(
+            arguments.data_dir,
+            size,
+            arguments.check_lists,
+            arguments.seed,
+            arguments.repeat,
+            arguments.benchmarks,
+        )
+        results["results"][str(size)] = timings
+        for name, timing in timings.items():
+            print(
+                "{0:>10} {1:<28} {2:10.3f} ms".format(
+                    size, name, timing["median"] * 1000
+                )
+            )
+
+    with open(arguments.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            regressions = compare(results, json.load(file), arguments.threshold)
+        for regression in regressions:
+            print("Regression: {0}".format(regression))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
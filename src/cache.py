@@ -0,0 +1,442 @@
+import copy
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from src.changes import (
+    CHECK_LIST_DELETED,
+    RESET,
+    TASK_ADDED,
+    TASK_DELETED,
+    TASK_MOVED,
+    TASK_UPDATED,
+    Change,
+)
+from src.check_list import CheckList
+from src.locking import synchronized
+from src.task import Task
+
+DEFAULT_CACHE_SIZE = 32 * 1024 * 1024  # Bytes
+ROW_OVERHEAD = 200  # Estimated bytes per cached object besides its strings
+
+CHECK_LISTS_KEY = ("check_lists",)
+
+
+def _task_size(task: Task) -> int:
+    return ROW_OVERHEAD + len(task.description) + len(task.due_date or "")
+
+
+def _tid(task: Task) -> int:
+    return task.tid
+
+
+def _copy_tasks(tasks: Iterable[Task]) -> List[Task]:
+    return [copy.copy(task) for task in tasks]
+
+
+class TaskCache(object):
+    """
+    LRU cache of task snapshots and the check list catalog, bounded by an
+    estimate of the memory it holds.
+
+    Entries per check list:
+        ("tasks", cid): Every task of the list ordered by tid
+        ("page", cid, after_tid, page_size): One page and its token
+        ("count", cid): Number of tasks in the list
+
+    Callers get copies, so mutating a returned Task never changes the cache.
+    The cache is thread-safe. Every change bumps its generation; a reader
+    that started before a change passes the generation it saw to the put
+    methods so that its possibly stale result is not stored.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        """
+
+        :param max_size: Memory budget in bytes
+        """
+        self._max_size = max_size
+        self._size = 0
+        self._entries = OrderedDict()  # type: OrderedDict[Hashable, tuple]
+        self._keys_by_cid = {}  # type: Dict[int, Set[Hashable]]
+        self._generation = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        """
+
+        :return: Number of changes seen by the cache
+        """
+        return self._generation
+
+    def _is_stale(self, generation: Optional[int]) -> bool:
+        return generation is not None and generation != self._generation
+
+    @property
+    def size(self) -> int:
+        """
+
+        :return: Estimated bytes held
+        """
+        return self._size
+
+    @synchronized
+    def stats(self) -> Dict[str, int]:
+        """
+
+        :return: Dict with hits, misses, entries and size
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "size": self._size,
+        }
+
+    @synchronized
+    def clear(self) -> None:
+        """
+
+        :return: None
+        """
+        self._entries.clear()
+        self._keys_by_cid.clear()
+        self._size = 0
+        self._generation += 1
+
+    def _get(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _put(self, key: Hashable, value, size: int, cid: int = None) -> None:
+        self._discard(key)
+        if size > self._max_size:
+            return
+        self._entries[key] = (value, size)
+        self._size += size
+        if cid is not None:
+            self._keys_by_cid.setdefault(cid, set()).add(key)
+        while self._size > self._max_size:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry[1]
+        if len(key) > 1:
+            keys = self._keys_by_cid.get(key[1])
+            if keys:
+                keys.discard(key)
+
+    def _resize(self, key: Hashable, delta: int) -> None:
+        value, size = self._entries[key]
+        self._entries[key] = (value, size + delta)
+        self._size += delta
+
+    @synchronized
+    def get_tasks(self, cid: int) -> Optional[List[Task]]:
+        """
+
+        :param cid: Check list ID
+        :return: Copy of every task of the list or None on a miss
+        """
+        tasks = self._get(("tasks", cid))
+        if tasks is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _copy_tasks(tasks)
+
+    @synchronized
+    def put_tasks(self, cid: int, tasks: List[Task], generation: int = None) -> None:
+        """
+
+        :param cid: Check list ID
+        :param tasks: Every task of the list
+        :param generation: Generation seen before the tasks were read
+        :return: None
+        """
+        if self._is_stale(generation):
+            return
+        tasks = sorted(_copy_tasks(tasks), key=_tid)
+        size = ROW_OVERHEAD + sum(map(_task_size, tasks))
+        self._put(("tasks", cid), tasks, size, cid)
+
+    @synchronized
+    def get_page(
+        self, cid: int, after_tid: Optional[int], page_size: int
+    ) -> Optional[Tuple[List[Task], Optional[int]]]:
+        """
+        Serve a page from the list snapshot if there is one, otherwise from
+        the cached page.
+        :param cid: Check list ID
+        :param after_tid: Continuation token
+        :param page_size: Number of tasks in a page
+        :return: Tuple[Tasks, Token] or None on a miss
+        """
+        tasks = self._get(("tasks", cid))
+        if tasks is not None:
+            start = 0
+            if after_tid is not None:
+                start = bisect_right(tasks, after_tid, key=_tid)
+            page = tasks[start : start + page_size]
+        else:
+            cached = self._get(("page", cid, after_tid, page_size))
+            if cached is None:
+                self.misses += 1
+                return None
+            page = cached[0]
+        self.hits += 1
+        token = page[-1].tid if len(page) == page_size else None
+        return _copy_tasks(page), token
+
+    @synchronized
+    def put_page(
+        self,
+        cid: int,
+        after_tid: Optional[int],
+        page_size: int,
+        tasks: List[Task],
+        token: Optional[int],
+        generation: int = None,
+    ) -> None:
+        """
+        A first page that is not full holds the whole list and is stored as
+        the list snapshot.
+        :param cid: Check list ID
+        :param after_tid: Continuation token the page was read with
+        :param page_size: Number of tasks in a page
+        :param tasks: Tasks of the page
+        :param token: Continuation token of the page
+        :param generation: Generation seen before the page was read
+        :return: None
+        """
+        if self._is_stale(generation):
+            return
+        if after_tid is None and token is None:
+            self.put_tasks(cid, tasks)
+            return
+        size = ROW_OVERHEAD + sum(map(_task_size, tasks))
+        key = ("page", cid, after_tid, page_size)
+        self._put(key, (_copy_tasks(tasks), token), size, cid)
+
+    @synchronized
+    def get_count(self, cid: int) -> Optional[int]:
+        """
+
+        :param cid: Check list ID
+        :return: Number of tasks or None on a miss
+        """
+        tasks = self._get(("tasks", cid))
+        count = len(tasks) if tasks is not None else self._get(("count", cid))
+        if count is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return count
+
+    @synchronized
+    def put_count(self, cid: int, count: int, generation: int = None) -> None:
+        """
+
+        :param cid: Check list ID
+        :param count: Number of tasks
+        :param generation: Generation seen before the count was read
+        :return: None
+        """
+        if self._is_stale(generation):
+            return
+        self._put(("count", cid), count, ROW_OVERHEAD, cid)
+
+    @synchronized
+    def get_check_lists(self) -> Optional[List[CheckList]]:
+        """
+
+        :return: Copy of the check list catalog or None on a miss
+        """
+        check_lists = self._get(CHECK_LISTS_KEY)
+        if check_lists is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [copy.copy(check_list) for check_list in check_lists]
+
+    @synchronized
+    def put_check_lists(
+        self, check_lists: List[CheckList], generation: int = None
+    ) -> None:
+        """
+
+        :param check_lists: Every check list
+        :param generation: Generation seen before the check lists were read
+        :return: None
+        """
+        if self._is_stale(generation):
+            return
+        check_lists = [copy.copy(check_list) for check_list in check_lists]
+        size = sum(
+            ROW_OVERHEAD + len(check_list.name) + len(check_list.description or "")
+            for check_list in check_lists
+        )
+        self._put(CHECK_LISTS_KEY, check_lists, size)
+
+    @synchronized
+    def invalidate_check_lists(self) -> None:
+        """
+
+        :return: None
+        """
+        self._generation += 1
+        self._discard(CHECK_LISTS_KEY)
+
+    @synchronized
+    def invalidate(self, cid: int) -> None:
+        """
+        Drop every entry of a check list.
+        :param cid: Check list ID
+        :return: None
+        """
+        self._generation += 1
+        for key in list(self._keys_by_cid.pop(cid, ())):
+            self._discard(key)
+
+    @synchronized
+    def task_added(self, task: Task) -> None:
+        """
+        Patch the entries of the task's list after an insert. The task has
+        the highest tid, so it only extends the snapshot, the count and the
+        last page.
+        :param task: Inserted Task with its tid
+        :return: None
+        """
+        self._generation += 1
+        cid = task.check_list_id
+        for key in list(self._keys_by_cid.get(cid, ())):
+            value, _ = self._entries[key]
+            if key[0] == "tasks":
+                if value and value[-1].tid >= task.tid:
+                    continue  # Already added from the change feed
+                value.append(copy.copy(task))
+                self._resize(key, _task_size(task))
+            elif key[0] == "count":
+                self._entries[key] = (value + 1, ROW_OVERHEAD)
+            elif value[1] is None:
+                self._discard(key)
+
+    @synchronized
+    def task_updated(self, task: Task, previous_check_list_id: int = None) -> None:
+        """
+        Patch the cached copies of the task in place. A task that moved
+        invalidates the list it left and the list it joined; a task found
+        nowhere may have moved into its list, which invalidates that list.
+        :param task: Updated Task
+        :param previous_check_list_id: Check list the task was in before the
+            update, if known
+        :return: None
+        """
+        self._generation += 1
+        if previous_check_list_id not in (None, task.check_list_id):
+            self.invalidate(previous_check_list_id)
+            self.invalidate(task.check_list_id)
+            return
+        if not self._replace_task(task):
+            self.invalidate(task.check_list_id)
+
+    def _replace_task(self, task: Task) -> bool:
+        """
+        Replace the cached copies of the task. A task found under another
+        check list moved, which invalidates both lists.
+        :param task: Changed Task
+        :return: Whether the task was found
+        """
+        cid = task.check_list_id
+        found = False
+        for other_cid, keys in list(self._keys_by_cid.items()):
+            for key in list(keys):
+                if key[0] == "count":
+                    continue
+                value, _ = self._entries[key]
+                tasks = value if key[0] == "tasks" else value[0]
+                index = bisect_left(tasks, task.tid, key=_tid)
+                if index == len(tasks) or tasks[index].tid != task.tid:
+                    continue
+                if other_cid != cid:
+                    self.invalidate(other_cid)
+                    self.invalidate(cid)
+                    return True
+                found = True
+                self._resize(key, _task_size(task) - _task_size(tasks[index]))
+                tasks[index] = copy.copy(task)
+        return found
+
+    @synchronized
+    def apply_changes(self, changes: Iterable[Change]) -> None:
+        """
+        Patch the entries with changes read from the change feed. A change
+        made through the controller may arrive twice, once from the write
+        and once from the feed, so every patch is idempotent: the list
+        snapshot is patched by tid, counts and pages of a list whose tasks
+        were added or removed are dropped.
+        :param changes: Iterable of Change objects
+        :return: None
+        """
+        for change in changes:
+            self._generation += 1
+            if change.kind == RESET:
+                self.clear()
+            elif change.kind == TASK_ADDED:
+                self._insert_task(change.task)
+            elif change.kind == TASK_UPDATED:
+                if not self._replace_task(change.task):
+                    self._insert_task(change.task)
+            elif change.kind == TASK_MOVED:
+                self._remove_task(change.tid, change.cid)
+                self._insert_task(change.task)
+            elif change.kind == TASK_DELETED:
+                self._remove_task(change.tid, change.cid)
+            else:
+                self.invalidate_check_lists()
+                if change.kind == CHECK_LIST_DELETED:
+                    self.invalidate(change.cid)
+
+    def _insert_task(self, task: Task) -> None:
+        """
+        Add the task to the snapshot of its list unless it is there.
+        :param task: Task new to its list
+        :return: None
+        """
+        for key in list(self._keys_by_cid.get(task.check_list_id, ())):
+            if key[0] != "tasks":
+                self._discard(key)
+                continue
+            tasks, _ = self._entries[key]
+            index = bisect_left(tasks, task.tid, key=_tid)
+            if index < len(tasks) and tasks[index].tid == task.tid:
+                continue
+            tasks.insert(index, copy.copy(task))
+            self._resize(key, _task_size(task))
+
+    def _remove_task(self, tid: int, cid: int) -> None:
+        """
+        Remove the task from the snapshot of a list if it is there.
+        :param tid: Task ID
+        :param cid: Check list the task left
+        :return: None
+        """
+        for key in list(self._keys_by_cid.get(cid, ())):
+            if key[0] != "tasks":
+                self._discard(key)
+                continue
+            tasks, _ = self._entries[key]
+            index = bisect_left(tasks, tid, key=_tid)
+            if index < len(tasks) and tasks[index].tid == tid:
+                self._resize(key, -_task_size(tasks[index]))
+                del tasks[index]
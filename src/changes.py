@@ -0,0 +1,68 @@
+from typing import Callable, List
+
+from src.check_list import CheckList
+from src.task import Task
+
+TASK_ADDED = "task_added"
+TASK_UPDATED = "task_updated"
+TASK_MOVED = "task_moved"
+TASK_DELETED = "task_deleted"
+CHECK_LIST_ADDED = "check_list_added"
+CHECK_LIST_UPDATED = "check_list_updated"
+CHECK_LIST_DELETED = "check_list_deleted"
+# Too much changed to describe, reload everything
+RESET = "reset"
+
+# Removal rows older than this many changes are deleted by vacuum
+DEFAULT_REMOVALS_KEPT = 100000
+
+
+class Change(object):
+    """
+    One change of the database since the previous batch of changes. A task
+    or check list that changed several times is reported once with its
+    current state.
+
+    TASK_ADDED:    task is new to task.check_list_id
+    TASK_UPDATED:  task changed but is still in task.check_list_id
+    TASK_MOVED:    task left check list cid for task.check_list_id
+    TASK_DELETED:  task tid left check list cid and no longer exists
+    CHECK_LIST_*:  check_list was added or changed, or cid was deleted
+    RESET:         nothing else is set
+    """
+
+    __slots__ = ("kind", "seq", "tid", "cid", "task", "check_list")
+
+    def __init__(
+        self,
+        kind: str,
+        seq: int,
+        tid: int = None,
+        cid: int = None,
+        task: Task = None,
+        check_list: CheckList = None,
+    ):
+        """
+
+        :param kind: One of the kinds above
+        :param seq: Change sequence number, increasing
+        :param tid: Task ID of task changes
+        :param cid: Check list ID, the previous one for TASK_MOVED
+        :param task: Current state of added, updated and moved tasks
+        :param check_list: Current state of added and updated check lists
+        """
+        self.kind = kind
+        self.seq = seq
+        self.tid = tid
+        self.cid = cid
+        self.task = task
+        self.check_list = check_list
+
+    def __repr__(self) -> str:
+        return "Change({0}, seq={1}, tid={2}, cid={3})".format(
+            self.kind, self.seq, self.tid, self.cid
+        )
+
+
+# Called with every batch of changes, on the thread that committed or polled
+Subscriber = Callable[[List[Change]], None]
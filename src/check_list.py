@@ -1,8 +1,21 @@
+import sqlite3
+
+from typing import Optional
+
+# Column list that check_list_row_factory expects, in this order
+CHECK_LIST_SELECT_COLUMNS = "ID, name, description"
+
+
 class CheckList(object):
+    __slots__ = ("_name", "_description", "_cid", "_total", "_done", "_overdue")
+
     def __init__(self, name: str, description: str, cid: int = None):
         self._name = name
         self._description = description
         self._cid = cid
+        self._total = None
+        self._done = None
+        self._overdue = None
 
     @property
     def name(self) -> str:
@@ -15,3 +28,75 @@ class CheckList(object):
     @property
     def cid(self) -> int:
         return self._cid
+
+    @cid.setter
+    def cid(self, cid: int) -> None:
+        self._cid = cid
+
+    @property
+    def total(self) -> Optional[int]:
+        """
+
+        :return: Number of tasks, None if the counts were not read
+        """
+        return self._total
+
+    @property
+    def done(self) -> Optional[int]:
+        """
+
+        :return: Number of done tasks, None if the counts were not read
+        """
+        return self._done
+
+    @property
+    def overdue(self) -> Optional[int]:
+        """
+
+        :return: Number of open tasks due before today, None if not read
+        """
+        return self._overdue
+
+    @property
+    def open(self) -> Optional[int]:
+        """
+
+        :return: Number of open tasks, None if the counts were not read
+        """
+        if self._total is None:
+            return None
+        return self._total - self._done
+
+
+def check_list_row_factory(_: sqlite3.Cursor, row: tuple) -> CheckList:
+    """
+    Row factory building a CheckList from a row selected with
+    CHECK_LIST_SELECT_COLUMNS.
+    :param _: sqlite3 Cursor
+    :param row: (ID, name, description)
+    :return: CheckList
+    """
+    check_list = CheckList.__new__(CheckList)
+    check_list._cid, check_list._name, check_list._description = row
+    check_list._total = check_list._done = check_list._overdue = None
+    return check_list
+
+
+def check_list_counts_row_factory(_: sqlite3.Cursor, row: tuple) -> CheckList:
+    """
+    Row factory building a CheckList with its counts from a row selected with
+    CHECK_LIST_SELECT_COLUMNS followed by total, done and overdue.
+    :param _: sqlite3 Cursor
+    :param row: (ID, name, description, total, done, overdue)
+    :return: CheckList
+    """
+    check_list = CheckList.__new__(CheckList)
+    (
+        check_list._cid,
+        check_list._name,
+        check_list._description,
+        check_list._total,
+        check_list._done,
+        check_list._overdue,
+    ) = row
+    return check_list
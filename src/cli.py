@@ -0,0 +1,362 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from typing import Iterator, List, Optional, TextIO
+
+from src.check_list import CheckList
+from src.due_date import normalize_due_date, parse_due_date
+from src.task import Task
+from src.task_controller import (
+    DEFAULT_ARCHIVE_AGE,
+    DEFAULT_ARCHIVE_BATCH_SIZE,
+    DEFAULT_CHUNK_SIZE,
+    TaskController,
+    chunked,
+)
+
+# Task IDs passed to set_done per statement when read from stdin
+DONE_BATCH_SIZE = 5000
+OUTPUT_FORMATS = ("text", "csv", "jsonl")
+
+
+class CommandError(Exception):
+    """
+    A command can not run; the message is printed and the exit status is 1.
+    """
+
+
+def _stdin_lines(values: List[str]) -> Iterator[str]:
+    """
+
+    :param values: Positional arguments of the command
+    :return: Iterator of the arguments or, when there are none or the only
+        one is -, of the non-empty lines of stdin, read lazily
+    """
+    if values and values != ["-"]:
+        yield from values
+        return
+    for line in sys.stdin:
+        line = line.rstrip("\r\n")
+        if line.strip():
+            yield line
+
+
+def _check_list_id(
+    task_controller: TaskController, value: str, create: bool = False
+) -> int:
+    """
+
+    :param task_controller: TaskController Object
+    :param value: Check list name or ID
+    :param create: Create a check list of that name if there is none
+    :return: ID of the check list
+    """
+    err, message, check_lists = task_controller.get_check_lists()
+    if err:
+        raise CommandError(message)
+    for check_list in check_lists:
+        if check_list.name == value:
+            return check_list.cid
+    if value.isdigit() and any(c.cid == int(value) for c in check_lists):
+        return int(value)
+    if not create:
+        raise CommandError("Unknown check list {0!r}.".format(value))
+    err, message, ids = task_controller.add_check_lists([CheckList(value, "")])
+    if err:
+        raise CommandError(message)
+    return ids[0]
+
+
+def command_add(task_controller: TaskController, arguments, out: TextIO) -> int:
+    """
+    Add tasks, one per description argument or per stdin line. Stdin is
+    inserted in chunks, one transaction each.
+    """
+    due_date = ""
+    if arguments.due:
+        if parse_due_date(arguments.due) is None:
+            raise CommandError("Invalid due date {0!r}.".format(arguments.due))
+        due_date = normalize_due_date(arguments.due)
+    cid = _check_list_id(task_controller, arguments.list, create=True)
+    tasks = (
+        Task(
+            description=description,
+            due_date=due_date,
+            check_list_id=cid,
+            done=arguments.done,
+        )
+        for description in _stdin_lines(arguments.descriptions)
+    )
+    added = 0
+    for chunk in chunked(tasks, arguments.chunk_size):
+        err, message, ids = task_controller.add_tasks(
+            chunk, arguments.chunk_size, bulk=len(chunk) > 1
+        )
+        added += len(ids)
+        if arguments.ids:
+            out.writelines("{0}\n".format(tid) for tid in ids)
+        if err:
+            raise CommandError(message)
+    print("Added {0} tasks.".format(added), file=sys.stderr)
+    return 0
+
+
+def command_list(task_controller: TaskController, arguments, out: TextIO) -> int:
+    """
+    Stream tasks in ID order, page by page.
+    """
+    cid = None
+    if arguments.list:
+        cid = _check_list_id(task_controller, arguments.list)
+    rows = task_controller.iter_task_rows(
+        check_list_id=cid, include_archived=arguments.archived
+    )
+    if arguments.state is not None:
+        rows = (row for row in rows if bool(row[4]) == arguments.state)
+    if arguments.format == "csv":
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(("id", "check_list", "description", "due_date", "done"))
+        for tid, name, description, due_date, done in rows:
+            writer.writerow((tid, name, description, due_date or "", 1 if done else 0))
+    elif arguments.format == "jsonl":
+        for tid, name, description, due_date, done in rows:
+            out.write(
+                json.dumps(
+                    {
+                        "id": tid,
+                        "check_list": name,
+                        "description": description,
+                        "due_date": due_date or "",
+                        "done": bool(done),
+                    }
+                )
+                + "\n"
+            )
+    else:
+        for tid, name, description, due_date, done in rows:
+            out.write(
+                "{0:>8} [{1}] {2:<10} {3:<16} {4}\n".format(
+                    tid, "x" if done else " ", due_date or "", name or "", description
+                )
+            )
+    return 0
+
+
+def command_done(task_controller: TaskController, arguments, out: TextIO) -> int:
+    """
+    Set the done flag of tasks given by ID, or of every task of a check list.
+    """
+    if arguments.all:
+        if not arguments.list or arguments.undo:
+            raise CommandError("--all needs --list and can not be undone.")
+        cid = _check_list_id(task_controller, arguments.list)
+        err, message, changed = task_controller.mark_all_done(cid)
+        if err:
+            raise CommandError(message)
+    else:
+        changed = 0
+        for chunk in chunked(_stdin_lines(arguments.ids), DONE_BATCH_SIZE):
+            try:
+                tids = [int(value) for value in chunk]
+            except ValueError as e:
+                raise CommandError("Invalid task ID: {0}".format(e)) from None
+            err, message, count = task_controller.set_done(tids, not arguments.undo)
+            changed += count
+            if err:
+                raise CommandError(message)
+    print("Changed {0} tasks.".format(changed), file=sys.stderr)
+    return 0
+
+
+def command_stats(task_controller: TaskController, arguments, out: TextIO) -> int:
+    """
+    Print the total, done, open and overdue counts of every check list.
+    """
+    err, message, check_lists = task_controller.get_check_lists(with_counts=True)
+    if err:
+        raise CommandError(message)
+    if arguments.format == "jsonl":
+        for check_list in check_lists:
+            out.write(
+                json.dumps(
+                    {
+                        "id": check_list.cid,
+                        "check_list": check_list.name,
+                        "total": check_list.total,
+                        "done": check_list.done,
+                        "open": check_list.open,
+                        "overdue": check_list.overdue,
+                    }
+                )
+                + "\n"
+            )
+        return 0
+    out.write(
+        "{0:>6} {1:<24} {2:>8} {3:>8} {4:>8} {5:>8}\n".format(
+            "ID", "Check list", "Total", "Done", "Open", "Overdue"
+        )
+    )
+    for check_list in check_lists:
+        out.write(
+            "{0:>6} {1:<24} {2:>8} {3:>8} {4:>8} {5:>8}\n".format(
+                check_list.cid,
+                check_list.name,
+                check_list.total,
+                check_list.done,
+                check_list.open,
+                check_list.overdue,
+            )
+        )
+    return 0
+
+
+def command_import(task_controller: TaskController, arguments, out: TextIO) -> int:
+    """
+    Stream tasks from CSV or JSON Lines, see src.transfer.import_tasks.
+    """
+    from src import transfer
+
+    format_ = arguments.format or transfer.format_of(arguments.file)
+    with transfer.open_text(arguments.file, "r") as file:
+        err, message, count = transfer.import_tasks(
+            task_controller,
+            file,
+            format_,
+            chunk_size=arguments.chunk_size,
+            workers=arguments.workers,
+        )
+    print("Imported {0} tasks. {1}".format(count, message), file=sys.stderr)
+    return err
+
+
+def command_export(task_controller: TaskController, arguments, out: TextIO) -> int:
+    """
+    Stream tasks to CSV or JSON Lines, see src.transfer.export_tasks.
+    """
+    from src import transfer
+
+    format_ = arguments.format or transfer.format_of(arguments.file)
+    cid = None
+    if arguments.list:
+        cid = _check_list_id(task_controller, arguments.list)
+    if arguments.file == "-":
+        err, message, count = transfer.export_tasks(
+            task_controller, out, format_, cid, arguments.archived
+        )
+    else:
+        with transfer.open_text(arguments.file, "w") as file:
+            err, message, count = transfer.export_tasks(
+                task_controller, file, format_, cid, arguments.archived
+            )
+    print("Exported {0} tasks. {1}".format(count, message), file=sys.stderr)
+    return err
+
+
+def command_archive(task_controller: TaskController, arguments, out: TextIO) -> int:
+    """
+    Move tasks done long ago to the archive, see TaskController.archive_done.
+    """
+    err, message, count = task_controller.archive_done(
+        arguments.days, arguments.batch_size
+    )
+    print("Archived {0} tasks.".format(count), file=sys.stderr)
+    if err:
+        raise CommandError(message)
+    return 0
+
+
+def command_vacuum(task_controller: TaskController, arguments, out: TextIO) -> int:
+    """
+    Compact the database, see TaskController.vacuum.
+    """
+    err, message = task_controller.vacuum()
+    if err:
+        raise CommandError(message)
+    return 0
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m src", description="Manage tasks without the GUI."
+    )
+    parser.add_argument("--database", default="pytasks.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Add tasks")
+    add.add_argument("descriptions", nargs="*", help="None or - reads stdin")
+    add.add_argument("--list", required=True, help="Check list, created if missing")
+    add.add_argument("--due", help="Due date, YYYY-MM-DD")
+    add.add_argument("--done", action="store_true")
+    add.add_argument("--ids", action="store_true", help="Print the new task IDs")
+    add.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    add.set_defaults(handler=command_add)
+
+    listing = commands.add_parser("list", help="Stream tasks")
+    listing.add_argument("--list", help="Check list name or ID")
+    state = listing.add_mutually_exclusive_group()
+    state.add_argument("--open", dest="state", action="store_const", const=False)
+    state.add_argument("--done", dest="state", action="store_const", const=True)
+    listing.add_argument("--format", choices=OUTPUT_FORMATS, default="text")
+    listing.add_argument("--archived", action="store_true", help="Include archived")
+    listing.set_defaults(handler=command_list)
+
+    done = commands.add_parser("done", help="Mark tasks as done")
+    done.add_argument("ids", nargs="*", help="Task IDs, none or - reads stdin")
+    done.add_argument("--undo", action="store_true", help="Mark as not done")
+    done.add_argument("--list", help="Check list name or ID, for --all")
+    done.add_argument("--all", action="store_true", help="Every task of --list")
+    done.set_defaults(handler=command_done)
+
+    stats = commands.add_parser("stats", help="Show check list counts")
+    stats.add_argument("--format", choices=("text", "jsonl"), default="text")
+    stats.set_defaults(handler=command_stats)
+
+    import_ = commands.add_parser("import", help="Import CSV or JSON Lines")
+    import_.add_argument("file", help="- for stdin")
+    import_.add_argument("--format", choices=("csv", "jsonl"))
+    import_.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    import_.add_argument("--workers", type=int, default=0)
+    import_.set_defaults(handler=command_import)
+
+    export = commands.add_parser("export", help="Export CSV or JSON Lines")
+    export.add_argument("file", help="- for stdout")
+    export.add_argument("--format", choices=("csv", "jsonl"))
+    export.add_argument("--list", help="Check list name or ID")
+    export.add_argument("--archived", action="store_true", help="Include archived")
+    export.set_defaults(handler=command_export)
+
+    archive = commands.add_parser("archive", help="Archive tasks done long ago")
+    archive.add_argument("--days", type=int, default=DEFAULT_ARCHIVE_AGE)
+    archive.add_argument("--batch-size", type=int, default=DEFAULT_ARCHIVE_BATCH_SIZE)
+    archive.set_defaults(handler=command_archive)
+
+    vacuum = commands.add_parser("vacuum", help="Compact the database")
+    vacuum.set_defaults(handler=command_vacuum)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    python -m src add|list|done|stats|import|export|archive|vacuum ...
+    Uses the TaskController directly and never imports tkinter, so it runs
+    without a display.
+    :param argv: Command line arguments
+    :return: Exit status
+    """
+    arguments = _parser().parse_args(argv)
+    task_controller = TaskController(cache_size=0)
+    task_controller.create_connection(arguments.database, wal=True)
+    try:
+        return arguments.handler(task_controller, arguments, sys.stdout)
+    except CommandError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # The reader went away, e.g. piped into head; the flush at exit
+        # would fail again, so stdout is pointed at /dev/null
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    finally:
+        task_controller.close_connection()
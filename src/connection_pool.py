@@ -0,0 +1,81 @@
+import queue
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+DEFAULT_CHECKOUT_TIMEOUT = 30.0  # Seconds
+
+
+class ConnectionPool(object):
+    """
+    Bounded pool of read-only connections to a database file. Connections
+    can be checked out from any thread, one thread at a time.
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        size: int,
+        pragmas: Iterable[str] = (),
+        timeout: float = DEFAULT_CHECKOUT_TIMEOUT,
+    ):
+        """
+
+        :param database_url: Path of the database file
+        :param size: Number of connections
+        :param pragmas: Statements run on every new connection
+        :param timeout: Seconds to wait for a free connection
+        """
+        self._timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._connections = []
+        uri = "{0}?mode=ro".format(Path(database_url).resolve().as_uri())
+        for _ in range(size):
+            connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            for pragma in pragmas:
+                connection.execute(pragma)
+            self._connections.append(connection)
+            self._idle.put(connection)
+
+    @property
+    def size(self) -> int:
+        """
+
+        :return: int
+        """
+        return len(self._connections)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Check out a connection for the duration of the with block.
+        Raises sqlite3.OperationalError if none is free within the timeout.
+        :return: sqlite3 Connection
+        """
+        try:
+            connection = self._idle.get(timeout=self._timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("No free reader connection.")
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def set_trace_callback(self, callback: Optional[Callable[[str], None]]) -> None:
+        """
+        Install a trace callback on every connection of the pool.
+        :param callback: Called with each statement executed, None removes it
+        :return: None
+        """
+        for connection in self._connections:
+            connection.set_trace_callback(callback)
+
+    def close(self) -> None:
+        """
+
+        :return: None
+        """
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
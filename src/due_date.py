@@ -0,0 +1,62 @@
+import re
+from datetime import date, timedelta
+from typing import Optional, Union
+
+EPOCH = date(1970, 1, 1)
+# A due date string starts with a date; migration 5 reads the same prefix
+_ISO_DATE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+
+
+def parse_due_date(value: Union[str, date, None]) -> Optional[date]:
+    """
+    Read the YYYY-MM-DD date a due date string starts with. What follows,
+    such as the time of legacy values like '2019-12-12 10:00', is ignored.
+    :param value: date or ISO date string, may be empty or None
+    :return: date or None if value is not a date
+    """
+    if isinstance(value, date):
+        return value
+    if not value or not _ISO_DATE.match(value):
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
+
+
+def to_epoch_day(value: Union[str, date, None]) -> Optional[int]:
+    """
+
+    :param value: date or ISO date string
+    :return: Days since 1970-01-01 or None if value is not a date
+    """
+    parsed = parse_due_date(value)
+    return (parsed - EPOCH).days if parsed else None
+
+
+def from_epoch_day(day: Optional[int]) -> str:
+    """
+
+    :param day: Days since 1970-01-01 or None
+    :return: ISO date string, empty for None
+    """
+    return (EPOCH + timedelta(days=day)).isoformat() if day is not None else ""
+
+
+def normalize_due_date(value: Optional[str]) -> Optional[str]:
+    """
+    Canonical ISO form of a due date string. Strings that are not dates are
+    kept as they are, so no user data is lost.
+    :param value: Due date string
+    :return: str
+    """
+    parsed = parse_due_date(value)
+    return parsed.isoformat() if parsed else value
+
+
+def today_epoch_day() -> int:
+    """
+
+    :return: Epoch day of the local date
+    """
+    return (date.today() - EPOCH).days
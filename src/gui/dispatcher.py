@@ -0,0 +1,114 @@
+import queue
+import threading
+import tkinter as tk
+from typing import Callable
+
+POLL_INTERVAL_MS = 15
+
+
+class Dispatcher(object):
+    """
+    Runs blocking calls on a worker thread and hands their results back to
+    the Tk thread. Calls run one at a time in submission order; callbacks
+    run on the Tk thread from an after() poll.
+    """
+
+    def __init__(self, master: tk.Misc, poll_interval: int = POLL_INTERVAL_MS):
+        """
+
+        :param master: Tk widget used to schedule the polling
+        :param poll_interval: Milliseconds between polls of the result queue
+        """
+        self._master = master
+        self._poll_interval = poll_interval
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._pending = 0
+        self._poll_id = None
+        self._worker = threading.Thread(
+            target=self._run, name="TasksDispatcher", daemon=True
+        )
+        self._worker.start()
+
+    @property
+    def pending(self) -> int:
+        """
+
+        :return: Number of calls whose callback has not run yet
+        """
+        return self._pending
+
+    def submit(self, function: Callable, *args, callback: Callable = None, **kwargs):
+        """
+        Run function(*args, **kwargs) on the worker thread and pass its result
+        to callback on the Tk thread. An exception raised by function is
+        passed to the callback instead of a result.
+        :param function: Blocking callable
+        :param callback: Called with the result, may be None
+        :return: None
+        """
+        self._pending += 1
+        self._requests.put((function, args, kwargs, callback))
+        if self._poll_id is None:
+            self._poll_id = self._master.after(self._poll_interval, self._poll)
+
+    def post(self, callback: Callable, value) -> None:
+        """
+        Run callback(value) on the Tk thread with the next poll. Safe to call
+        from the worker thread while a call runs, for example to pass on
+        notifications the call caused; they run before the call's callback.
+        :param callback: Called with value
+        :param value: Any value
+        :return: None
+        """
+        self._results.put((callback, value, False))
+
+    def _run(self) -> None:
+        """
+        Worker thread loop, stops at the None sentinel.
+        :return: None
+        """
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            function, args, kwargs, callback = request
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                result = e
+            self._results.put((callback, result, True))
+
+    def _poll(self) -> None:
+        """
+        Run the callbacks of finished calls, polling again while calls are
+        pending.
+        :return: None
+        """
+        self._poll_id = None
+        while True:
+            try:
+                callback, result, submitted = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if submitted:
+                self._pending -= 1
+            if callback:
+                callback(result)
+        if self._pending:
+            self._poll_id = self._master.after(self._poll_interval, self._poll)
+
+    def close(self) -> None:
+        """
+        Let the worker finish the submitted calls and stop it. Callbacks of
+        calls that finish after this are dropped.
+        :return: None
+        """
+        if self._poll_id is not None:
+            try:
+                self._master.after_cancel(self._poll_id)
+            except tk.TclError:
+                pass  # The master is already destroyed
+            self._poll_id = None
+        self._requests.put(None)
+        self._worker.join()
@@ -1,9 +1,25 @@
+import copy
 import tkinter as tk
-from tkinter import simpledialog, messagebox
-from typing import Tuple, List
-
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import partial
+from typing import Callable, Tuple, List, Optional
+
+from src import startup
+from src.changes import (
+    CHECK_LIST_ADDED,
+    CHECK_LIST_DELETED,
+    CHECK_LIST_UPDATED,
+    RESET,
+    TASK_ADDED,
+    TASK_DELETED,
+    TASK_MOVED,
+    TASK_UPDATED,
+    Change,
+)
 from src.task import Task
 from src.check_list import CheckList
+from src.gui.dispatcher import Dispatcher
 from src.task_controller import TaskController
 
 MAIN_BACKGROUND_COLOR = "#1E1E1E"
@@ -11,8 +27,24 @@ TASK_ELEMENT_BACKGROUND_COLOR = "#323232"
 CHECK_LISTS_BACKGROUND_COLOR = "#302F2F"
 ENTRY_BACKGROUND_COLOR = "#262626"
 ENTRY_PLACEHOLDER_COLOR = "#d5dcd6"
+LOADING_COLOR = "#8A8A8A"
+OVERDUE_COLOR = "#F28B82"
 WHITE_COLOR = "#FFFFFF"
 
+ROW_HEIGHT = 34
+ROW_PADDING = 5
+PAGE_SIZE = 100
+MAX_CACHED_PAGES = 20
+FLUSH_POLL_INTERVAL_MS = 250
+SEARCH_DEBOUNCE_MS = 250
+SEARCH_LIMIT = 200
+BADGE_REFRESH_MS = 1000
+CHANGE_POLL_INTERVAL_MS = 500
+
+
+def _tid(task: Task) -> int:
+    return task.tid
+
 
 class TasksGUI(tk.Frame):
     def __init__(self, task_controller: TaskController, master: tk.Tk):
@@ -24,11 +56,16 @@ class TasksGUI(tk.Frame):
         super().__init__(master=master)
         self._check_lists_tk = None
         self._canvas_tk = None
+        self._scrollbar_tk = None
         self._tasks_tk = None
         self._entry_tk = None
+        self._search_tk = None
+        self._search_query = ""
         self._root_tk = master
         self._task_controller = task_controller
+        self._dispatcher = Dispatcher(master=master)
         self._selected_cid = None
+        self._unsubscribe = task_controller.subscribe(self._on_changes)
         self._initialize()
 
     def _initialize(self) -> None:
@@ -42,43 +79,74 @@ class TasksGUI(tk.Frame):
         self._root_tk.grid_rowconfigure(index=0, weight=1)
 
         self.grid_columnconfigure(index=1, weight=1)
-        self.grid_rowconfigure(index=0, weight=1)
+        self.grid_rowconfigure(index=1, weight=1)
 
         self._check_lists_tk = CheckLists(master=self)
-        self._check_lists_tk.grid(row=0, column=0, sticky="ns")
+        self._check_lists_tk.grid(row=0, column=0, rowspan=2, sticky="ns")
 
-        self._canvas_tk = tk.Canvas(
-            master=self, bd=0, highlightthickness=0, relief="ridge"
+        self._search_tk = SearchEntry(master=self, placeholder="Search tasks")
+        self._search_tk.grid(
+            row=0, column=1, columnspan=2, padx=5, pady=5, sticky="ew"
         )
-        self._tasks_tk = Tasks(master=self)
 
-        scrollbar = tk.Scrollbar(
-            master=self, orient="vertical", command=self._canvas_tk.yview,
+        self._canvas_tk = tk.Canvas(
+            master=self,
+            bd=0,
+            highlightthickness=0,
+            relief="ridge",
+            background=MAIN_BACKGROUND_COLOR,
+            yscrollincrement=ROW_HEIGHT,
         )
-        self._canvas_tk.configure(
-            yscrollcommand=scrollbar.set, scrollregion=self._canvas_tk.bbox("all")
+        self._scrollbar_tk = tk.Scrollbar(
+            master=self, orient="vertical", command=self._canvas_tk.yview,
         )
-        scrollbar.grid(row=0, column=2, sticky="ns")
+        self._canvas_tk.configure(yscrollcommand=self._on_canvas_scroll)
+        self._scrollbar_tk.grid(row=1, column=2, sticky="ns")
 
-        self._canvas_tk.grid(row=0, column=1, sticky="nsew")
-        self._task_frame_id = self._canvas_tk.create_window(
-            (0, 0), window=self._tasks_tk, anchor="nw"
-        )
+        self._canvas_tk.grid(row=1, column=1, sticky="nsew")
+        self._tasks_tk = Tasks(master=self, canvas=self._canvas_tk)
 
         self._entry_tk = EntryFrame(master=self)
-        self._entry_tk.grid(row=1, column=1, columnspan=2, sticky="ew")
+        self._entry_tk.grid(row=2, column=1, columnspan=2, sticky="ew")
 
         self._new_list_btn_tk = tk.Button(
             master=self, text="\uFF0B New List", command=self._on_new_list_btn_press
         )
-        self._new_list_btn_tk.grid(row=1, column=0, sticky="nsew")
+        self._new_list_btn_tk.grid(row=2, column=0, sticky="nsew")
 
         self.grid(column=0, row=0, sticky="nsew")
 
         self._check_lists_tk.bind(sequence="<<ListboxSelect>>", func=self._on_list_change)
         self._canvas_tk.bind(sequence="<Configure>", func=self._configure_canvas)
-        self._tasks_tk.bind(sequence="<Enter>", func=self._bound_to_mousewheel)
-        self._tasks_tk.bind(sequence="<Leave>", func=self._unbound_to_mousewheel)
+        self.bind_mousewheel(self._canvas_tk)
+
+    def load(self, open_database: Callable[[], None] = None) -> None:
+        """
+        Start loading data once the window is shown. The calls run on the
+        dispatcher in order, so opening the database comes before the first
+        read and the window never waits for either.
+        :param open_database: Optional blocking call opening the database
+        :return: None
+        """
+        startup.mark("first_frame")
+        if open_database:
+            self._dispatcher.submit(open_database, callback=self._on_database_opened)
+        else:
+            self.after(CHANGE_POLL_INTERVAL_MS, self._poll_changes)
+        self._check_lists_tk.refresh()
+        self.after(FLUSH_POLL_INTERVAL_MS, self._flush_writes)
+
+    def _on_database_opened(self, result) -> None:
+        """
+
+        :param result: None or the exception raised while opening
+        :return: None
+        """
+        if isinstance(result, Exception):
+            self._failed(result)
+            return
+        startup.mark("database_open")
+        self.after(CHANGE_POLL_INTERVAL_MS, self._poll_changes)
 
     def _on_list_change(self, _) -> None:
         """
@@ -86,58 +154,102 @@ class TasksGUI(tk.Frame):
         :param _:
         :return:
         """
-        self._selected_cid = self._check_lists_tk.curselection()[0]
-        self._tasks_tk.refresh()
+        selection = self._check_lists_tk.curselection()
+        if not selection:
+            return
+        self._selected_cid = self._check_lists_tk.cid_at(selection[0])
+        if not self._search_query:
+            self._tasks_tk.refresh()
 
     def _on_new_list_btn_press(self) -> None:
         """
         Called when user clicks "New List" button.
         :return: None
         """
+        from tkinter import simpledialog
+
         name = simpledialog.askstring(title="New List", prompt="Name of the new list")
         if name:
             # ToDo: CheckList description
             checklist = CheckList(name=name, description="")
-            err, message = self._task_controller.add_check_list(check_list=checklist)
-            if err:
-                messagebox.showerror(title="Error", message=message)
-            else:
-                self._check_lists_tk.refresh()
+            self._dispatcher.submit(
+                self._task_controller.add_check_list,
+                check_list=checklist,
+                callback=self._on_check_list_added,
+            )
 
-    def _configure_canvas(self, _) -> None:
+    def _on_check_list_added(self, result: Tuple[int, str]) -> None:
         """
+        The list itself is shown by the change feed.
+        :param result: Result of TaskController.add_check_list
+        :return: None
+        """
+        self._failed(result)
 
-        :param _: Tk Event Object
+    def _on_changes(self, changes: List[Change]) -> None:
+        """
+        Subscriber of the controller's change feed, called on the thread
+        that committed or polled.
+        :param changes: List of Change objects
         :return: None
         """
-        canvas_height = self._canvas_tk.winfo_height()
-        frame_height = self._tasks_tk.winfo_reqheight()  # Required height
+        self._dispatcher.post(self._apply_changes, changes)
 
-        if canvas_height >= frame_height:
-            new_height = canvas_height
-        else:
-            new_height = frame_height
-        self._canvas_tk.itemconfigure(
-            self._task_frame_id, height=new_height, width=self._canvas_tk.winfo_width()
+    def _apply_changes(self, changes: List[Change]) -> None:
+        """
+        Patch the check lists and the shown tasks with the changes, made
+        here or by another process, instead of reloading them.
+        :param changes: List of Change objects
+        :return: None
+        """
+        if any(change.kind == RESET for change in changes):
+            self._check_lists_tk.refresh()
+            if not self._search_query:
+                self._tasks_tk.refresh()
+            return
+        self._check_lists_tk.apply_changes(changes)
+        if self._selected_cid is not None and not self._search_query:
+            self._tasks_tk.apply_changes(self._selected_cid, changes)
+
+    def _poll_changes(self) -> None:
+        """
+        Timer looking for changes committed by other processes.
+        :return: None
+        """
+        self._dispatcher.submit(
+            self._task_controller.poll_changes, callback=self._failed
         )
+        self.after(CHANGE_POLL_INTERVAL_MS, self._poll_changes)
 
-        self._canvas_tk.configure(scrollregion=self._canvas_tk.bbox("all"))
-
-    def _bound_to_mousewheel(self, _) -> None:
+    def _configure_canvas(self, _) -> None:
         """
 
-        :param _:
+        :param _: Tk Event Object
         :return: None
         """
-        self._canvas_tk.bind_all("<MouseWheel>", self._on_mousewheel)
+        self._tasks_tk.resize()
 
-    def _unbound_to_mousewheel(self, _):
+    def _on_canvas_scroll(self, first: str, last: str) -> None:
         """
+        Canvas yscrollcommand: keep the scrollbar in sync and rebind the
+        visible rows.
+        :param first: Top of the view as a fraction of the scrollregion
+        :param last: Bottom of the view as a fraction of the scrollregion
+        :return: None
+        """
+        self._scrollbar_tk.set(first, last)
+        if self._tasks_tk:
+            self._tasks_tk.render()
 
-        :param _:
+    def bind_mousewheel(self, widget: tk.Widget) -> None:
+        """
+        Scroll the task canvas with the mouse wheel while over widget.
+        :param widget: Tk Widget
         :return: None
         """
-        self._canvas_tk.unbind_all("<MouseWheel>")
+        widget.bind(sequence="<MouseWheel>", func=self._on_mousewheel)
+        widget.bind(sequence="<Button-4>", func=self._on_mousewheel)
+        widget.bind(sequence="<Button-5>", func=self._on_mousewheel)
 
     def _on_mousewheel(self, event) -> None:
         """
@@ -145,9 +257,9 @@ class TasksGUI(tk.Frame):
         :param event: Tk Event Object
         :return: None
         """
-        delta = 1
+        delta = -1
         if event.num == 5 or event.delta < 0:
-            delta = -1
+            delta = 1
         self._canvas_tk.yview_scroll(delta, "units")
 
     def _set_window_size_and_pos(self) -> None:
@@ -178,50 +290,178 @@ class TasksGUI(tk.Frame):
         """
         return self._root_tk.winfo_screenwidth(), self._root_tk.winfo_screenheight()
 
+    def close(self) -> None:
+        """
+        Wait for the submitted database calls to finish.
+        :return: None
+        """
+        self._unsubscribe()
+        self._dispatcher.close()
+
+    @staticmethod
+    def _failed(result) -> bool:
+        """
+        Show the error of a finished call, if any.
+        :param result: (Error, Message, ...) tuple or the raised exception
+        :return: True if the call failed
+        """
+        if not isinstance(result, Exception) and not result[0]:
+            return False
+        from tkinter import messagebox
+
+        if isinstance(result, Exception):
+            messagebox.showerror(title="Error", message=str(result))
+            return True
+        messagebox.showerror(title="Error", message=result[1])
+        return True
+
+    def _deliver(self, cid: Optional[int], callback, result) -> None:
+        """
+        Pass the value of a finished read to callback, unless it failed or
+        belongs to a check list that is no longer selected.
+        :param cid: Check list selected when the read was submitted
+        :param callback: Called with the value
+        :param result: (Error, Message, Value, ...) tuple or exception
+        :return: None
+        """
+        if cid != self._selected_cid:
+            return
+        if not self._failed(result):
+            callback(result[2])
+
     def add_task(self, task: Task) -> None:
         """
 
         :param task: Task object
         :return:
         """
-        task.check_list_id = self._selected_cid
-        error, message = self._task_controller.add_task(task=task)
-        if error:
-            messagebox.showerror(title="Error", message=message)
-        else:
-            self._tasks_tk.refresh()
+        cid = self._selected_cid
+        task.check_list_id = cid
+        self._dispatcher.submit(
+            self._task_controller.add_task, task=task, callback=self._failed
+        )
 
-    @property
-    def tasks(self) -> List[Task]:
+    def request_task_count(self, callback) -> None:
         """
+        Count the tasks of the selected check list in the background.
+        :param callback: Called with the number of tasks
+        :return: None
+        """
+        cid = self._selected_cid
+        self._dispatcher.submit(
+            self._task_controller.count_tasks,
+            check_list_id=cid,
+            callback=partial(self._deliver, cid, callback),
+        )
 
-        :return:
+    def request_tasks_page(
+        self, position: int, after_tid: Optional[int], page_size: int, callback
+    ) -> None:
         """
-        error, message, tasks = self._task_controller.get_tasks(check_list_id=self._selected_cid)
-        if error:
-            messagebox.showerror(title="Error", message=message)
-        return tasks
+        Read page_size tasks of the selected check list in the background,
+        following after_tid if known or starting at position otherwise.
+        :param position: Position of the first task of the page
+        :param after_tid: ID of the task before position or None
+        :param page_size: Number of tasks
+        :param callback: Called with the list of Task objects
+        :return: None
+        """
+        cid = self._selected_cid
+        self._dispatcher.submit(
+            self._read_tasks_page,
+            cid,
+            position,
+            after_tid,
+            page_size,
+            callback=partial(self._deliver, cid, callback),
+        )
 
-    @property
-    def check_lists(self) -> List[CheckList]:
+    def _read_tasks_page(
+        self, cid: int, position: int, after_tid: Optional[int], page_size: int
+    ) -> Tuple[int, str, List[Task]]:
+        """
+        Runs on the dispatcher thread.
+        :return: Tuple[Error, Message, Tasks]
+        """
+        if position and after_tid is None:
+            error, message, after_tid = self._task_controller.get_task_id_at(
+                check_list_id=cid, position=position - 1
+            )
+            if error:
+                return error, message, []
+        return self._task_controller.get_tasks_page(
+            check_list_id=cid, page_size=page_size, after_tid=after_tid
+        )[:3]
+
+    def request_check_lists(self, callback) -> None:
+        """
+        Read the check lists and their counts in the background.
+        :param callback: Called with the list of CheckList objects
+        :return: None
         """
+        self._dispatcher.submit(
+            self._task_controller.get_check_lists,
+            with_counts=True,
+            callback=lambda result: self._failed(result) or callback(result[2]),
+        )
 
-        :return:
+    def search(self, query: str) -> None:
+        """
+        Show the tasks of all check lists matching query, ranked by
+        relevance, or the selected check list again if query is empty.
+        :param query: Search text
+        :return: None
+        """
+        query = query.strip()
+        if query == self._search_query:
+            return
+        self._search_query = query
+        if not query:
+            self._tasks_tk.refresh()
+            return
+        self._tasks_tk.show_loading()
+        self._dispatcher.submit(
+            self._task_controller.search_tasks,
+            query=query,
+            limit=SEARCH_LIMIT,
+            callback=partial(self._on_search_results, query),
+        )
+
+    def _on_search_results(self, query: str, result) -> None:
+        """
+        Show search results unless the query changed in the meantime.
+        :param query: Query the results belong to
+        :param result: Result of TaskController.search_tasks
+        :return: None
         """
-        error, message, lists = self._task_controller.get_check_lists()
-        if error:
-            messagebox.showerror(title="Error", message=message)
-        return lists
+        if query != self._search_query or self._failed(result):
+            return
+        self._tasks_tk.show_tasks([task for task, _ in result[2]])
 
     def update_task(self, task: Task) -> None:
         """
-
+        Queue a snapshot of the task: the worker reads and cleans its dirty
+        fields while the shown task may be changed again.
         :param task:
         :return:
         """
-        error, message = self._task_controller.update_task(task=task)
-        if error:
-            messagebox.showerror(title="Error", message=message)
+        snapshot = copy.copy(task)
+        task.mark_clean()
+        self._dispatcher.submit(
+            self._task_controller.queue_update_task,
+            task=snapshot,
+            callback=self._failed,
+        )
+
+    def _flush_writes(self) -> None:
+        """
+        Timer writing the queued task updates.
+        :return: None
+        """
+        self._dispatcher.submit(
+            self._task_controller.flush_if_due, callback=self._failed
+        )
+        self.after(FLUSH_POLL_INTERVAL_MS, self._flush_writes)
 
 
 class EntryFrame(tk.Frame):
@@ -261,32 +501,329 @@ class EntryFrame(tk.Frame):
         self._task_gui.add_task(task=task)
 
 
-class Tasks(tk.Frame):
-    def __init__(self, master: TasksGUI):
-        super().__init__(master=master)
+class Tasks(object):
+    """
+    Virtualized task list drawn on a canvas. Only a pool of rows big enough
+    to fill the visible area exists; rows are rebound to tasks as the view
+    scrolls and tasks are read a page at a time in the background. Rows of
+    pages that are still loading show a placeholder.
+    """
+
+    def __init__(self, master: TasksGUI, canvas: tk.Canvas):
         self._task_gui = master  # Tk Element
-        self._initialize()
-        self.refresh()
+        self._canvas = canvas  # Tk Element
+        self._rows = []  # type: List[TaskElement]
+        self._row_items = []  # type: List[int]
+        self._row_positions = []  # type: List[Optional[int]]
+        self._count = 0
+        self._pages = OrderedDict()  # type: OrderedDict[int, List[Task]]
+        self._loading_pages = set()
+        self._generation = 0
+        self._loading_item = self._canvas.create_text(
+            ROW_PADDING * 2,
+            ROW_PADDING * 2,
+            text="Loading\u2026",
+            anchor="nw",
+            fill=LOADING_COLOR,
+            state="hidden",
+        )
+        self.show_loading()
 
-    def _initialize(self) -> None:
+    def refresh(self) -> None:
+        """
+        Reload the selected check list from the first page. Responses to
+        requests made before the refresh are discarded.
+        :return: None
         """
+        self._generation += 1
+        self._pages.clear()
+        self._loading_pages.clear()
+        self._count = 0
+        self._canvas.yview_moveto(0)
+        self._canvas.itemconfigure(self._loading_item, state="normal")
+        self.resize()
+        self._task_gui.request_task_count(
+            callback=partial(self._on_count, self._generation)
+        )
 
+    def show_loading(self) -> None:
+        """
+        Empty the list and show the loading text until the next refresh or
+        show_tasks.
         :return: None
         """
-        self.configure(bg=MAIN_BACKGROUND_COLOR)
+        self._generation += 1
+        self._pages.clear()
+        self._loading_pages.clear()
+        self._count = 0
+        self._canvas.itemconfigure(self._loading_item, state="normal")
+        self.resize()
+
+    def show_tasks(self, tasks: List[Task]) -> None:
+        """
+        Show a fixed list of tasks, such as search results, instead of a
+        check list.
+        :param tasks: List of Task objects
+        :return: None
+        """
+        self._generation += 1
+        self._loading_pages.clear()
+        self._pages = OrderedDict(
+            (index, tasks[start : start + PAGE_SIZE])
+            for index, start in enumerate(range(0, len(tasks), PAGE_SIZE))
+        )
+        self._count = len(tasks)
+        self._canvas.itemconfigure(self._loading_item, state="hidden")
+        self._canvas.yview_moveto(0)
+        self.resize()
 
-        self.grid_columnconfigure(index=0, weight=1)
+    def _on_count(self, generation: int, count: int) -> None:
+        """
 
-    def refresh(self) -> None:
+        :param generation: Generation the count was requested in
+        :param count: Number of tasks in the check list
+        :return: None
         """
+        if generation != self._generation:
+            return
+        self._canvas.itemconfigure(self._loading_item, state="hidden")
+        self._count = count
+        self._update_scrollregion()
+        self.render()
+
+    def apply_changes(self, cid: int, changes: List[Change]) -> None:
+        """
+        Apply the task changes of the shown check list without reloading
+        it. Loaded pages whose positions a new or removed task shifted are
+        dropped and read again when they come into view.
+        :param cid: ID of the shown check list
+        :param changes: List of Change objects
         :return: None
         """
-        for task in self.grid_slaves():
-            task.grid_forget()
+        changed = False
+        for change in changes:
+            task = change.task
+            if change.kind in (TASK_DELETED, TASK_MOVED) and change.cid == cid:
+                self._remove(change.tid)
+                changed = True
+            if task is None or task.check_list_id != cid:
+                continue
+            if change.kind in (TASK_ADDED, TASK_MOVED):
+                self._insert(task)
+                changed = True
+            elif change.kind == TASK_UPDATED:
+                changed = self._replace(task) or changed
+        if changed:
+            self._update_scrollregion()
+            self.render()
+
+    def _find(self, tid: int) -> Optional[Tuple[List[Task], int]]:
+        """
 
-        for index, task in enumerate(self._task_gui.tasks):
-            task_element = TaskElement(task=task, master=self)
-            task_element.grid(row=index, column=0, pady=(5, 0), padx=5, sticky="ew")
+        :param tid: Task ID
+        :return: Tuple[Loaded page, Index in the page] or None
+        """
+        for page in self._pages.values():
+            if page and page[0].tid <= tid <= page[-1].tid:
+                index = bisect_left(page, tid, key=_tid)
+                if index < len(page) and page[index].tid == tid:
+                    return page, index
+        return None
+
+    def _drop_pages_after(self, tid: int) -> None:
+        """
+        Drop the loaded pages holding tasks with a higher ID than tid.
+        :param tid: Task ID
+        :return: None
+        """
+        shifted = [i for i, page in self._pages.items() if page and page[-1].tid > tid]
+        for index in shifted:
+            del self._pages[index]
+
+    def _insert(self, task: Task) -> None:
+        """
+
+        :param task: Task new to the shown check list
+        :return: None
+        """
+        if self._find(task.tid):
+            self._replace(task)
+            return
+        self._drop_pages_after(task.tid)
+        index, offset = divmod(self._count, PAGE_SIZE)
+        page = self._pages.get(index)
+        if page is not None and len(page) == offset:
+            page.append(task)
+        self._count += 1
+
+    def _remove(self, tid: int) -> None:
+        """
+
+        :param tid: ID of a task that left the shown check list
+        :return: None
+        """
+        self._drop_pages_after(tid - 1)
+        self._count = max(self._count - 1, 0)
+
+    def _replace(self, task: Task) -> bool:
+        """
+
+        :param task: Changed task of the shown check list
+        :return: Whether the task is loaded
+        """
+        found = self._find(task.tid)
+        if found is None:
+            return False
+        page, index = found
+        page[index] = task
+        return True
+
+    def resize(self) -> None:
+        """
+        Update the scrollregion and the row pool to the canvas size.
+        :return: None
+        """
+        self._update_scrollregion()
+        visible_rows = self._canvas.winfo_height() // ROW_HEIGHT + 2
+        while len(self._rows) < visible_rows:
+            row = TaskElement(master=self._canvas, task_list=self)
+            self._task_gui.bind_mousewheel(row)
+            self._rows.append(row)
+            self._row_items.append(
+                self._canvas.create_window(
+                    (ROW_PADDING, 0), window=row, anchor="nw", state="hidden"
+                )
+            )
+            self._row_positions.append(None)
+        while len(self._rows) > visible_rows:
+            self._canvas.delete(self._row_items.pop())
+            self._rows.pop().destroy()
+            self._row_positions.pop()
+        width = max(self._canvas.winfo_width() - 2 * ROW_PADDING, 1)
+        for item in self._row_items:
+            self._canvas.itemconfigure(
+                item, width=width, height=ROW_HEIGHT - ROW_PADDING
+            )
+        self.render()
+
+    def _update_scrollregion(self) -> None:
+        """
+
+        :return: None
+        """
+        self._canvas.configure(
+            scrollregion=(
+                0,
+                0,
+                self._canvas.winfo_width(),
+                self._count * ROW_HEIGHT + ROW_PADDING,
+            )
+        )
+
+    def render(self) -> None:
+        """
+        Reconcile the pooled rows with the tasks in the visible area, keyed by
+        tid: a row already showing a visible task keeps it and is only moved
+        or patched, the remaining rows are rebound to the new tasks or to
+        placeholders and unused rows are hidden.
+        :return: None
+        """
+        first = max(int(self._canvas.canvasy(0)) // ROW_HEIGHT, 0)
+        visible = OrderedDict()
+        loading = []
+        for position in range(first, min(first + len(self._rows), self._count)):
+            task = self._task_at(position)
+            if task is None:
+                loading.append(position)
+            else:
+                visible[task.tid] = (position, task)
+
+        free_slots = []
+        for slot, row in enumerate(self._rows):
+            if self._row_positions[slot] is not None and row.tid in visible:
+                self._place_row(slot, *visible.pop(row.tid))
+            else:
+                free_slots.append(slot)
+
+        for slot in free_slots:
+            if visible:
+                _, (position, task) = visible.popitem(last=False)
+                self._place_row(slot, position, task)
+            elif loading:
+                self._place_row(slot, loading.pop(), None)
+            elif self._row_positions[slot] is not None:
+                self._row_positions[slot] = None
+                self._canvas.itemconfigure(self._row_items[slot], state="hidden")
+
+    def _place_row(self, slot: int, position: int, task: Optional[Task]) -> None:
+        """
+        Show task at position in the row of the pool slot, touching the
+        widget only where something differs.
+        :param slot: Index in the row pool
+        :param position: Position in the check list
+        :param task: Task Object or None for a placeholder
+        :return: None
+        """
+        if task is None:
+            self._rows[slot].show_placeholder()
+        else:
+            self._rows[slot].bind_task(task)
+        if self._row_positions[slot] == position:
+            return
+        item = self._row_items[slot]
+        if self._row_positions[slot] is None:
+            self._canvas.itemconfigure(item, state="normal")
+        self._row_positions[slot] = position
+        self._canvas.coords(item, ROW_PADDING, position * ROW_HEIGHT + ROW_PADDING)
+
+    def _task_at(self, position: int) -> Optional[Task]:
+        """
+
+        :param position: Position in the check list
+        :return: Task Object or None while its page is loading
+        """
+        index, offset = divmod(position, PAGE_SIZE)
+        page = self._pages.get(index)
+        if page is None:
+            self._request_page(index)
+            return None
+        self._pages.move_to_end(index)
+        return page[offset] if offset < len(page) else None
+
+    def _request_page(self, index: int) -> None:
+        """
+        Request a page, continuing from the previous page with keyset
+        pagination when it is cached and seeking by position otherwise.
+        :param index: Page number
+        :return: None
+        """
+        if index in self._loading_pages:
+            return
+        self._loading_pages.add(index)
+        previous = self._pages.get(index - 1)
+        self._task_gui.request_tasks_page(
+            position=index * PAGE_SIZE,
+            after_tid=previous[-1].tid if previous else None,
+            page_size=PAGE_SIZE,
+            callback=partial(self._on_page, self._generation, index),
+        )
+
+    def _on_page(self, generation: int, index: int, page: List[Task]) -> None:
+        """
+
+        :param generation: Generation the page was requested in
+        :param index: Page number
+        :param page: List of Task objects
+        :return: None
+        """
+        if generation != self._generation:
+            return
+        startup.mark("first_tasks")
+        self._loading_pages.discard(index)
+        self._pages[index] = page
+        if len(self._pages) > MAX_CACHED_PAGES:
+            self._pages.popitem(last=False)
+        self.render()
 
     def update_task(self, task: Task) -> None:
         """
@@ -298,20 +835,20 @@ class Tasks(tk.Frame):
 
 
 class TaskElement(tk.Checkbutton):
-    def __init__(self, task: Task, master: Tasks):
+    def __init__(self, master: tk.Canvas, task_list: Tasks, task: Task = None):
         """
 
+        :param master: Canvas of the task list
+        :param task_list: TaskList
         :param task: Task Object
-        :param master: TaskList
         """
-        self._task = task
-        self._checked = tk.BooleanVar(value=task.done)
-        self._task_list = master
+        self._task = None
+        self._checked = tk.BooleanVar(value=False)
+        self._task_list = task_list
         super().__init__(
             master=master,
             state="normal",
             variable=self._checked,
-            text=self._task.description,
             anchor="w",
             padx=5,
             pady=5,
@@ -319,6 +856,42 @@ class TaskElement(tk.Checkbutton):
             background=TASK_ELEMENT_BACKGROUND_COLOR,
             fg=WHITE_COLOR,
         )
+        if task:
+            self.bind_task(task)
+
+    @property
+    def tid(self) -> Optional[int]:
+        """
+
+        :return: ID of the shown task
+        """
+        return self._task.tid if self._task else None
+
+    def bind_task(self, task: Task) -> None:
+        """
+        Show task in this row, updating only the fields that changed.
+        :param task: Task Object
+        :return: None
+        """
+        previous = self._task
+        self._task = task
+        if previous is None:
+            self.configure(state="normal", fg=WHITE_COLOR)
+        if previous is None or previous.done != task.done:
+            self._checked.set(task.done)
+        if previous is None or previous.description != task.description:
+            self.configure(text=task.description)
+
+    def show_placeholder(self) -> None:
+        """
+        Show a disabled row while the task is loading.
+        :return: None
+        """
+        if self._task is None and self.cget("state") == "disabled":
+            return
+        self._task = None
+        self._checked.set(False)
+        self.configure(text="Loading\u2026", state="disabled", fg=LOADING_COLOR)
 
     def _update_task(self) -> None:
         """
@@ -408,7 +981,58 @@ class EntryElement(tk.Entry):
             self._entry_frame.add_task(task=Task(description=text))
 
 
+class SearchEntry(EntryElement):
+    """
+    Search box that searches while typing, once the user paused for
+    SEARCH_DEBOUNCE_MS, and right away on Return.
+    """
+
+    def __init__(self, master: TasksGUI, placeholder: str):
+        """
+
+        :param master: GUI Object
+        :param placeholder: String
+        """
+        super().__init__(master=master, placeholder=placeholder)
+        self._task_gui = master
+        self._search_id = None
+        self.bind(sequence="<KeyRelease>", func=self._schedule_search)
+
+    def _schedule_search(self, _) -> None:
+        """
+        Restart the debounce timer.
+        :param _: Tk Event Object
+        :return: None
+        """
+        if self._search_id is not None:
+            self.after_cancel(self._search_id)
+        self._search_id = self.after(SEARCH_DEBOUNCE_MS, self._search)
+
+    def _search(self) -> None:
+        """
+
+        :return: None
+        """
+        self._search_id = None
+        self._task_gui.search(query=self.get() if self.focused else "")
+
+    def _add_task(self, _) -> None:
+        """
+        Return searches without waiting for the debounce timer.
+        :param _: Tk Event Object
+        :return: None
+        """
+        if self._search_id is not None:
+            self.after_cancel(self._search_id)
+        self._search()
+
+
 class CheckLists(tk.Listbox):
+    """
+    Listbox of the check lists, each with a badge of its open tasks. Lists
+    with overdue tasks are shown in OVERDUE_COLOR.
+    """
+
     def __init__(self, master: TasksGUI):
         super().__init__(
             master=master,
@@ -423,26 +1047,107 @@ class CheckLists(tk.Listbox):
             fg=WHITE_COLOR,
         )
         self._task_gui_tk = master
-        self.refresh()
-        self.select_set(0)
+        self._check_lists = []  # type: List[CheckList]
+        self._refresh_id = None
 
-    def refresh(self) -> None:
+    def apply_changes(self, changes: List[Change]) -> None:
+        """
+        Append added check lists; other check list changes reload the
+        catalog. Task changes reload the badges once they pause.
+        :param changes: List of Change objects
+        :return: None
         """
+        reload = False
+        for change in changes:
+            if change.kind == CHECK_LIST_ADDED:
+                self._check_lists.append(change.check_list)
+                self.insert("end", self._label(change.check_list))
+                if not self.curselection():
+                    self.select_set("end")
+                    self.event_generate("<<ListboxSelect>>")
+            elif change.kind in (CHECK_LIST_UPDATED, CHECK_LIST_DELETED):
+                reload = True
+        if reload:
+            self.refresh()
+        elif any(change.tid is not None for change in changes):
+            self.schedule_refresh()
 
+    def refresh(self) -> None:
+        """
+        Reload the check lists in the background.
         :return:
         """
-        self.delete(0, 'end')
+        if self._refresh_id is not None:
+            self.after_cancel(self._refresh_id)
+            self._refresh_id = None
+        self._task_gui_tk.request_check_lists(callback=self._on_check_lists)
+
+    def schedule_refresh(self) -> None:
+        """
+        Reload the badges once task changes paused for BADGE_REFRESH_MS.
+        :return: None
+        """
+        if self._refresh_id is not None:
+            self.after_cancel(self._refresh_id)
+        self._refresh_id = self.after(BADGE_REFRESH_MS, self.refresh)
+
+    def _on_check_lists(self, check_lists: List[CheckList]) -> None:
+        """
+        Show the check lists, keeping the selected one selected. The first
+        list is selected if there was no selection.
+        :param check_lists: List of CheckList objects
+        :return: None
+        """
+        startup.mark("check_lists")
+        selection = self.curselection()
+        selected_cid = self.cid_at(selection[0]) if selection else None
+
+        self._check_lists = check_lists
+        top = self.yview()[0]
+        self.delete(0, "end")
+        for index, check_list in enumerate(check_lists):
+            self.insert("end", self._label(check_list))
+            if check_list.overdue:
+                self.itemconfig(index, foreground=OVERDUE_COLOR)
+        self.yview_moveto(top)
+
+        cids = [check_list.cid for check_list in check_lists]
+        if selected_cid in cids:
+            self.select_set(cids.index(selected_cid))
+        elif check_lists:
+            self.select_set(0)
+            self.event_generate("<<ListboxSelect>>")
+
+    @staticmethod
+    def _label(check_list: CheckList) -> str:
+        """
 
-        check_lists = self._task_gui_tk.check_lists
+        :param check_list: CheckList object
+        :return: Name followed by the badge of open tasks, if any
+        """
+        if check_list.open:
+            return "{0}  {1}".format(check_list.name, check_list.open)
+        return check_list.name
 
-        for check_list in check_lists:
-            self.insert("end", check_list.name)
+    def cid_at(self, index: int) -> int:
+        """
 
+        :param index: Index in the listbox
+        :return: ID of the check list shown at index
+        """
+        return self._check_lists[index].cid
 
-def initialize_gui(task_controller: TaskController) -> None:
-    """
 
+def initialize_gui(
+    task_controller: TaskController, open_database: Callable[[], None] = None
+) -> None:
+    """
+    Show the window, then load the data. Nothing touches the database before
+    the window is mapped and drawn, so the time to the first frame does not
+    depend on the database.
     :param task_controller: TaskController Object
+    :param open_database: Optional blocking call opening the database, run
+        on the dispatcher after the first frame
     :return: None
     """
 
@@ -451,7 +1156,17 @@ def initialize_gui(task_controller: TaskController) -> None:
 
     icon = tk.Image(imgtype="photo", file="src/ico.png")
     root.iconphoto(True, icon)
+    startup.mark("window")
+
+    tasks_gui = TasksGUI(master=root, task_controller=task_controller)
+    startup.mark("skeleton")
+
+    def on_map(_) -> None:
+        tasks_gui.unbind("<Map>", binding)
+        # Idle callbacks run in order, the first redraw is already queued
+        tasks_gui.after_idle(tasks_gui.load, open_database)
 
-    _ = TasksGUI(master=root, task_controller=task_controller)
+    binding = tasks_gui.bind("<Map>", on_map)
 
     root.mainloop()
+    tasks_gui.close()
@@ -0,0 +1,525 @@
+import functools
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from src.locking import synchronized
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+DEFAULT_SLOW_THRESHOLD = 0.1  # Seconds
+MAX_STATEMENTS = 500  # Distinct statements tracked, the rest count as OTHER
+MAX_STATEMENT_LENGTH = 300
+OTHER_STATEMENT = "<other>"
+DEFAULT_MEMORY_EVENTS = 1000
+METRIC_PREFIX = "tasks"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_NULL_LITERAL = re.compile(r"(?<!IS )(?<!NOT )\bNULL\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(sql: str) -> str:
+    """
+    Turn a traced statement into a metric key: the trace carries the bound
+    values, so literals are replaced with ? and whitespace is collapsed.
+    :param sql: SQL text
+    :return: str
+    """
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _NULL_LITERAL.sub("?", sql)
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    return sql[:MAX_STATEMENT_LENGTH]
+
+
+class Histogram(object):
+    """
+    Cumulative-bucket histogram in the Prometheus model.
+    """
+
+    __slots__ = ("_bounds", "_counts", "count", "sum", "max")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+
+        :param value: Observed value
+        :return: None
+        """
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        """
+
+        :return: List of (upper bound, cumulative count), the last bound is inf
+        """
+        result = []
+        total = 0
+        for bound, count in zip(self._bounds + (float("inf"),), self._counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def snapshot(self) -> dict:
+        """
+
+        :return: Dict with count, sum, max and the cumulative buckets
+        """
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "buckets": [
+                ["+Inf" if bound == float("inf") else bound, count]
+                for bound, count in self.buckets()
+            ],
+        }
+
+
+class _Metric(object):
+    __slots__ = ("latency", "errors", "rows")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.rows = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "latency": self.latency.snapshot(),
+            "errors": self.errors,
+            "rows": self.rows,
+        }
+
+
+class MemorySink(object):
+    """
+    Keeps the latest events and snapshot in memory.
+    """
+
+    def __init__(self, max_events: int = DEFAULT_MEMORY_EVENTS):
+        """
+
+        :param max_events: Number of events kept
+        """
+        self.events = deque(maxlen=max_events)
+        self.snapshot = None
+
+    def emit(self, event: dict) -> None:
+        self.events.append(event)
+
+    def dump(self, snapshot: dict) -> None:
+        self.snapshot = snapshot
+
+
+class JsonLinesSink(object):
+    """
+    Appends events and snapshots to a file, one JSON object per line.
+    """
+
+    def __init__(self, path: str):
+        """
+
+        :param path: File to append to
+        """
+        self._path = path
+        self._lock = threading.RLock()
+
+    @synchronized
+    def emit(self, event: dict) -> None:
+        with open(self._path, "a") as file:
+            file.write(json.dumps(event) + "\n")
+
+    def dump(self, snapshot: dict) -> None:
+        self.emit({"event": "snapshot", "time": time.time(), "metrics": snapshot})
+
+
+class PrometheusSink(object):
+    """
+    Writes snapshots in the Prometheus text format, for the node exporter's
+    textfile collector or a scrape endpoint serving the file. Events are
+    only counted.
+    """
+
+    def __init__(self, path: str, prefix: str = METRIC_PREFIX):
+        """
+
+        :param path: File replaced on every dump
+        :param prefix: Metric name prefix
+        """
+        self._path = path
+        self._prefix = prefix
+
+    def emit(self, event: dict) -> None:
+        pass
+
+    def dump(self, snapshot: dict) -> None:
+        partial_path = self._path + ".partial"
+        with open(partial_path, "w") as file:
+            file.write(prometheus_text(snapshot, self._prefix))
+        os.replace(partial_path, self._path)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(snapshot: dict, prefix: str = METRIC_PREFIX) -> str:
+    """
+
+    :param snapshot: Instrumentation.snapshot()
+    :param prefix: Metric name prefix
+    :return: Metrics in the Prometheus text exposition format
+    """
+    lines = []
+    for kind, label in (("call", "method"), ("statement", "statement")):
+        metrics = snapshot[kind + "s"]
+        name = "{0}_{1}_duration_seconds".format(prefix, kind)
+        lines.append("# TYPE {0} histogram".format(name))
+        for key, metric in sorted(metrics.items()):
+            key = _label(key)
+            latency = metric["latency"]
+            for bound, count in latency["buckets"]:
+                lines.append(
+                    '{0}_bucket{{{1}="{2}",le="{3}"}} {4}'.format(
+                        name, label, key, bound, count
+                    )
+                )
+            for field in ("sum", "count"):
+                lines.append(
+                    '{0}_{1}{{{2}="{3}"}} {4}'.format(
+                        name, field, label, key, latency[field]
+                    )
+                )
+        for field in ("errors", "rows"):
+            total = "{0}_{1}_{2}_total".format(prefix, kind, field)
+            lines.append("# TYPE {0} counter".format(total))
+            for key, metric in sorted(metrics.items()):
+                lines.append(
+                    '{0}{{{1}="{2}"}} {3}'.format(
+                        total, label, _label(key), metric[field]
+                    )
+                )
+    lines.append("# TYPE {0}_slow_total counter".format(prefix))
+    lines.append("{0}_slow_total {1}".format(prefix, snapshot["slow"]))
+    return "\n".join(lines) + "\n"
+
+
+class Instrumentation(object):
+    """
+    Latency histograms, row counts and error counts per controller method
+    and per SQL statement, plus a slow-query log sent to the sinks.
+
+    Statements are seen through sqlite3's trace callback, which only reports
+    when a statement starts. A statement's latency is therefore measured up
+    to the next statement of the same controller call or the end of the
+    call, so it includes fetching its rows. A statement run outside a call,
+    such as a page of a lazy iterator, is recorded when its code calls
+    end_statement and dropped if it is still open when the thread runs
+    another statement or call, since the time in between was not spent on
+    it. sqlite3 reports each
+    trigger program under the text of the statement that fired it, so the
+    count of a statement with triggers includes their runs; its latency sum
+    is unaffected.
+    """
+
+    def __init__(
+        self,
+        sinks: Iterable = (),
+        slow_threshold: float = DEFAULT_SLOW_THRESHOLD,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        """
+
+        :param sinks: Objects with emit(event) and dump(snapshot)
+        :param slow_threshold: Seconds above which a call or statement is logged
+        :param clock: Monotonic clock in seconds
+        """
+        self._sinks = list(sinks)
+        self._slow_threshold = slow_threshold
+        self._clock = clock
+        self._calls = {}  # type: Dict[str, _Metric]
+        self._statements = {}  # type: Dict[str, _Metric]
+        self._slow = 0
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    @property
+    def clock(self) -> Callable[[], float]:
+        return self._clock
+
+    def _emit(self, event: dict) -> None:
+        for sink in self._sinks:
+            sink.emit(event)
+
+    def _metric(self, metrics: Dict[str, _Metric], key: str) -> _Metric:
+        metric = metrics.get(key)
+        if metric is None:
+            if len(metrics) >= MAX_STATEMENTS:
+                key = OTHER_STATEMENT
+                metric = metrics.get(key)
+            if metric is None:
+                metric = metrics[key] = _Metric()
+        return metric
+
+    @synchronized
+    def record_call(
+        self, method: str, seconds: float, rows: int, error: bool, message: str = ""
+    ) -> None:
+        """
+
+        :param method: Controller method name
+        :param seconds: Duration of the call
+        :param rows: Number of rows returned or changed
+        :param error: Whether the call failed
+        :param message: Error message
+        :return: None
+        """
+        metric = self._metric(self._calls, method)
+        metric.latency.observe(seconds)
+        metric.rows += rows
+        metric.errors += error
+        if seconds >= self._slow_threshold:
+            self._slow += 1
+            self._emit(
+                {
+                    "event": "slow_call",
+                    "time": time.time(),
+                    "method": method,
+                    "seconds": seconds,
+                }
+            )
+        if error:
+            self._emit(
+                {
+                    "event": "error",
+                    "time": time.time(),
+                    "method": method,
+                    "message": message,
+                }
+            )
+
+    @synchronized
+    def record_error(self, method: str, message: str) -> None:
+        """
+        Count and send an error that no caller received, such as a failed
+        background write.
+        :param method: Controller method the error happened in
+        :param message: Error message
+        :return: None
+        """
+        self._metric(self._calls, method).errors += 1
+        self._emit(
+            {
+                "event": "error",
+                "time": time.time(),
+                "method": method,
+                "message": message,
+            }
+        )
+
+    @synchronized
+    def _record_statement(self, sql: str, seconds: float, error: bool) -> None:
+        metric = self._metric(self._statements, sql)
+        metric.latency.observe(seconds)
+        metric.errors += error
+        if seconds >= self._slow_threshold:
+            self._slow += 1
+            self._emit(
+                {
+                    "event": "slow_query",
+                    "time": time.time(),
+                    "statement": sql,
+                    "seconds": seconds,
+                }
+            )
+
+    def trace(self, sql: str) -> None:
+        """
+        sqlite3 trace callback. Statements run by triggers are reported as
+        comments and belong to the statement that fired them.
+        :param sql: Statement as executed
+        :return: None
+        """
+        if sql.startswith("--"):
+            return
+        now = self._clock()
+        self._close_statement(now)
+        self._local.statement = (
+            normalize_statement(sql),
+            now,
+            getattr(self._local, "calls", 0) > 0,
+        )
+
+    def _close_statement(self, now: float) -> None:
+        """
+        Record the open statement of a call at the start of the next one;
+        drop one opened outside a call, which nothing timed the end of.
+        :param now: Clock value
+        :return: None
+        """
+        statement = getattr(self._local, "statement", None)
+        if statement is None:
+            return
+        if statement[2]:
+            self.end_statement(now)
+        else:
+            self._local.statement = None
+
+    def enter_call(self) -> None:
+        """
+        Mark the start of a controller call on this thread.
+        :return: None
+        """
+        self._close_statement(self._clock())
+        self._local.calls = getattr(self._local, "calls", 0) + 1
+
+    def exit_call(self, now: float, error: bool = False) -> None:
+        """
+        Mark the end of a controller call on this thread and record its last
+        statement.
+        :param now: Clock value at the end
+        :param error: Whether the call failed
+        :return: None
+        """
+        self._local.calls -= 1
+        statement = getattr(self._local, "statement", None)
+        if statement is not None and statement[2]:
+            self.end_statement(now, error)
+
+    def end_statement(self, now: float = None, error: bool = False) -> None:
+        """
+        Record the statement running on this thread, if any.
+        :param now: Clock value at the end, read if not given
+        :param error: Whether the statement failed
+        :return: None
+        """
+        statement = getattr(self._local, "statement", None)
+        if statement is None:
+            return
+        self._local.statement = None
+        sql, start, _ = statement
+        self._record_statement(sql, (now or self._clock()) - start, error)
+
+    @synchronized
+    def snapshot(self) -> dict:
+        """
+
+        :return: Dict of calls and statements with their metrics, and the
+            number of slow calls and statements
+        """
+        return {
+            "calls": {name: metric.snapshot() for name, metric in self._calls.items()},
+            "statements": {
+                sql: metric.snapshot() for sql, metric in self._statements.items()
+            },
+            "slow": self._slow,
+        }
+
+    def dump(self) -> dict:
+        """
+        Send a snapshot to every sink.
+        :return: The snapshot
+        """
+        snapshot = self.snapshot()
+        for sink in self._sinks:
+            sink.dump(snapshot)
+        return snapshot
+
+    @synchronized
+    def reset(self) -> None:
+        """
+
+        :return: None
+        """
+        self._calls.clear()
+        self._statements.clear()
+        self._slow = 0
+
+
+def _result_rows(result) -> Tuple[int, bool]:
+    """
+
+    :param result: Return value of a controller method
+    :return: Tuple[Rows, Error] read from an (err, message[, value]) tuple
+    """
+    if not isinstance(result, tuple) or len(result) < 2:
+        return 0, False
+    rows = 0
+    if len(result) > 2:
+        value = result[2]
+        if isinstance(value, int) and not isinstance(value, bool):
+            rows = value
+        elif hasattr(value, "__len__"):
+            rows = len(value)
+    return rows, bool(result[0])
+
+
+def instrumented(method):
+    """
+    Record the latency, rows and errors of a method of an object with an
+    _instrumentation attribute. Without instrumentation the wrapper only
+    adds one attribute check.
+    :param method: Method returning an (err, message[, value]) tuple
+    :return: Wrapped method
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        instrumentation = self._instrumentation
+        if instrumentation is None:
+            return method(self, *args, **kwargs)
+        clock = instrumentation.clock
+        start = clock()
+        instrumentation.enter_call()
+        try:
+            result = method(self, *args, **kwargs)
+        except Exception as e:
+            now = clock()
+            instrumentation.exit_call(now, error=True)
+            instrumentation.record_call(name, now - start, 0, True, str(e))
+            raise
+        now = clock()
+        rows, error = _result_rows(result)
+        instrumentation.exit_call(now, error=error)
+        instrumentation.record_call(
+            name, now - start, rows, error, result[1] if error else ""
+        )
+        return result
+
+    return wrapper
@@ -0,0 +1,16 @@
+import functools
+
+
+def synchronized(method):
+    """
+    Run the method while holding the instance's _lock.
+    :param method: Method of an object with a _lock attribute
+    :return: Wrapped method
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
@@ -1,14 +1,21 @@
-from src.gui.main import initialize_gui
-from src.task_controller import TaskController
-from src.task import Task
-from src.check_list import CheckList
+from src import startup
 
-if __name__ == "__main__":
+
+def main() -> None:
+    # Imported here so that the markers include the import time and tkinter
+    # is only loaded when the window is shown
+    from src.task_controller import TaskController
+    from src.gui.main import initialize_gui
+
+    startup.mark("imports")
 
     task_controller = TaskController()
-    task_controller.create_connection(database_url="pytasks.db")
 
-    initialize_gui(task_controller=task_controller)
+    def open_database() -> None:
+        task_controller.create_connection(database_url="pytasks.db", wal=True)
+        task_controller.enable_write_behind()
+
+    initialize_gui(task_controller=task_controller, open_database=open_database)
 
     # ToDO
     # task_controller.create_check_lists_table()
@@ -22,3 +29,7 @@ if __name__ == "__main__":
     # print(task_controller.add_task(task))
 
     task_controller.close_connection()
+
+
+if __name__ == "__main__":
+    main()
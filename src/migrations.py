@@ -0,0 +1,480 @@
+import sqlite3
+from typing import Callable, List, Tuple
+
+# Every migration is (version, description, statements). The database's
+# PRAGMA user_version holds the version of the last applied migration.
+# Append new migrations with the next version number, never edit old ones.
+MIGRATIONS: List[Tuple[int, str, Tuple[str, ...]]] = [
+    (
+        1,
+        "Create base tables",
+        (
+            """
+            CREATE TABLE IF NOT EXISTS CheckLists (
+                ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                description TEXT
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS Tasks (
+                ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                dueDate DATE,
+                description TEXT NOT NULL,
+                done INTEGER NOT NULL,
+                checkListID INTEGER,
+                FOREIGN KEY (checkListID) REFERENCES CheckLists(ID)
+                    ON DELETE CASCADE
+                    ON UPDATE CASCADE
+            );
+            """,
+        ),
+    ),
+    (
+        2,
+        "Index tasks by check list",
+        (
+            """
+            CREATE INDEX IF NOT EXISTS IX_Tasks_checkListID_done_dueDate
+            ON Tasks (checkListID, done, dueDate);
+            """,
+        ),
+    ),
+    (
+        3,
+        "Index tasks for keyset pagination",
+        (
+            """
+            CREATE INDEX IF NOT EXISTS IX_Tasks_checkListID_ID
+            ON Tasks (checkListID, ID);
+            """,
+        ),
+    ),
+    (
+        4,
+        "Full-text index of task descriptions",
+        (
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS TasksFTS USING fts5(
+                description,
+                content='Tasks',
+                content_rowid='ID',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            );
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_Tasks_FTS_Insert AFTER INSERT ON Tasks
+            BEGIN
+                INSERT INTO TasksFTS (rowid, description)
+                VALUES (new.ID, new.description);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_Tasks_FTS_Delete AFTER DELETE ON Tasks
+            BEGIN
+                INSERT INTO TasksFTS (TasksFTS, rowid, description)
+                VALUES ('delete', old.ID, old.description);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_Tasks_FTS_Update
+            AFTER UPDATE OF description ON Tasks
+            BEGIN
+                INSERT INTO TasksFTS (TasksFTS, rowid, description)
+                VALUES ('delete', old.ID, old.description);
+                INSERT INTO TasksFTS (rowid, description)
+                VALUES (new.ID, new.description);
+            END;
+            """,
+            "INSERT INTO TasksFTS (TasksFTS) VALUES ('rebuild');",
+        ),
+    ),
+    (
+        5,
+        "Store due dates as epoch days",
+        (
+            "ALTER TABLE Tasks ADD COLUMN dueDay INTEGER;",
+            # julianday() also reads bare numbers as Julian days and rolls
+            # invalid days over, so only convert real ISO dates.
+            """
+            UPDATE Tasks
+            SET dueDate = substr(dueDate, 1, 10),
+                dueDay = CAST(julianday(substr(dueDate, 1, 10)) - 2440587.5 AS INTEGER)
+            WHERE dueDate GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'
+              AND date(julianday(dueDate)) = substr(dueDate, 1, 10);
+            """,
+            "DROP INDEX IF EXISTS IX_Tasks_checkListID_done_dueDate;",
+            """
+            CREATE INDEX IF NOT EXISTS IX_Tasks_checkListID_done_dueDay
+            ON Tasks (checkListID, done, dueDay);
+            """,
+            "CREATE INDEX IF NOT EXISTS IX_Tasks_done_dueDay ON Tasks (done, dueDay);",
+            "CREATE INDEX IF NOT EXISTS IX_Tasks_dueDay ON Tasks (dueDay);",
+        ),
+    ),
+    (
+        6,
+        "Trigger-maintained check list counters",
+        (
+            """
+            CREATE TABLE IF NOT EXISTS CheckListStats (
+                checkListID INTEGER PRIMARY KEY,
+                total INTEGER NOT NULL DEFAULT 0,
+                done INTEGER NOT NULL DEFAULT 0
+            );
+            """,
+            # Open tasks per due day; overdue is the sum over the days before
+            # today, which a trigger alone cannot keep current as time passes.
+            """
+            CREATE TABLE IF NOT EXISTS CheckListOpenDue (
+                checkListID INTEGER NOT NULL,
+                dueDay INTEGER NOT NULL,
+                open INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (checkListID, dueDay)
+            ) WITHOUT ROWID;
+            """,
+            """
+            INSERT INTO CheckListStats (checkListID, total, done)
+            SELECT checkListID, COUNT(*), SUM(done != 0) FROM Tasks
+            WHERE checkListID IS NOT NULL
+            GROUP BY checkListID;
+            """,
+            """
+            INSERT INTO CheckListOpenDue (checkListID, dueDay, open)
+            SELECT checkListID, dueDay, COUNT(*) FROM Tasks
+            WHERE checkListID IS NOT NULL AND dueDay IS NOT NULL AND done == 0
+            GROUP BY checkListID, dueDay;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_Tasks_Stats_Insert AFTER INSERT ON Tasks
+            BEGIN
+                INSERT INTO CheckListStats (checkListID, total, done)
+                SELECT new.checkListID, 1, new.done != 0
+                WHERE new.checkListID IS NOT NULL
+                ON CONFLICT (checkListID) DO UPDATE
+                SET total = total + 1, done = done + excluded.done;
+                INSERT INTO CheckListOpenDue (checkListID, dueDay, open)
+                SELECT new.checkListID, new.dueDay, 1
+                WHERE new.checkListID IS NOT NULL
+                  AND new.dueDay IS NOT NULL
+                  AND new.done == 0
+                ON CONFLICT (checkListID, dueDay) DO UPDATE SET open = open + 1;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_Tasks_Stats_Delete AFTER DELETE ON Tasks
+            BEGIN
+                UPDATE CheckListStats
+                SET total = total - 1, done = done - (old.done != 0)
+                WHERE checkListID = old.checkListID;
+                UPDATE CheckListOpenDue SET open = open - 1
+                WHERE checkListID = old.checkListID
+                  AND dueDay = old.dueDay
+                  AND old.done == 0;
+                DELETE FROM CheckListOpenDue
+                WHERE checkListID = old.checkListID AND dueDay = old.dueDay AND open <= 0;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_Tasks_Stats_Update
+            AFTER UPDATE OF done, dueDay, checkListID ON Tasks
+            BEGIN
+                UPDATE CheckListStats
+                SET total = total - 1, done = done - (old.done != 0)
+                WHERE checkListID = old.checkListID;
+                UPDATE CheckListOpenDue SET open = open - 1
+                WHERE checkListID = old.checkListID
+                  AND dueDay = old.dueDay
+                  AND old.done == 0;
+                DELETE FROM CheckListOpenDue
+                WHERE checkListID = old.checkListID AND dueDay = old.dueDay AND open <= 0;
+                INSERT INTO CheckListStats (checkListID, total, done)
+                SELECT new.checkListID, 1, new.done != 0
+                WHERE new.checkListID IS NOT NULL
+                ON CONFLICT (checkListID) DO UPDATE
+                SET total = total + 1, done = done + excluded.done;
+                INSERT INTO CheckListOpenDue (checkListID, dueDay, open)
+                SELECT new.checkListID, new.dueDay, 1
+                WHERE new.checkListID IS NOT NULL
+                  AND new.dueDay IS NOT NULL
+                  AND new.done == 0
+                ON CONFLICT (checkListID, dueDay) DO UPDATE SET open = open + 1;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_CheckLists_Stats_Delete
+            AFTER DELETE ON CheckLists
+            BEGIN
+                DELETE FROM CheckListStats WHERE checkListID = old.ID;
+                DELETE FROM CheckListOpenDue WHERE checkListID = old.ID;
+            END;
+            """,
+        ),
+    ),
+    (
+        7,
+        "Change feed sequence numbers",
+        (
+            # seq is bumped by every change, prunedSeq is the newest change
+            # whose removal rows were deleted by TaskController.vacuum
+            """
+            CREATE TABLE IF NOT EXISTS ChangeCounter (
+                ID INTEGER PRIMARY KEY CHECK (ID = 0),
+                seq INTEGER NOT NULL,
+                prunedSeq INTEGER NOT NULL
+            );
+            """,
+            """
+            INSERT OR IGNORE INTO ChangeCounter (ID, seq, prunedSeq)
+            VALUES (0, 0, 0);
+            """,
+            "ALTER TABLE Tasks ADD COLUMN createdSeq INTEGER NOT NULL DEFAULT 0;",
+            "ALTER TABLE Tasks ADD COLUMN changeSeq INTEGER NOT NULL DEFAULT 0;",
+            "ALTER TABLE CheckLists ADD COLUMN createdSeq INTEGER NOT NULL DEFAULT 0;",
+            "ALTER TABLE CheckLists ADD COLUMN changeSeq INTEGER NOT NULL DEFAULT 0;",
+            "CREATE INDEX IF NOT EXISTS IX_Tasks_changeSeq ON Tasks (changeSeq);",
+            # A task left checkListID, deleted or moved; one row per removal
+            """
+            CREATE TABLE IF NOT EXISTS TaskRemovals (
+                ID INTEGER NOT NULL,
+                checkListID INTEGER NOT NULL,
+                createdSeq INTEGER NOT NULL,
+                changeSeq INTEGER NOT NULL
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS IX_TaskRemovals_changeSeq
+            ON TaskRemovals (changeSeq);
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS CheckListRemovals (
+                ID INTEGER NOT NULL,
+                createdSeq INTEGER NOT NULL,
+                changeSeq INTEGER NOT NULL
+            );
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_Tasks_Change_Insert AFTER INSERT ON Tasks
+            BEGIN
+                UPDATE ChangeCounter SET seq = seq + 1;
+                UPDATE Tasks
+                SET createdSeq = (SELECT seq FROM ChangeCounter),
+                    changeSeq = (SELECT seq FROM ChangeCounter)
+                WHERE ID = new.ID;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_Tasks_Change_Update
+            AFTER UPDATE OF dueDate, dueDay, description, done, checkListID ON Tasks
+            BEGIN
+                UPDATE ChangeCounter SET seq = seq + 1;
+                UPDATE Tasks SET changeSeq = (SELECT seq FROM ChangeCounter)
+                WHERE ID = new.ID;
+                INSERT INTO TaskRemovals (ID, checkListID, createdSeq, changeSeq)
+                SELECT old.ID, old.checkListID, old.createdSeq, seq FROM ChangeCounter
+                WHERE old.checkListID IS NOT new.checkListID
+                  AND old.checkListID IS NOT NULL;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_Tasks_Change_Delete AFTER DELETE ON Tasks
+            BEGIN
+                UPDATE ChangeCounter SET seq = seq + 1;
+                INSERT INTO TaskRemovals (ID, checkListID, createdSeq, changeSeq)
+                SELECT old.ID, old.checkListID, old.createdSeq, seq FROM ChangeCounter
+                WHERE old.checkListID IS NOT NULL;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_CheckLists_Change_Insert
+            AFTER INSERT ON CheckLists
+            BEGIN
+                UPDATE ChangeCounter SET seq = seq + 1;
+                UPDATE CheckLists
+                SET createdSeq = (SELECT seq FROM ChangeCounter),
+                    changeSeq = (SELECT seq FROM ChangeCounter)
+                WHERE ID = new.ID;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_CheckLists_Change_Update
+            AFTER UPDATE OF name, description ON CheckLists
+            BEGIN
+                UPDATE ChangeCounter SET seq = seq + 1;
+                UPDATE CheckLists SET changeSeq = (SELECT seq FROM ChangeCounter)
+                WHERE ID = new.ID;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_CheckLists_Change_Delete
+            AFTER DELETE ON CheckLists
+            BEGIN
+                UPDATE ChangeCounter SET seq = seq + 1;
+                INSERT INTO CheckListRemovals (ID, createdSeq, changeSeq)
+                SELECT old.ID, old.createdSeq, seq FROM ChangeCounter;
+            END;
+            """,
+        ),
+    ),
+    (
+        8,
+        "Archive of done tasks",
+        (
+            # Epoch day the task was last marked done, NULL while it is open
+            "ALTER TABLE Tasks ADD COLUMN doneDay INTEGER;",
+            # The real day is unknown for tasks done before the upgrade
+            """
+            UPDATE Tasks
+            SET doneDay = CAST(julianday('now', 'localtime') - 2440587.5 AS INTEGER)
+            WHERE done != 0;
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS IX_Tasks_doneDay ON Tasks (doneDay)
+            WHERE done != 0;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS TR_Tasks_DoneDay_Update
+            AFTER UPDATE OF done ON Tasks
+            WHEN (new.done != 0) != (old.done != 0)
+            BEGIN
+                UPDATE Tasks
+                SET doneDay = CASE WHEN new.done != 0
+                    THEN CAST(julianday('now', 'localtime') - 2440587.5 AS INTEGER)
+                    END
+                WHERE ID = new.ID;
+            END;
+            """,
+            # Same columns as Tasks without the indexes, counters and change
+            # feed; IDs are kept, AUTOINCREMENT never hands them out again
+            """
+            CREATE TABLE IF NOT EXISTS ArchivedTasks (
+                ID INTEGER PRIMARY KEY,
+                dueDate DATE,
+                dueDay INTEGER,
+                description TEXT NOT NULL,
+                done INTEGER NOT NULL,
+                checkListID INTEGER,
+                doneDay INTEGER,
+                archivedDay INTEGER NOT NULL,
+                FOREIGN KEY (checkListID) REFERENCES CheckLists(ID)
+                    ON DELETE CASCADE
+                    ON UPDATE CASCADE
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS IX_ArchivedTasks_checkListID_ID
+            ON ArchivedTasks (checkListID, ID);
+            """,
+            """
+            CREATE VIEW IF NOT EXISTS AllTasks AS
+            SELECT ID, dueDate, dueDay, description, done, checkListID FROM Tasks
+            UNION ALL
+            SELECT ID, dueDate, dueDay, description, done, checkListID
+            FROM ArchivedTasks;
+            """,
+        ),
+    ),
+    (
+        9,
+        "Flag that switches off the insert triggers during a bulk insert",
+        (
+            # One row; set to 1 only inside a bulk insert's transaction, so
+            # no other connection ever sees it set. Unlike dropping the
+            # triggers, setting it does not change the schema, which would
+            # make every connection prepare its statements again.
+            """
+            CREATE TABLE IF NOT EXISTS BulkInsert (
+                active INTEGER NOT NULL
+            );
+            """,
+            "INSERT INTO BulkInsert (active) VALUES (0);",
+            "DROP TRIGGER IF EXISTS TR_Tasks_FTS_Insert;",
+            """
+            CREATE TRIGGER TR_Tasks_FTS_Insert AFTER INSERT ON Tasks
+            WHEN NOT (SELECT active FROM BulkInsert)
+            BEGIN
+                INSERT INTO TasksFTS (rowid, description)
+                VALUES (new.ID, new.description);
+            END;
+            """,
+            "DROP TRIGGER IF EXISTS TR_Tasks_Stats_Insert;",
+            """
+            CREATE TRIGGER TR_Tasks_Stats_Insert AFTER INSERT ON Tasks
+            WHEN NOT (SELECT active FROM BulkInsert)
+            BEGIN
+                INSERT INTO CheckListStats (checkListID, total, done)
+                SELECT new.checkListID, 1, new.done != 0
+                WHERE new.checkListID IS NOT NULL
+                ON CONFLICT (checkListID) DO UPDATE
+                SET total = total + 1, done = done + excluded.done;
+                INSERT INTO CheckListOpenDue (checkListID, dueDay, open)
+                SELECT new.checkListID, new.dueDay, 1
+                WHERE new.checkListID IS NOT NULL
+                  AND new.dueDay IS NOT NULL
+                  AND new.done == 0
+                ON CONFLICT (checkListID, dueDay) DO UPDATE SET open = open + 1;
+            END;
+            """,
+            "DROP TRIGGER IF EXISTS TR_Tasks_Change_Insert;",
+            """
+            CREATE TRIGGER TR_Tasks_Change_Insert AFTER INSERT ON Tasks
+            WHEN NOT (SELECT active FROM BulkInsert)
+            BEGIN
+                UPDATE ChangeCounter SET seq = seq + 1;
+                UPDATE Tasks
+                SET createdSeq = (SELECT seq FROM ChangeCounter),
+                    changeSeq = (SELECT seq FROM ChangeCounter)
+                WHERE ID = new.ID;
+            END;
+            """,
+        ),
+    ),
+]
+
+
+def get_schema_version(connection: sqlite3.Connection) -> int:
+    """
+
+    :param connection: sqlite3 Connection
+    :return: Current PRAGMA user_version
+    """
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(
+    connection: sqlite3.Connection,
+    migrations: List[Tuple[int, str, Tuple[str, ...]]] = None,
+    on_applied: Callable[[int, str], None] = None,
+) -> int:
+    """
+    Apply every migration newer than the database's user_version. Each
+    migration runs in its own transaction together with the version bump,
+    so an interrupted upgrade resumes from the last completed step.
+    :param connection: sqlite3 Connection
+    :param migrations: Migrations to apply, defaults to MIGRATIONS
+    :param on_applied: Optional callback called with (version, description)
+    :return: Schema version after migrating
+    """
+    if migrations is None:
+        migrations = MIGRATIONS
+
+    version = get_schema_version(connection)
+    for target, description, statements in sorted(migrations, key=lambda m: m[0]):
+        if target <= version:
+            continue
+        try:
+            connection.execute("BEGIN")
+            for statement in statements:
+                connection.execute(statement)
+            # PRAGMA does not accept bound parameters
+            connection.execute("PRAGMA user_version = {0:d}".format(target))
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        version = target
+        if on_applied:
+            on_applied(target, description)
+    return version
@@ -0,0 +1,491 @@
+import argparse
+import asyncio
+import json
+import sqlite3
+import sys
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from src.async_controller import DEFAULT_READERS, AsyncTaskController
+from src.check_list import CheckList
+from src.due_date import normalize_due_date, parse_due_date
+from src.task import Task
+from src.task_controller import NOT_FOUND
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_SIZE = 1024 * 1024
+MAX_HEADER_LINES = 100
+JSON_TYPE = "application/json"
+JSON_LINES_TYPE = "application/x-ndjson"
+REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+# (status, JSON body)
+Response = Tuple[int, object]
+# Names of the JSON types of body fields in error messages
+TYPE_NAMES = {str: "a string", int: "an integer", bool: "a boolean"}
+
+
+class HTTPError(Exception):
+    """
+    Ends a request with an error status and {"error": message}.
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Request(object):
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(
+        self,
+        method: str,
+        path: str,
+        query: Dict[str, List[str]],
+        headers: Dict[str, str],
+        body: bytes,
+    ):
+        """
+
+        :param method: HTTP method
+        :param path: Path without the query string
+        :param query: Parsed query string
+        :param headers: Headers with lower case names
+        :param body: Request body
+        """
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> dict:
+        """
+
+        :return: JSON object of the body
+        """
+        try:
+            value = json.loads(self.body or b"{}")
+        except ValueError as e:
+            raise HTTPError(400, "Invalid JSON: {0}".format(e)) from None
+        if not isinstance(value, dict):
+            raise HTTPError(400, "Expected a JSON object.")
+        return value
+
+    def int_query(self, name: str) -> Optional[int]:
+        """
+
+        :param name: Query parameter
+        :return: Its value or None if absent
+        """
+        values = self.query.get(name)
+        if not values:
+            return None
+        try:
+            return int(values[0])
+        except ValueError:
+            raise HTTPError(400, "{0} must be an integer.".format(name)) from None
+
+
+def _task_json(task: Task) -> dict:
+    return {
+        "id": task.tid,
+        "check_list_id": task.check_list_id,
+        "description": task.description,
+        "due_date": task.due_date or "",
+        "done": bool(task.done),
+    }
+
+
+def _check_list_json(check_list: CheckList) -> dict:
+    value = {
+        "id": check_list.cid,
+        "name": check_list.name,
+        "description": check_list.description,
+    }
+    if check_list.total is not None:
+        value.update(
+            total=check_list.total,
+            done=check_list.done,
+            open=check_list.open,
+            overdue=check_list.overdue,
+        )
+    return value
+
+
+def _field(body: dict, name: str, type_: type, default=None):
+    """
+
+    :param body: JSON object of the request
+    :param name: Field name
+    :param type_: str, int or bool; a bool is not taken for an int
+    :param default: Value of an absent or null field
+    :return: The field's value
+    """
+    value = body.get(name)
+    if value is None:
+        return default
+    if type(value) is not type_:
+        raise HTTPError(400, "{0} must be {1}.".format(name, TYPE_NAMES[type_]))
+    return value
+
+
+def _due_date(body: dict) -> str:
+    value = _field(body, "due_date", str, "")
+    if value and parse_due_date(value) is None:
+        raise HTTPError(400, "Invalid due date {0!r}.".format(value))
+    return normalize_due_date(value)
+
+
+async def _next_page(pages: AsyncIterator[List[tuple]]) -> List[tuple]:
+    """
+
+    :param pages: Async iterator of pages
+    :return: Next page, empty at the end
+    """
+    try:
+        return await pages.__anext__()
+    except StopAsyncIteration:
+        return []
+
+
+def _checked(result: tuple) -> tuple:
+    """
+
+    :param result: Tuple[Error, Message, ...] of a controller method
+    :return: The result if there was no error
+    """
+    if result[0]:
+        raise HTTPError(404 if result[0] == NOT_FOUND else 400, result[1])
+    return result
+
+
+class TasksServer(object):
+    """
+    HTTP/1.1 JSON API over an AsyncTaskController, with keep-alive.
+
+    GET   /check_lists[?counts=1]       check lists, with counts if asked
+    POST  /check_lists                  {"name", "description"}
+    GET   /tasks[?check_list_id=ID]     JSON lines, streamed in chunks
+    GET   /check_lists/ID/tasks         tasks of a check list as JSON array
+    POST  /tasks                        {"check_list_id", "description",
+                                         "due_date", "done"}
+    PATCH /tasks/ID                     any of the fields above
+    """
+
+    def __init__(self, controller: AsyncTaskController):
+        """
+
+        :param controller: Open AsyncTaskController
+        """
+        self.controller = controller
+        self._server = None  # type: Optional[asyncio.AbstractServer]
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> int:
+        """
+
+        :param host: Address to listen on
+        :param port: Port, 0 picks a free one
+        :return: Port listened on
+        """
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        """
+
+        :return: None
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self) -> None:
+        """
+
+        :return: None
+        """
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._respond(writer, e.status, {"error": str(e)}, False)
+                    return
+                if request is None:
+                    return
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await self._dispatch(request, writer, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+        """
+
+        :param reader: Connection
+        :return: Request or None at the end of the connection
+        """
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Invalid request line.") from None
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPError(400, "Too many headers.")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length.") from None
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length.")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, "The body is too large.")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return Request(method.upper(), url.path, parse_qs(url.query), headers, body)
+
+    async def _dispatch(
+        self, request: Request, writer: asyncio.StreamWriter, keep_alive: bool
+    ) -> None:
+        parts = [part for part in request.path.split("/") if part]
+        try:
+            if parts == ["tasks"] and request.method == "GET":
+                await self._stream_tasks(request, writer, keep_alive)
+                return
+            status, body = await self._route(request, parts)
+        except HTTPError as e:
+            status, body = e.status, {"error": str(e)}
+        except sqlite3.Error as e:
+            status, body = 500, {"error": "Database error: {0}".format(e)}
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as e:
+            status, body = 500, {"error": "Internal error: {0}".format(e)}
+        await self._respond(writer, status, body, keep_alive)
+
+    async def _route(self, request: Request, parts: List[str]) -> Response:
+        method = request.method
+        if parts == ["check_lists"]:
+            if method == "GET":
+                _, _, check_lists = _checked(
+                    await self.controller.get_check_lists(
+                        with_counts=bool(request.int_query("counts"))
+                    )
+                )
+                return 200, [_check_list_json(c) for c in check_lists]
+            if method == "POST":
+                body = request.json()
+                check_list = CheckList(
+                    _field(body, "name", str, ""), _field(body, "description", str, "")
+                )
+                _checked(await self.controller.add_check_list(check_list))
+                return 201, _check_list_json(check_list)
+            raise HTTPError(405, "Use GET or POST.")
+        if len(parts) == 3 and parts[0] == "check_lists" and parts[2] == "tasks":
+            if method != "GET":
+                raise HTTPError(405, "Use GET.")
+            _, _, tasks = _checked(
+                await self.controller.get_tasks(self._id(parts[1]))
+            )
+            return 200, [_task_json(task) for task in tasks]
+        if parts == ["tasks"]:
+            if method != "POST":
+                raise HTTPError(405, "Use GET or POST.")
+            body = request.json()
+            task = Task(
+                description=_field(body, "description", str, ""),
+                due_date=_due_date(body),
+                check_list_id=_field(body, "check_list_id", int),
+                done=_field(body, "done", bool, False),
+            )
+            if not task.description:
+                raise HTTPError(400, "The description is missing.")
+            _checked(await self.controller.add_task(task))
+            return 201, _task_json(task)
+        if len(parts) == 2 and parts[0] == "tasks":
+            if method != "PATCH":
+                raise HTTPError(405, "Use PATCH.")
+            return 200, await self._update_task(self._id(parts[1]), request.json())
+        raise HTTPError(404, "Not found.")
+
+    @staticmethod
+    def _id(value: str) -> int:
+        if not value.isdigit():
+            raise HTTPError(404, "Not found.")
+        return int(value)
+
+    async def _update_task(self, tid: int, body: dict) -> dict:
+        """
+        Write only the fields present in the body, at least one.
+        :param tid: Task ID
+        :param body: JSON object with the changed fields
+        :return: The changed fields with the task ID
+        """
+        task = Task(description="", tid=tid)
+        task.mark_clean()
+        changed = {"id": tid}
+        if "description" in body:
+            description = _field(body, "description", str, "")
+            if not description:
+                raise HTTPError(400, "The description is missing.")
+            task.description = changed["description"] = description
+        if "due_date" in body:
+            task.due_date = changed["due_date"] = _due_date(body)
+        if "done" in body:
+            task.done = changed["done"] = _field(body, "done", bool, False)
+        if "check_list_id" in body:
+            task.check_list_id = changed["check_list_id"] = _field(
+                body, "check_list_id", int
+            )
+        if len(changed) == 1:
+            # Nothing to write, so update_task would not look the task up
+            raise HTTPError(400, "There are no fields to update.")
+        _checked(await self.controller.update_task(task))
+        return changed
+
+    async def _stream_tasks(
+        self, request: Request, writer: asyncio.StreamWriter, keep_alive: bool
+    ) -> None:
+        """
+        Send the tasks as JSON lines, one chunk per page, so neither side
+        holds the whole list in memory.
+        """
+        check_list_id = request.int_query("check_list_id")
+        pages = self.controller.iter_task_rows(check_list_id)
+        # The first page is read before the headers, so errors get a status
+        page = await _next_page(pages)
+        writer.write(
+            self._head(200, JSON_LINES_TYPE, keep_alive, "Transfer-Encoding: chunked")
+        )
+        while page:
+            data = "".join(
+                json.dumps(
+                    {
+                        "id": tid,
+                        "check_list": name,
+                        "description": description,
+                        "due_date": due_date or "",
+                        "done": bool(done),
+                    }
+                )
+                + "\n"
+                for tid, name, description, due_date, done in page
+            ).encode()
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+            await writer.drain()
+            page = await _next_page(pages)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _head(status: int, content_type: str, keep_alive: bool, *headers: str) -> bytes:
+        lines = [
+            "HTTP/1.1 {0} {1}".format(status, REASONS.get(status, "")),
+            "Content-Type: {0}".format(content_type),
+            "Connection: {0}".format("keep-alive" if keep_alive else "close"),
+        ]
+        lines.extend(headers)
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _respond(
+        self, writer: asyncio.StreamWriter, status: int, body: object, keep_alive: bool
+    ) -> None:
+        data = json.dumps(body).encode()
+        writer.write(
+            self._head(
+                status,
+                JSON_TYPE,
+                keep_alive,
+                "Content-Length: {0}".format(len(data)),
+            )
+            + data
+        )
+        await writer.drain()
+
+
+async def serve(
+    database_url: str, host: str, port: int, readers: int, in_memory: bool = False
+) -> None:
+    """
+    Open the database and serve until cancelled.
+    :param database_url: Path of the database file
+    :param host: Address to listen on
+    :param port: Port
+    :param readers: Read threads and connections
+    :param in_memory: Serve the database from memory, see
+        TaskController.create_connection
+    :return: None
+    """
+    controller = AsyncTaskController(readers=readers)
+    await controller.create_connection(database_url, in_memory=in_memory)
+    server = TasksServer(controller)
+    port = await server.start(host, port)
+    print("Serving {0} on http://{1}:{2}/".format(database_url, host, port))
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+        await controller.close_connection()
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    python -m src.server [--database pytasks.db] [--host H] [--port P] [--in-memory]
+    :param argv: Command line arguments
+    :return: Exit status
+    """
+    parser = argparse.ArgumentParser(prog="python -m src.server")
+    parser.add_argument("--database", default="pytasks.db")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS)
+    parser.add_argument("--in-memory", action="store_true", help="Serve from RAM")
+    arguments = parser.parse_args(argv)
+    try:
+        asyncio.run(
+            serve(
+                arguments.database,
+                arguments.host,
+                arguments.port,
+                arguments.readers,
+                arguments.in_memory,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import os
+import sys
+import time
+from typing import List, Tuple
+
+# Set to print the markers to stderr as they are reached
+TIMING_ENVIRONMENT_VARIABLE = "TASKS_STARTUP_TIMING"
+
+_START = time.perf_counter()
+_markers = []  # type: List[Tuple[str, float]]
+_reported = set()
+
+
+def mark(name: str, once: bool = True) -> float:
+    """
+    Record a cold-start marker, the time since this module was imported.
+    :param name: Marker name
+    :param once: Ignore the marker if it was already recorded
+    :return: Milliseconds since start
+    """
+    if once and name in _reported:
+        return 0.0
+    _reported.add(name)
+    elapsed = (time.perf_counter() - _START) * 1000
+    _markers.append((name, elapsed))
+    if os.environ.get(TIMING_ENVIRONMENT_VARIABLE):
+        print("startup {0:<16} {1:8.1f} ms".format(name, elapsed), file=sys.stderr)
+    return elapsed
+
+
+def markers() -> List[Tuple[str, float]]:
+    """
+
+    :return: List of (name, milliseconds since start) in the order reached
+    """
+    return list(_markers)
@@ -1,5 +1,23 @@
 
+import sqlite3
+
+FIELDS = frozenset(("due_date", "description", "done", "check_list_id"))
+CLEAN = frozenset()
+
+# Column list that task_row_factory expects, in this order
+TASK_SELECT_COLUMNS = "ID, dueDate, description, done, checkListID"
+
+
 class Task(object):
+    __slots__ = (
+        "_check_list_id",
+        "_due_date",
+        "_description",
+        "_done",
+        "_tid",
+        "_dirty",
+    )
+
     def __init__(
         self,
         description: str,
@@ -20,6 +38,35 @@ class Task(object):
         self._description = description
         self._done = done
         self._tid = tid
+        # Fields changed since the task was last read or written. Replaced,
+        # never mutated, so shallow copies do not share changes.
+        self._dirty = FIELDS
+
+    @property
+    def dirty_fields(self) -> frozenset:
+        """
+        Names of the fields changed since the task was read from or written
+        to the database. A new task has every field dirty.
+        :return: frozenset
+        """
+        return self._dirty
+
+    def mark_clean(self, fields: frozenset = None) -> None:
+        """
+
+        :param fields: Names of the fields that were written, default all.
+            A field changed again since it was read stays dirty.
+        :return: None
+        """
+        self._dirty = CLEAN if fields is None else self._dirty - fields
+
+    def mark_dirty(self, fields: frozenset) -> None:
+        """
+
+        :param fields: Names of fields to write again with the next update
+        :return: None
+        """
+        self._dirty = self._dirty | fields
 
     @property
     def check_list_id(self) -> int:
@@ -36,6 +83,7 @@ class Task(object):
         :return:
         """
         self._check_list_id = cid
+        self._dirty = self._dirty | {"check_list_id"}
 
     @property
     def description(self) -> str:
@@ -45,6 +93,16 @@ class Task(object):
         """
         return self._description
 
+    @description.setter
+    def description(self, val: str) -> None:
+        """
+
+        :param val:
+        :return: None
+        """
+        self._description = val
+        self._dirty = self._dirty | {"description"}
+
     @property
     def done(self) -> bool:
         """
@@ -61,6 +119,7 @@ class Task(object):
         :return: None
         """
         self._done = val
+        self._dirty = self._dirty | {"done"}
 
     @property
     def tid(self) -> int:
@@ -70,6 +129,15 @@ class Task(object):
         """
         return self._tid
 
+    @tid.setter
+    def tid(self, tid: int) -> None:
+        """
+
+        :param tid:
+        :return: None
+        """
+        self._tid = tid
+
     @property
     def due_date(self) -> str:
         """
@@ -77,3 +145,33 @@ class Task(object):
         :return: str
         """
         return self._due_date
+
+    @due_date.setter
+    def due_date(self, val: str) -> None:
+        """
+
+        :param val:
+        :return: None
+        """
+        self._due_date = val
+        self._dirty = self._dirty | {"due_date"}
+
+
+def task_row_factory(_: sqlite3.Cursor, row: tuple) -> Task:
+    """
+    Row factory building a clean Task from a row selected with
+    TASK_SELECT_COLUMNS, without going through __init__.
+    :param _: sqlite3 Cursor
+    :param row: (ID, dueDate, description, done, checkListID)
+    :return: Task
+    """
+    task = Task.__new__(Task)
+    (
+        task._tid,
+        task._due_date,
+        task._description,
+        task._done,
+        task._check_list_id,
+    ) = row
+    task._dirty = CLEAN
+    return task
@@ -0,0 +1,154 @@
+from array import array
+from datetime import date
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence
+
+from src.due_date import to_epoch_day, today_epoch_day
+
+# Stored in the due column for tasks without a due date
+NO_DUE_DATE = -(2 ** 31)
+
+
+class TaskBatch(object):
+    """
+    Columnar set of tasks: parallel arrays of task IDs, done flags and due
+    dates as epoch days. Counting and filtering work on the arrays without
+    building Task objects; descriptions are read on demand through
+    load_descriptions and kept once read.
+    """
+
+    __slots__ = ("_tids", "_done", "_due", "_descriptions", "_load_descriptions")
+
+    def __init__(
+        self,
+        load_descriptions: Callable[[Sequence[int]], Dict[int, str]] = None,
+        tids: array = None,
+        done: array = None,
+        due: array = None,
+    ):
+        """
+
+        :param load_descriptions: Returns the descriptions of the given task IDs
+        :param tids: array("q") of task IDs
+        :param done: array("b") of done flags
+        :param due: array("l") of due epoch days, NO_DUE_DATE if unset
+        """
+        self._tids = tids if tids is not None else array("q")
+        self._done = done if done is not None else array("b")
+        self._due = due if due is not None else array("l")
+        self._descriptions = {}  # type: Dict[int, str]
+        self._load_descriptions = load_descriptions
+
+    def __len__(self) -> int:
+        return len(self._tids)
+
+    @property
+    def tids(self) -> array:
+        """
+
+        :return: array("q") of task IDs
+        """
+        return self._tids
+
+    @property
+    def done(self) -> array:
+        """
+
+        :return: array("b") of done flags
+        """
+        return self._done
+
+    @property
+    def due(self) -> array:
+        """
+
+        :return: array("l") of due epoch days
+        """
+        return self._due
+
+    def extend(self, rows: Iterable[tuple]) -> None:
+        """
+        Append rows of (ID, done, dueDay).
+        :param rows: Iterable of tuples
+        :return: None
+        """
+        tids_append = self._tids.append
+        done_append = self._done.append
+        due_append = self._due.append
+        for tid, done, due_day in rows:
+            tids_append(tid)
+            done_append(1 if done else 0)
+            due_append(NO_DUE_DATE if due_day is None else due_day)
+
+    def count_done(self) -> int:
+        """
+
+        :return: Number of done tasks
+        """
+        return sum(self._done)
+
+    def count_overdue(self, today: date = None) -> int:
+        """
+
+        :param today: Reference date, defaults to date.today()
+        :return: Number of open tasks due before today
+        """
+        limit = to_epoch_day(today) if today else today_epoch_day()
+        return sum(
+            1
+            for done, due in zip(self._done, self._due)
+            if not done and due != NO_DUE_DATE and due < limit
+        )
+
+    def filter(
+        self, done: bool = None, due_from: date = None, due_to: date = None
+    ) -> "TaskBatch":
+        """
+        Select tasks by done flag and due date range, both ends inclusive.
+        Tasks without a due date never match a due date bound.
+        :param done: Done flag to match or None for both
+        :param due_from: Earliest due date or None
+        :param due_to: Latest due date or None
+        :return: TaskBatch sharing the description loader
+        """
+        low = to_epoch_day(due_from) if due_from else None
+        high = to_epoch_day(due_to) if due_to else None
+        result = TaskBatch(load_descriptions=self._load_descriptions)
+        for tid, is_done, due in zip(self._tids, self._done, self._due):
+            if done is not None and bool(is_done) != done:
+                continue
+            if low is not None and (due == NO_DUE_DATE or due < low):
+                continue
+            if high is not None and (due == NO_DUE_DATE or due > high):
+                continue
+            result._tids.append(tid)
+            result._done.append(is_done)
+            result._due.append(due)
+        if self._descriptions:
+            kept = set(result._tids)
+            result._descriptions = {
+                tid: text for tid, text in self._descriptions.items() if tid in kept
+            }
+        return result
+
+    def descriptions(self, start: int = 0, stop: int = None) -> List[str]:
+        """
+        Descriptions of the tasks in [start, stop), read with one call of
+        load_descriptions for the ones not read yet.
+        :param start: First index
+        :param stop: Index after the last one, defaults to the end
+        :return: List of descriptions
+        """
+        tids = self._tids[start:stop]
+        missing = [tid for tid in tids if tid not in self._descriptions]
+        if missing:
+            if self._load_descriptions is None:
+                raise LookupError("The batch has no description loader.")
+            self._descriptions.update(self._load_descriptions(missing))
+        return [self._descriptions.get(tid, "") for tid in tids]
+
+    def __iter__(self) -> Iterator[tuple]:
+        """
+
+        :return: Iterator of (tid, done, due epoch day) tuples
+        """
+        return zip(self._tids, self._done, self._due)
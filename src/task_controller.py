@@ -1,18 +1,181 @@
+import json
+import os
 import sqlite3
-from typing import List, Tuple
+import sys
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from datetime import date
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 import re
 
-from src.task import Task
-from src.check_list import CheckList
+from src.task import TASK_SELECT_COLUMNS, Task, task_row_factory
+from src.backup import (
+    DEFAULT_BACKUP_PAGES,
+    DEFAULT_BACKUP_SLEEP,
+    DEFAULT_KEEP,
+    BackupJob,
+    Progress,
+    rotate_snapshots,
+    snapshot_name,
+)
+from src.cache import DEFAULT_CACHE_SIZE, TaskCache
+from src.changes import (
+    CHECK_LIST_ADDED,
+    CHECK_LIST_DELETED,
+    CHECK_LIST_UPDATED,
+    DEFAULT_REMOVALS_KEPT,
+    RESET,
+    TASK_ADDED,
+    TASK_DELETED,
+    TASK_MOVED,
+    TASK_UPDATED,
+    Change,
+    Subscriber,
+)
+from src.check_list import (
+    CHECK_LIST_SELECT_COLUMNS,
+    CheckList,
+    check_list_counts_row_factory,
+    check_list_row_factory,
+)
+from src.connection_pool import ConnectionPool
+from src.due_date import normalize_due_date, to_epoch_day, today_epoch_day
+from src.instrumentation import DEFAULT_SLOW_THRESHOLD, Instrumentation, instrumented
+from src.locking import synchronized
+from src.migrations import get_schema_version, migrate
+from src.task_batch import TaskBatch
+from src.unit_of_work import UnitOfWork
+from src.working_set import DEFAULT_PERSIST_INTERVAL, WorkingSet
+from src.write_behind import (
+    DEFAULT_FLUSH_INTERVAL,
+    DEFAULT_MAX_PENDING,
+    WriteBehindQueue,
+)
+
+NOT_FOUND = 2  # Error of a write to a task that does not exist
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_EXPORT_PAGE_SIZE = 10000
+# Row triggers a bulk insert switches off through the BulkInsert flag and
+# replaces with one set-based statement per chunk
+BULK_INSERT_TRIGGERS = (
+    "TR_Tasks_FTS_Insert",
+    "TR_Tasks_Stats_Insert",
+    "TR_Tasks_Change_Insert",
+)
+DEFAULT_BUSY_TIMEOUT = 5.0  # Seconds
+DEFAULT_ARCHIVE_AGE = 30  # Days a task stays done before it is archived
+DEFAULT_ARCHIVE_BATCH_SIZE = 1000
+DEFAULT_SEARCH_LIMIT = 50
+SNIPPET_START = "["
+SNIPPET_END = "]"
+SNIPPET_ELLIPSIS = "\u2026"
+SNIPPET_TOKENS = 10
+
+# (Task field, Tasks column, conversion) in the order the columns are
+# written. The due date is stored twice: as text and as epoch day.
+TASK_COLUMNS = (
+    ("due_date", "dueDate", normalize_due_date),
+    ("due_date", "dueDay", to_epoch_day),
+    ("description", "description", None),
+    ("done", "done", None),
+    ("check_list_id", "checkListID", None),
+)
+
+# Pragmas of connections opened in WAL mode. synchronous = NORMAL only syncs
+# at checkpoints, which is durable enough in WAL mode.
+WAL_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",  # 64 MiB
+    "PRAGMA mmap_size = 268435456",  # 256 MiB
+)
+
+
+def chunked(items: Iterable, chunk_size: int) -> Iterator[list]:
+    """
+    Split an iterable into lists of at most chunk_size items without
+    materializing the whole input.
+    :param items: Any iterable
+    :param chunk_size: Maximum number of items per chunk
+    :return: Iterator of lists
+    """
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
 
 
 class TaskController(object):
-    def __init__(self):
+    """
+    All writes go through a single connection serialized by a lock, so the
+    controller can be shared between threads. Reads use the pool of
+    read-only connections when create_connection opened one.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+
+        :param cache_size: Memory budget of the read cache in bytes, 0 disables it
+        """
         self._connection = None
+        self._database_url = None
         self._cursor = None
+        self._readers = None
+        self._lock = threading.RLock()
+        self._write_behind = None
+        self._instrumentation = None
+        self._transaction_depth = 0  # Nesting level of transaction blocks
+        self._transaction_owner = None  # Thread running the transaction
+        self._savepoints = 0
+        self._working_set = None  # type: Optional[WorkingSet]
+        self._stop_recording = None
+        self._subscribers = []  # type: List[Subscriber]
+        self._change_seq = None  # Newest change published, None until started
+        self._data_version = None
+        self._cache = TaskCache(max_size=cache_size) if cache_size else None
 
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Cursor for a read: on a pooled read-only connection if there is a
+        pool, otherwise on the writer connection while holding the lock.
+        Reads inside a transaction block run on the writer connection, so
+        they see the block's own writes.
+        :return: sqlite3 Cursor
+        """
+        if self._readers and self._transaction_owner != threading.get_ident():
+            with self._readers.connection() as connection:
+                yield connection.cursor()
+        else:
+            with self._lock:
+                yield self._connection.cursor()
+
+    def _cache_generation(self) -> Optional[int]:
+        """
+
+        :return: Cache generation before a read, None without cache
+        """
+        return self._cache.generation if self._cache else None
+
+    @instrumented
+    @synchronized
     def add_task(self, task: Task) -> Tuple[int, str]:
         """
+        Insert the task and set its tid.
         1 = Error
         0 = No error
         :param task: Task object
@@ -21,109 +184,1341 @@ class TaskController(object):
         if self._cursor:
             try:
                 sql_statement = """
-                                INSERT INTO Tasks (dueDate, description, done, checkListID)
-                                VALUES (?, ?, ?, ?);
+                                INSERT INTO Tasks (dueDate, dueDay, description, done, checkListID, doneDay)
+                                VALUES (?, ?, ?, ?, ?, ?);
                                 """
-                self._cursor.execute(
-                    sql_statement,
-                    (task.due_date, task.description, task.done, task.check_list_id),
-                )
+                self._cursor.execute(sql_statement, self._insert_parameters(task))
                 self.commit()
+                task.tid = self._cursor.lastrowid
+                task.mark_clean()
+                if self._cache:
+                    self._cache.task_added(task)
                 return 0, ""
             except sqlite3.Error as e:
+                self._rollback()
                 return 1, "Database error: {0}".format(e)
         return 1, "There is no connection."
 
-    def get_tasks(self, check_list_id: int) -> Tuple[int, str, List[Task]]:
+    @instrumented
+    def add_tasks(
+        self,
+        tasks: Iterable[Task],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        bulk: bool = False,
+    ) -> Tuple[int, str, List[int]]:
+        """
+        Insert many tasks, one transaction per chunk.
+        1 = At least one chunk failed
+        0 = No error
+        :param tasks: Iterable of Task objects, consumed lazily
+        :param chunk_size: Number of rows inserted per transaction
+        :param bulk: Update the full-text index and the check list counters
+            once per chunk instead of once per row, which is several times
+            faster for large chunks. The insert triggers are switched off
+            inside each chunk's transaction.
+        :return: Tuple[Error, Message, IDs of the inserted tasks]
+        """
+        sql_statement = """
+                        INSERT INTO Tasks (dueDate, dueDay, description, done, checkListID, doneDay)
+                        VALUES (?, ?, ?, ?, ?, ?);
+                        """
+        check_list_ids = set()
+
+        def rows() -> Iterator[tuple]:
+            for task in tasks:
+                check_list_ids.add(task.check_list_id)
+                yield self._insert_parameters(task)
+
+        if bulk:
+            result = self._insert_many(
+                sql_statement,
+                rows(),
+                chunk_size,
+                suspend_triggers=True,
+                after_chunk=self._index_inserted_tasks,
+            )
+        else:
+            result = self._insert_many(sql_statement, rows(), chunk_size)
+        if self._cache:
+            for check_list_id in check_list_ids:
+                self._cache.invalidate(check_list_id)
+        return result
+
+    @staticmethod
+    def _insert_parameters(task: Task) -> tuple:
+        """
+
+        :param task: Task object
+        :return: (dueDate, dueDay, description, done, checkListID, doneDay)
+        """
+        return (
+            normalize_due_date(task.due_date),
+            to_epoch_day(task.due_date),
+            task.description,
+            task.done,
+            task.check_list_id,
+            today_epoch_day() if task.done else None,
+        )
+
+    @instrumented
+    def add_check_lists(
+        self, check_lists: Iterable[CheckList], chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Tuple[int, str, List[int]]:
+        """
+        Insert many check lists, one transaction per chunk. Check lists with
+        an invalid name fail their whole chunk.
+        1 = At least one chunk failed
+        0 = No error
+        :param check_lists: Iterable of CheckList objects, consumed lazily
+        :param chunk_size: Number of rows inserted per transaction
+        :return: Tuple[Error, Message, IDs of the inserted check lists]
+        """
+        sql_statement = """INSERT INTO CheckLists (name, description) VALUES (?, ?)"""
+        rows = (
+            (check_list.name, check_list.description) for check_list in check_lists
+        )
+        result = self._insert_many(
+            sql_statement, rows, chunk_size, validate=self._validate_check_list_row
+        )
+        if self._cache:
+            self._cache.invalidate_check_lists()
+        return result
+
+    @staticmethod
+    def _validate_check_list_row(row: tuple) -> str:
+        """
+
+        :param row: (name, description)
+        :return: Error message or empty string
+        """
+        if not re.match("^[a-zA-Z0-9_ ]{1,20}$", row[0]):
+            return "Enter a valid list name: {0!r}".format(row[0])
+        return ""
+
+    def _insert_many(
+        self,
+        sql_statement: str,
+        rows: Iterable[tuple],
+        chunk_size: int,
+        validate=None,
+        suspend_triggers: bool = False,
+        after_chunk=None,
+    ) -> Tuple[int, str, List[int]]:
+        """
+        Run executemany for every chunk of rows and commit once per chunk.
+        A failing chunk is rolled back and reported, the remaining chunks are
+        still inserted.
+        :param sql_statement: INSERT statement
+        :param rows: Iterable of parameter tuples
+        :param chunk_size: Number of rows per transaction
+        :param validate: Optional callable returning an error message for a row
+        :param suspend_triggers: Switch off BULK_INSERT_TRIGGERS during each
+            chunk's insert
+        :param after_chunk: Optional callable run with the first and last ID of
+            each chunk inside its transaction
+        :return: Tuple[Error, Message, Generated IDs]
+        """
+        if not self._cursor:
+            return 1, "There is no connection.", []
+        if chunk_size < 1:
+            return 1, "Chunk size must be positive.", []
+
+        ids = []
+        errors = []
+        for index, chunk in enumerate(chunked(rows, chunk_size)):
+            if validate:
+                message = next(filter(None, map(validate, chunk)), "")
+                if message:
+                    errors.append("Chunk {0}: {1}".format(index, message))
+                    continue
+            try:
+                with self._lock:
+                    # A rollback also clears the flag
+                    with self._savepoint():
+                        if suspend_triggers:
+                            self._cursor.execute("UPDATE BulkInsert SET active = 1")
+                        self._cursor.executemany(sql_statement, chunk)
+                        # The write lock is held for the whole transaction and
+                        # the tables use AUTOINCREMENT, so the chunk got
+                        # consecutive IDs ending at last_insert_rowid().
+                        self._cursor.execute("SELECT last_insert_rowid()")
+                        last_id = self._cursor.fetchone()[0]
+                        if after_chunk:
+                            after_chunk(last_id - len(chunk) + 1, last_id)
+                        if suspend_triggers:
+                            self._cursor.execute("UPDATE BulkInsert SET active = 0")
+                    self.commit()
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._rollback()
+                errors.append("Chunk {0}: Database error: {1}".format(index, e))
+                continue
+            ids.extend(range(last_id - len(chunk) + 1, last_id + 1))
+
+        if errors:
+            return 1, "\n".join(errors), ids
+        return 0, "", ids
+
+    def _index_inserted_tasks(self, first_id: int, last_id: int) -> None:
+        """
+        Do the work of BULK_INSERT_TRIGGERS for a range of new tasks.
+        :param first_id: ID of the first inserted task
+        :param last_id: ID of the last inserted task
+        :return: None
+        """
+        statements = (
+            """
+            INSERT INTO TasksFTS (rowid, description)
+            SELECT ID, description FROM Tasks WHERE ID BETWEEN ? AND ?;
+            """,
+            """
+            INSERT INTO CheckListStats (checkListID, total, done)
+            SELECT checkListID, COUNT(*), SUM(done != 0) FROM Tasks
+            WHERE ID BETWEEN ? AND ? AND checkListID IS NOT NULL
+            GROUP BY checkListID
+            ON CONFLICT (checkListID) DO UPDATE
+            SET total = total + excluded.total, done = done + excluded.done;
+            """,
+            """
+            INSERT INTO CheckListOpenDue (checkListID, dueDay, open)
+            SELECT checkListID, dueDay, COUNT(*) FROM Tasks
+            WHERE ID BETWEEN ? AND ?
+              AND checkListID IS NOT NULL
+              AND dueDay IS NOT NULL
+              AND done == 0
+            GROUP BY checkListID, dueDay
+            ON CONFLICT (checkListID, dueDay) DO UPDATE
+            SET open = open + excluded.open;
+            """,
+            """
+            UPDATE Tasks
+            SET createdSeq = (SELECT seq FROM ChangeCounter),
+                changeSeq = (SELECT seq FROM ChangeCounter)
+            WHERE ID BETWEEN ? AND ?;
+            """,
+        )
+        # The whole chunk shares one change sequence number
+        self._cursor.execute("UPDATE ChangeCounter SET seq = seq + 1")
+        for sql_statement in statements:
+            self._cursor.execute(sql_statement, (first_id, last_id))
+
+    @instrumented
+    def get_tasks(
+        self, check_list_id: int, include_archived: bool = False
+    ) -> Tuple[int, str, List[Task]]:
         """
 
         :param check_list_id: Str name of the list
+        :param include_archived: Also read the archived tasks of the list,
+            bypassing the read cache
         :return: List of task objects
         """
         if self._cursor:
+            if self._cache and not include_archived:
+                tasks = self._cache.get_tasks(check_list_id)
+                if tasks is not None:
+                    return 0, "", tasks
+            self._flush_queued()
+            generation = self._cache_generation()
             try:
                 sql_statement = """
-                                SELECT * FROM Tasks
+                                SELECT {0} FROM {1}
                                 WHERE checkListID == ?
-                                """
-                self._cursor.execute(sql_statement, (check_list_id,))
-                response = self._cursor.fetchall()
-                tasks = []
-                for row in response:
-                    task = Task(
-                        tid=row[0],
-                        due_date=row[1],
-                        description=row[2],
-                        done=row[3],
-                        check_list_id=check_list_id,
-                    )
-                    tasks.append(task)
+                                ORDER BY ID
+                                """.format(
+                    TASK_SELECT_COLUMNS, "AllTasks" if include_archived else "Tasks"
+                )
+                with self._reader() as cursor:
+                    cursor.row_factory = task_row_factory
+                    cursor.execute(sql_statement, (check_list_id,))
+                    tasks = cursor.fetchall()
+                if self._cache and not include_archived:
+                    self._cache.put_tasks(check_list_id, tasks, generation)
                 return 0, "", tasks
             except sqlite3.Error as e:
-                print(e)
                 return 1, "Database error: {0}".format(e), []
         return 1, "There is no connection.", []
 
-    def get_check_lists(self) -> Tuple[int, str, List[CheckList]]:
+    @instrumented
+    def get_tasks_page(
+        self,
+        check_list_id: int,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        after_tid: int = None,
+    ) -> Tuple[int, str, List[Task], Optional[int]]:
+        """
+        Read one page of tasks ordered by ID. The page starts after after_tid
+        (keyset pagination), so the cost does not depend on how deep the page
+        is in the list.
+        :param check_list_id: ID of the check list
+        :param page_size: Maximum number of tasks in the page
+        :param after_tid: Continuation token of the previous page, None for the first
+        :return: Tuple[Error, Message, Tasks, Continuation token or None at the end]
+        """
+        if self._cursor:
+            if self._cache:
+                cached = self._cache.get_page(check_list_id, after_tid, page_size)
+                if cached is not None:
+                    return (0, "") + cached
+            self._flush_queued()
+            generation = self._cache_generation()
+            try:
+                tasks = self._select_tasks_page(check_list_id, page_size, after_tid)
+            except sqlite3.Error as e:
+                return 1, "Database error: {0}".format(e), [], None
+            token = tasks[-1].tid if len(tasks) == page_size else None
+            if self._cache:
+                self._cache.put_page(
+                    check_list_id, after_tid, page_size, tasks, token, generation
+                )
+            return 0, "", tasks, token
+        return 1, "There is no connection.", [], None
+
+    @instrumented
+    def count_tasks(self, check_list_id: int) -> Tuple[int, str, int]:
+        """
+
+        :param check_list_id: ID of the check list
+        :return: Tuple[Error, Message, Number of tasks in the check list]
+        """
+        if self._cursor:
+            if self._cache:
+                count = self._cache.get_count(check_list_id)
+                if count is not None:
+                    return 0, "", count
+            self._flush_queued()
+            generation = self._cache_generation()
+            try:
+                sql_statement = "SELECT COUNT(*) FROM Tasks WHERE checkListID == ?"
+                with self._reader() as cursor:
+                    cursor.execute(sql_statement, (check_list_id,))
+                    count = cursor.fetchone()[0]
+                if self._cache:
+                    self._cache.put_count(check_list_id, count, generation)
+                return 0, "", count
+            except sqlite3.Error as e:
+                return 1, "Database error: {0}".format(e), 0
+        return 1, "There is no connection.", 0
+
+    @instrumented
+    def get_task_id_at(
+        self, check_list_id: int, position: int
+    ) -> Tuple[int, str, Optional[int]]:
+        """
+        Find the ID of the task at a position of the ID-ordered list. Used to
+        seek a keyset page when jumping into the middle of a list; only the
+        index is scanned.
+        :param check_list_id: ID of the check list
+        :param position: Zero-based position
+        :return: Tuple[Error, Message, Task ID or None past the end]
+        """
+        if self._cursor:
+            try:
+                sql_statement = """
+                                SELECT ID FROM Tasks
+                                WHERE checkListID == ?
+                                ORDER BY ID
+                                LIMIT 1 OFFSET ?
+                                """
+                with self._reader() as cursor:
+                    cursor.execute(sql_statement, (check_list_id, position))
+                    row = cursor.fetchone()
+                return 0, "", row[0] if row else None
+            except sqlite3.Error as e:
+                return 1, "Database error: {0}".format(e), None
+        return 1, "There is no connection.", None
+
+    def iter_tasks(
+        self,
+        check_list_id: int,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        after_tid: int = None,
+    ) -> Iterator[Task]:
+        """
+        Lazily yield the tasks of a check list ordered by ID, reading one page
+        at a time. Database errors are raised as sqlite3.Error.
+        :param check_list_id: ID of the check list
+        :param page_size: Number of tasks read per query
+        :param after_tid: Only yield tasks with a greater ID
+        :return: Iterator of Task objects
+        """
+        if not self._cursor:
+            raise sqlite3.ProgrammingError("There is no connection.")
+        self._flush_queued()
+        while True:
+            tasks = self._select_tasks_page(check_list_id, page_size, after_tid)
+            self._end_statement()
+            yield from tasks
+            if len(tasks) < page_size:
+                return
+            after_tid = tasks[-1].tid
+
+    def iter_task_rows(
+        self,
+        check_list_id: int = None,
+        page_size: int = DEFAULT_EXPORT_PAGE_SIZE,
+        include_archived: bool = False,
+    ) -> Iterator[tuple]:
+        """
+        Lazily yield plain rows of every task, or of one check list, ordered
+        by ID. Rows are read in keyset pages so that no read transaction or
+        lock is held between pages. Database errors are raised as
+        sqlite3.Error.
+        :param check_list_id: ID of the check list or None for all tasks
+        :param page_size: Number of rows read per query
+        :param include_archived: Also yield archived tasks, merged in ID order
+        :return: Iterator of (ID, check list name, description, dueDate, done)
+        """
+        if not self._cursor:
+            raise sqlite3.ProgrammingError("There is no connection.")
+        self._flush_queued()
+        condition = "t.ID > ?"
+        filters = ()
+        if check_list_id is not None:
+            condition += " AND t.checkListID == ?"
+            filters = (check_list_id,)
+        sql_statement = """
+                        SELECT t.ID, c.name, t.description, t.dueDate, t.done
+                        FROM {0} t
+                        LEFT JOIN CheckLists c ON c.ID = t.checkListID
+                        WHERE {1}
+                        ORDER BY t.ID
+                        LIMIT ?
+                        """.format(
+            "AllTasks" if include_archived else "Tasks", condition
+        )
+        after_tid = 0
+        while True:
+            with self._reader() as cursor:
+                cursor.execute(sql_statement, (after_tid,) + filters + (page_size,))
+                rows = cursor.fetchall()
+            self._end_statement()
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after_tid = rows[-1][0]
+
+    def _end_statement(self) -> None:
+        """
+        Record the statement of a page read outside a controller call before
+        the page is handed out, so that the consumer's time is not counted.
+        :return: None
+        """
+        if self._instrumentation is not None:
+            self._instrumentation.end_statement()
+
+    def _select_tasks_page(
+        self, check_list_id: int, page_size: int, after_tid: Optional[int]
+    ) -> List[Task]:
+        """
+
+        :param check_list_id: ID of the check list
+        :param page_size: LIMIT of the query
+        :param after_tid: Lower ID bound (exclusive)
+        :return: List of Task objects
+        """
+        sql_statement = """
+                        SELECT {0} FROM Tasks
+                        WHERE checkListID == ? AND ID > ?
+                        ORDER BY ID
+                        LIMIT ?
+                        """.format(
+            TASK_SELECT_COLUMNS
+        )
+        with self._reader() as cursor:
+            cursor.row_factory = task_row_factory
+            cursor.execute(
+                sql_statement,
+                (check_list_id, -1 if after_tid is None else after_tid, page_size),
+            )
+            return cursor.fetchall()
+
+    @instrumented
+    def get_task_batch(self, check_list_id: int) -> Tuple[int, str, TaskBatch]:
+        """
+        Read the tasks of a check list into a columnar TaskBatch. No Task
+        objects are built and descriptions are only read when asked for.
+        :param check_list_id: ID of the check list
+        :return: Tuple[Error, Message, TaskBatch]
+        """
+        batch = TaskBatch(load_descriptions=self.get_descriptions)
+        if self._cursor:
+            self._flush_queued()
+            try:
+                sql_statement = """
+                                SELECT ID, done, dueDay FROM Tasks
+                                WHERE checkListID == ?
+                                ORDER BY ID
+                                """
+                with self._reader() as cursor:
+                    cursor.execute(sql_statement, (check_list_id,))
+                    batch.extend(cursor)
+                return 0, "", batch
+            except sqlite3.Error as e:
+                return 1, "Database error: {0}".format(e), batch
+        return 1, "There is no connection.", batch
+
+    @instrumented
+    def search_tasks(
+        self,
+        query: str,
+        check_list_id: int = None,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+    ) -> Tuple[int, str, List[Tuple[Task, str]]]:
+        """
+        Full-text search of task descriptions. Every word of the query must
+        match the start of a word of the description; results are ordered by
+        relevance and come with a snippet in which the matches are wrapped in
+        SNIPPET_START and SNIPPET_END.
+        :param query: Words to search for
+        :param check_list_id: Only search this check list if given
+        :param limit: Maximum number of results
+        :return: Tuple[Error, Message, List of (Task, snippet)]
+        """
+        match = self._fts_query(query)
+        if not match:
+            return 0, "", []
+        if self._cursor:
+            self._flush_queued()
+            sql_statement = """
+                            SELECT {0},
+                                   snippet(TasksFTS, 0, ?, ?, ?, ?)
+                            FROM TasksFTS
+                            JOIN Tasks ON Tasks.ID = TasksFTS.rowid
+                            WHERE TasksFTS MATCH ? {1}
+                            ORDER BY rank
+                            LIMIT ?
+                            """.format(
+                ", ".join(
+                    "Tasks." + column for column in TASK_SELECT_COLUMNS.split(", ")
+                ),
+                "AND Tasks.checkListID == ?" if check_list_id is not None else "",
+            )
+            parameters = [
+                SNIPPET_START,
+                SNIPPET_END,
+                SNIPPET_ELLIPSIS,
+                SNIPPET_TOKENS,
+                match,
+            ]
+            if check_list_id is not None:
+                parameters.append(check_list_id)
+            parameters.append(limit)
+            try:
+                with self._reader() as cursor:
+                    cursor.execute(sql_statement, parameters)
+                    rows = cursor.fetchall()
+            except sqlite3.Error as e:
+                return 1, "Database error: {0}".format(e), []
+            return 0, "", [(task_row_factory(None, row[:5]), row[5]) for row in rows]
+        return 1, "There is no connection.", []
+
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """
+        Turn free text into an FTS5 query of quoted prefix terms, so that
+        user input can never be parsed as FTS5 syntax.
+        :param query: Free text
+        :return: FTS5 MATCH expression, empty if the text has no words
+        """
+        return " ".join('"{0}"*'.format(word) for word in re.findall(r"\w+", query))
+
+    @instrumented
+    def get_tasks_due(
+        self,
+        start: Union[date, str],
+        end: Union[date, str],
+        done: bool = None,
+        limit: int = None,
+    ) -> Tuple[int, str, List[Task]]:
+        """
+        Tasks of all check lists due between start and end, both inclusive,
+        ordered by due date. Uses an index range scan on the epoch day.
+        :param start: First due date
+        :param end: Last due date
+        :param done: Only tasks with this done flag if given
+        :param limit: Maximum number of tasks
+        :return: Tuple[Error, Message, Tasks]
+        """
+        start_day, end_day = to_epoch_day(start), to_epoch_day(end)
+        if start_day is None or end_day is None:
+            return 1, "Enter valid dates.", []
+        condition = "dueDay BETWEEN ? AND ?"
+        parameters = [start_day, end_day]
+        if done is not None:
+            condition = "done == ? AND " + condition
+            parameters.insert(0, done)
+        return self._select_tasks_where(condition, parameters, limit)
+
+    @instrumented
+    def get_overdue(
+        self, today: date = None, limit: int = None
+    ) -> Tuple[int, str, List[Task]]:
+        """
+        Open tasks of all check lists that were due before today.
+        :param today: Reference date, defaults to the local date
+        :param limit: Maximum number of tasks
+        :return: Tuple[Error, Message, Tasks]
+        """
+        today_day = to_epoch_day(today) if today else today_epoch_day()
+        return self._select_tasks_where("done == 0 AND dueDay < ?", [today_day], limit)
+
+    @instrumented
+    def get_due_today(self, today: date = None) -> Tuple[int, str, List[Task]]:
+        """
+        Tasks of all check lists due today.
+        :param today: Reference date, defaults to the local date
+        :return: Tuple[Error, Message, Tasks]
+        """
+        today = today or date.today()
+        return self.get_tasks_due(today, today)
+
+    def _select_tasks_where(
+        self, condition: str, parameters: list, limit: Optional[int]
+    ) -> Tuple[int, str, List[Task]]:
         """
 
+        :param condition: WHERE clause on Tasks
+        :param parameters: Parameters of the condition
+        :param limit: Maximum number of tasks or None
+        :return: Tuple[Error, Message, Tasks ordered by due date]
+        """
+        if self._cursor:
+            self._flush_queued()
+            sql_statement = """
+                            SELECT {0} FROM Tasks
+                            WHERE {1}
+                            ORDER BY dueDay, ID
+                            LIMIT ?
+                            """.format(
+                TASK_SELECT_COLUMNS, condition
+            )
+            try:
+                with self._reader() as cursor:
+                    cursor.row_factory = task_row_factory
+                    cursor.execute(sql_statement, parameters + [limit or -1])
+                    return 0, "", cursor.fetchall()
+            except sqlite3.Error as e:
+                return 1, "Database error: {0}".format(e), []
+        return 1, "There is no connection.", []
+
+    @instrumented
+    def get_descriptions(self, tids: Iterable[int]) -> Dict[int, str]:
+        """
+        Read the descriptions of many tasks with one statement. Database
+        errors are raised as sqlite3.Error.
+        :param tids: Task IDs
+        :return: Dict[Task ID, Description]
+        """
+        if not self._cursor:
+            raise sqlite3.ProgrammingError("There is no connection.")
+        sql_statement = """
+                        SELECT ID, description FROM Tasks
+                        WHERE ID IN (SELECT value FROM json_each(?))
+                        """
+        with self._reader() as cursor:
+            cursor.execute(sql_statement, (json.dumps(list(tids)),))
+            return dict(cursor.fetchall())
+
+    @instrumented
+    def get_check_lists(
+        self, with_counts: bool = False, today: date = None
+    ) -> Tuple[int, str, List[CheckList]]:
+        """
+
+        :param with_counts: Also read total, done and overdue counts
+        :param today: Reference date of the overdue counts, defaults to the
+            local date
         :return:
         """
+        if self._cursor and with_counts:
+            return self._get_check_lists_with_counts(today)
         if self._cursor:
+            if self._cache:
+                check_lists = self._cache.get_check_lists()
+                if check_lists is not None:
+                    return 0, "", check_lists
+            generation = self._cache_generation()
             try:
-                sql_statement = "SELECT * FROM CheckLists"
-                self._cursor.execute(sql_statement)
-                response = self._cursor.fetchall()
-                check_lists = []
-                for row in response:
-                    check_list = CheckList(cid=row[0], name=row[1], description=row[2])
-                    check_lists.append(check_list)
+                sql_statement = "SELECT {0} FROM CheckLists".format(
+                    CHECK_LIST_SELECT_COLUMNS
+                )
+                with self._reader() as cursor:
+                    cursor.row_factory = check_list_row_factory
+                    cursor.execute(sql_statement)
+                    check_lists = cursor.fetchall()
+                if self._cache:
+                    self._cache.put_check_lists(check_lists, generation)
                 return 0, "", check_lists
             except sqlite3.Error as e:
                 return 1, "Database error: {0}".format(e), []
         return 1, "There is no connection.", []
 
-    def update_task(self, task: Task) -> Tuple[int, str]:
+    def _get_check_lists_with_counts(
+        self, today: Optional[date]
+    ) -> Tuple[int, str, List[CheckList]]:
+        """
+        Read every check list with its counts in one query over the counter
+        tables kept by triggers. Not cached, the counts change with every
+        task write.
+        :param today: Reference date of the overdue counts or None
+        :return: Tuple[Error, Message, CheckLists]
         """
+        self._flush_queued()
+        today_day = to_epoch_day(today) if today else today_epoch_day()
+        sql_statement = """
+                        SELECT {0},
+                               COALESCE(s.total, 0),
+                               COALESCE(s.done, 0),
+                               (SELECT COALESCE(SUM(o.open), 0) FROM CheckListOpenDue o
+                                WHERE o.checkListID = c.ID AND o.dueDay < ?)
+                        FROM CheckLists c
+                        LEFT JOIN CheckListStats s ON s.checkListID = c.ID
+                        ORDER BY c.ID
+                        """.format(
+            ", ".join("c." + column for column in CHECK_LIST_SELECT_COLUMNS.split(", "))
+        )
+        try:
+            with self._reader() as cursor:
+                cursor.row_factory = check_list_counts_row_factory
+                cursor.execute(sql_statement, (today_day,))
+                return 0, "", cursor.fetchall()
+        except sqlite3.Error as e:
+            return 1, "Database error: {0}".format(e), []
 
+    @instrumented
+    @synchronized
+    def update_task(self, task: Task) -> Tuple[int, str]:
+        """
+        Write the fields of the task that changed since it was read.
+        NOT_FOUND = The task does not exist
+        1 = Error
+        0 = No error
         :param task:
-        :return:
+        :return: Tuple[Error, Message]
         """
         if self._cursor:
+            dirty = task.dirty_fields
+            if not dirty:
+                return 0, ""
             try:
-                sql_statement = """
-                                UPDATE Tasks
-                                SET dueDate = ?, description = ?, done = ?, checkListID = ?
-                                WHERE ID = ?;
-                                """
-                self._cursor.execute(
-                    sql_statement,
-                    (
-                        task.due_date,
-                        task.description,
-                        task.done,
-                        task.check_list_id,
-                        task.tid,
-                    ),
-                )
+                previous = self._previous_check_list_ids([task])
+                sql_statement, parameters = self._update_statement(dirty)
+                self._cursor.execute(sql_statement, parameters(task))
+                count = self._cursor.rowcount
                 self.commit()
+                if not count:
+                    return NOT_FOUND, "Task {0} does not exist.".format(task.tid)
+                task.mark_clean(dirty)
+                if self._cache:
+                    self._cache.task_updated(task, previous.get(task.tid))
                 return 0, ""
             except sqlite3.Error as e:
+                self._rollback()
+                return 1, "Database error: {0}".format(e)
+        return 1, "There is no connection."
+
+    @instrumented
+    @synchronized
+    def update_tasks(self, tasks: Iterable[Task]) -> Tuple[int, str]:
+        """
+        Update many tasks in one transaction, writing only their changed
+        fields. Tasks that changed the same fields share one executemany.
+        :param tasks: Iterable of Task objects
+        :return: Tuple[Error, Message]
+        """
+        groups = {}  # type: Dict[FrozenSet[str], List[Task]]
+        for task in tasks:
+            if task.dirty_fields:
+                groups.setdefault(task.dirty_fields, []).append(task)
+        if self._cursor:
+            try:
+                if self._cache:
+                    previous = self._previous_check_list_ids(
+                        [task for group in groups.values() for task in group]
+                    )
+                    for group in groups.values():
+                        for task in group:
+                            self._cache.task_updated(task, previous.get(task.tid))
+                with self._savepoint():
+                    for dirty, group in groups.items():
+                        sql_statement, parameters = self._update_statement(dirty)
+                        self._cursor.executemany(sql_statement, map(parameters, group))
+                self.commit()
+            except sqlite3.Error as e:
+                self._rollback()
+                if self._cache:
+                    for group in groups.values():
+                        for task in group:
+                            self._cache.invalidate(task.check_list_id)
                 return 1, "Database error: {0}".format(e)
+            for dirty, group in groups.items():
+                for task in group:
+                    task.mark_clean(dirty)
+            return 0, ""
         return 1, "There is no connection."
 
-    def create_connection(self, database_url: str, foreign_keys: int = True) -> None:
+    def _previous_check_list_ids(self, tasks: List[Task]) -> Dict[int, int]:
         """
+        Read the stored check list of the tasks about to be moved, so that
+        the cache can drop the lists they leave. Runs under the lock before
+        the UPDATE.
+        :param tasks: Task objects
+        :return: Dict[Task ID, Check list ID] of the tasks whose check list changed
+        """
+        moved = [task.tid for task in tasks if "check_list_id" in task.dirty_fields]
+        if not moved or not self._cache:
+            return {}
+        self._cursor.execute(
+            """
+            SELECT ID, checkListID FROM Tasks
+            WHERE ID IN (SELECT value FROM json_each(?))
+            """,
+            (json.dumps(moved),),
+        )
+        return dict(self._cursor.fetchall())
+
+    @staticmethod
+    def _update_statement(dirty: FrozenSet[str]):
+        """
+        Build an UPDATE of the dirty columns.
+        :param dirty: Names of the changed Task fields
+        :return: Tuple[SQL statement, Function building the parameters of a task]
+        """
+        columns = [column for column in TASK_COLUMNS if column[0] in dirty]
+        sql_statement = "UPDATE Tasks SET {0} WHERE ID = ?;".format(
+            ", ".join("{0} = ?".format(column) for _, column, _ in columns)
+        )
+
+        def parameters(task: Task) -> tuple:
+            values = []
+            for field, _, convert in columns:
+                value = getattr(task, field)
+                values.append(convert(value) if convert else value)
+            values.append(task.tid)
+            return tuple(values)
 
+        return sql_statement, parameters
+
+    @instrumented
+    def set_done(self, tids: Iterable[int], done: bool) -> Tuple[int, str, int]:
+        """
+        Set the done flag of many tasks with one statement.
+        :param tids: Task IDs
+        :param done: New done flag
+        :return: Tuple[Error, Message, Number of changed tasks]
+        """
+        tids = json.dumps(list(tids))
+        return self._bulk_write(
+            """
+            UPDATE Tasks SET done = ?
+            WHERE done != ? AND ID IN (SELECT value FROM json_each(?))
+            """,
+            (done, done, tids),
+            tids=tids,
+        )
+
+    @instrumented
+    def mark_all_done(self, check_list_id: int) -> Tuple[int, str, int]:
+        """
+        Mark every task of a check list as done with one statement.
+        :param check_list_id: ID of the check list
+        :return: Tuple[Error, Message, Number of changed tasks]
+        """
+        return self._bulk_write(
+            "UPDATE Tasks SET done = 1 WHERE checkListID == ? AND done == 0",
+            (check_list_id,),
+            check_list_ids=(check_list_id,),
+        )
+
+    @instrumented
+    def move_tasks(
+        self, tids: Iterable[int], new_check_list_id: int
+    ) -> Tuple[int, str, int]:
+        """
+        Move many tasks to another check list with one statement.
+        :param tids: Task IDs
+        :param new_check_list_id: ID of the target check list
+        :return: Tuple[Error, Message, Number of moved tasks]
+        """
+        tids = json.dumps(list(tids))
+        return self._bulk_write(
+            """
+            UPDATE Tasks SET checkListID = ?
+            WHERE ID IN (SELECT value FROM json_each(?))
+            """,
+            (new_check_list_id, tids),
+            tids=tids,
+            check_list_ids=(new_check_list_id,),
+        )
+
+    @instrumented
+    def delete_tasks(self, tids: Iterable[int]) -> Tuple[int, str, int]:
+        """
+        Delete many tasks with one statement.
+        :param tids: Task IDs
+        :return: Tuple[Error, Message, Number of deleted tasks]
+        """
+        tids = json.dumps(list(tids))
+        return self._bulk_write(
+            "DELETE FROM Tasks WHERE ID IN (SELECT value FROM json_each(?))",
+            (tids,),
+            tids=tids,
+        )
+
+    @instrumented
+    def delete_done(self, check_list_id: int) -> Tuple[int, str, int]:
+        """
+        Delete the done tasks of a check list with one statement.
+        :param check_list_id: ID of the check list
+        :return: Tuple[Error, Message, Number of deleted tasks]
+        """
+        return self._bulk_write(
+            "DELETE FROM Tasks WHERE checkListID == ? AND done == 1",
+            (check_list_id,),
+            check_list_ids=(check_list_id,),
+        )
+
+    @synchronized
+    def _bulk_write(
+        self,
+        sql_statement: str,
+        parameters: tuple,
+        tids: str = None,
+        check_list_ids: Iterable[int] = (),
+    ) -> Tuple[int, str, int]:
+        """
+        Run one set-based write and commit it. Queued updates are written
+        first so they cannot overwrite the result later.
+        :param sql_statement: UPDATE or DELETE statement
+        :param parameters: Parameters of the statement
+        :param tids: JSON array of the affected task IDs, if known
+        :param check_list_ids: IDs of the affected check lists
+        :return: Tuple[Error, Message, Number of affected rows]
+        """
+        if not self._cursor:
+            return 1, "There is no connection.", 0
+        self._flush_queued()
+        check_list_ids = set(check_list_ids)
+        try:
+            if tids is not None and self._cache:
+                self._cursor.execute(
+                    """
+                    SELECT DISTINCT checkListID FROM Tasks
+                    WHERE ID IN (SELECT value FROM json_each(?))
+                    """,
+                    (tids,),
+                )
+                check_list_ids.update(row[0] for row in self._cursor.fetchall())
+            self._cursor.execute(sql_statement, parameters)
+            count = self._cursor.rowcount
+            self.commit()
+        except sqlite3.Error as e:
+            self._rollback()
+            return 1, "Database error: {0}".format(e), 0
+        if self._cache:
+            for check_list_id in check_list_ids:
+                self._cache.invalidate(check_list_id)
+        return 0, "", count
+
+    def enable_write_behind(
+        self,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ) -> None:
+        """
+        Make queue_update_task buffer updates instead of writing them right
+        away. Queued updates are written by flush, flush_if_due, before tasks
+        are read and on close_connection.
+        :param max_pending: Number of queued tasks that triggers a flush
+        :param flush_interval: Seconds after which queued updates are due
+        :return: None
+        """
+        self._write_behind = WriteBehindQueue(
+            write=self.update_tasks,
+            max_pending=max_pending,
+            flush_interval=flush_interval,
+        )
+
+    @synchronized
+    def enable_instrumentation(
+        self, sinks: Iterable = (), slow_threshold: float = DEFAULT_SLOW_THRESHOLD
+    ) -> Instrumentation:
+        """
+        Record latency, rows and errors of every controller call and SQL
+        statement until disable_instrumentation.
+        :param sinks: Receivers of slow-query events and snapshots, see
+            src.instrumentation
+        :param slow_threshold: Seconds above which a call or statement is logged
+        :return: Instrumentation holding the metrics
+        """
+        self._instrumentation = Instrumentation(
+            sinks=sinks, slow_threshold=slow_threshold
+        )
+        self._set_trace_callback(self._instrumentation.trace)
+        return self._instrumentation
+
+    @synchronized
+    def disable_instrumentation(self) -> None:
+        """
+
+        :return: None
+        """
+        self._instrumentation = None
+        self._set_trace_callback(None)
+
+    @property
+    def instrumentation(self) -> Optional[Instrumentation]:
+        """
+
+        :return: Instrumentation or None if disabled
+        """
+        return self._instrumentation
+
+    @property
+    def durability_degraded(self) -> bool:
+        """
+        Whether a database kept in memory failed to write its redo journal or
+        its file since the last successful persist, so that a crash can lose
+        committed changes. Errors are reported through the instrumentation.
+        :return: bool
+        """
+        return self._working_set is not None and self._working_set.degraded
+
+    def _set_trace_callback(self, callback) -> None:
+        """
+
+        :param callback: sqlite3 trace callback or None
+        :return: None
+        """
+        if self._connection:
+            self._connection.set_trace_callback(callback)
+        if self._readers:
+            self._readers.set_trace_callback(callback)
+
+    @synchronized
+    def subscribe(self, subscriber: Subscriber) -> Callable[[], None]:
+        """
+        Call subscriber with the changes of every commit of this controller
+        and with the changes of other connections found by poll_changes.
+        It is called while the controller's lock is held, on the thread that
+        committed or polled, so it should only hand the changes over.
+        :param subscriber: Called with a list of Change objects
+        :return: Function removing the subscriber
+        """
+        self._subscribers.append(subscriber)
+        if self._cursor and self._change_seq is None:
+            self._read_changes()
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if subscriber in self._subscribers:
+                    self._subscribers.remove(subscriber)
+
+        return unsubscribe
+
+    @instrumented
+    @synchronized
+    def poll_changes(self) -> Tuple[int, str, List[Change]]:
+        """
+        Publish the changes committed by other connections, such as another
+        process using the same database. PRAGMA data_version only changes
+        when another connection commits, so polling an unchanged database
+        costs one pragma. Changes are read by the sequence numbers the
+        triggers keep, so only changed rows are read. The first poll only
+        records the current position.
+        :return: Tuple[Error, Message, Changes]
+        """
+        if not self._cursor:
+            return 1, "There is no connection.", []
+        try:
+            if self._change_seq is not None:
+                version = self._connection.execute("PRAGMA data_version").fetchone()
+                if version[0] == self._data_version:
+                    return 0, "", []
+            changes = self._read_changes()
+        except sqlite3.Error as e:
+            return 1, "Database error: {0}".format(e), []
+        self._deliver_changes(changes)
+        return 0, "", changes
+
+    def _publish_changes(self, reset: bool = False) -> None:
+        """
+        Read and deliver the changes after a commit, if anyone subscribed.
+        :param reset: Publish RESET, the database was replaced
+        :return: None
+        """
+        if not self._subscribers:
+            return
+        try:
+            changes = self._read_changes(reset)
+        except sqlite3.Error as e:
+            self._report_error(
+                "_publish_changes", "Reading the changes failed: {0}".format(e)
+            )
+            return
+        self._deliver_changes(changes)
+
+    def _deliver_changes(self, changes: List[Change]) -> None:
+        """
+
+        :param changes: Changes to apply to the cache and pass to subscribers
+        :return: None
+        """
+        if not changes:
+            return
+        if self._cache:
+            self._cache.apply_changes(changes)
+        for subscriber in list(self._subscribers):
+            subscriber(changes)
+
+    def _read_changes(self, reset: bool = False) -> List[Change]:
+        """
+        Read what changed since the last read in one read transaction. If
+        the removals needed to describe the changes were pruned, or the
+        database was replaced, a single RESET is returned instead.
+        :param reset: Return RESET if anything changed
+        :return: List of Change objects ordered by sequence number
+        """
+        if self._connection.in_transaction:
+            return []  # Read after the commit of the open transaction
+        since = self._change_seq
+        self._connection.execute("BEGIN")
+        try:
+            seq, pruned_seq = self._connection.execute(
+                "SELECT seq, prunedSeq FROM ChangeCounter"
+            ).fetchone()
+            self._data_version = self._connection.execute(
+                "PRAGMA data_version"
+            ).fetchone()[0]
+            if since is None or (seq == since and not reset):
+                changes = []
+            elif reset or seq < since or since < pruned_seq:
+                changes = [Change(RESET, seq)]
+            else:
+                changes = self._changes_since(since)
+        finally:
+            self._connection.commit()
+        self._change_seq = seq
+        return changes
+
+    def _changes_since(self, since: int) -> List[Change]:
+        """
+        Describe the changes after sequence number since relative to the
+        state at since: tasks and check lists created and removed again in
+        between are left out, a task's first removal tells which check list
+        it was in.
+        :param since: Sequence number of the last change already published
+        :return: List of Change objects ordered by sequence number
+        """
+        cursor = self._connection.cursor()
+        left = {}  # type: Dict[int, int]
+        removed_seq = {}  # type: Dict[int, int]
+        cursor.execute(
+            """
+            SELECT ID, checkListID, changeSeq FROM TaskRemovals
+            WHERE changeSeq > ? AND createdSeq <= ?
+            ORDER BY changeSeq
+            """,
+            (since, since),
+        )
+        for tid, cid, seq in cursor:
+            left.setdefault(tid, cid)
+            removed_seq[tid] = seq
+
+        changes = []
+        cursor.execute(
+            """
+            SELECT {0}, createdSeq, changeSeq FROM Tasks
+            WHERE changeSeq > ?
+            """.format(
+                TASK_SELECT_COLUMNS
+            ),
+            (since,),
+        )
+        for row in cursor:
+            task = task_row_factory(cursor, row[:5])
+            created_seq, seq = row[5:]
+            cid = task.check_list_id
+            if created_seq > since:
+                kind = TASK_ADDED
+            elif task.tid in left:
+                cid = left.pop(task.tid)
+                kind = TASK_MOVED if cid != task.check_list_id else TASK_UPDATED
+            else:
+                kind = TASK_UPDATED
+            changes.append(Change(kind, seq, task.tid, cid, task=task))
+        for tid, cid in left.items():
+            changes.append(Change(TASK_DELETED, removed_seq[tid], tid, cid))
+
+        cursor.execute(
+            """
+            SELECT ID, name, description, createdSeq, changeSeq FROM CheckLists
+            WHERE changeSeq > ?
+            """,
+            (since,),
+        )
+        for row in cursor:
+            check_list = check_list_row_factory(cursor, row[:3])
+            kind = CHECK_LIST_ADDED if row[3] > since else CHECK_LIST_UPDATED
+            changes.append(
+                Change(kind, row[4], cid=check_list.cid, check_list=check_list)
+            )
+        cursor.execute(
+            """
+            SELECT ID, changeSeq FROM CheckListRemovals
+            WHERE changeSeq > ? AND createdSeq <= ?
+            """,
+            (since, since),
+        )
+        for cid, seq in cursor:
+            changes.append(Change(CHECK_LIST_DELETED, seq, cid=cid))
+        changes.sort(key=lambda change: change.seq)
+        return changes
+
+    @instrumented
+    @synchronized
+    def queue_update_task(self, task: Task) -> Tuple[int, str]:
+        """
+        Update the task through the write-behind queue if it is enabled.
+        :param task: Task object
+        :return: Tuple[Error, Message]
+        """
+        if self._write_behind is None:
+            return self.update_task(task)
+        if self._cache:
+            # A queued state is newer than the stored one
+            queued = self._write_behind.get(task.tid)
+            if queued is not None:
+                previous = queued.check_list_id
+            else:
+                try:
+                    previous = self._previous_check_list_ids([task]).get(task.tid)
+                except sqlite3.Error:
+                    previous = None
+                    self._cache.clear()
+            self._cache.task_updated(task, previous)
+        return self._write_behind.put(task)
+
+    @instrumented
+    @synchronized
+    def flush(self) -> Tuple[int, str]:
+        """
+        Write the queued updates.
+        :return: Tuple[Error, Message]
+        """
+        if self._write_behind is None:
+            return 0, ""
+        return self._write_behind.flush()
+
+    @instrumented
+    @synchronized
+    def flush_if_due(self) -> Tuple[int, str]:
+        """
+        Write the queued updates if the oldest one has waited long enough.
+        Meant to be polled from a timer.
+        :return: Tuple[Error, Message]
+        """
+        if self._write_behind is not None and self._write_behind.due:
+            return self._write_behind.flush()
+        return 0, ""
+
+    def _flush_queued(self) -> None:
+        """
+        Write the queued updates before a read or a set-based write, so that
+        it sees them. The lock is only taken if updates are queued, so reads
+        on the pool do not wait for a writer.
+        :return: None
+        """
+        if self._write_behind:
+            with self._lock:
+                err, message = self._write_behind.flush()
+            if err:
+                self._report_error("_flush_queued", message)
+
+    def _report_error(self, method: str, message: str) -> None:
+        """
+        Report an error that cannot be returned to a caller: to the
+        instrumentation sinks if enabled, to stderr otherwise.
+        :param method: Method the error happened in
+        :param message: Error message
+        :return: None
+        """
+        if self._instrumentation is not None:
+            self._instrumentation.record_error(method, message)
+        else:
+            print(message, file=sys.stderr)
+
+    @synchronized
+    def create_connection(
+        self,
+        database_url: str,
+        foreign_keys: int = True,
+        wal: bool = False,
+        readers: int = 0,
+        timeout: float = DEFAULT_BUSY_TIMEOUT,
+        in_memory: bool = False,
+        persist_interval: float = DEFAULT_PERSIST_INTERVAL,
+    ) -> None:
+        """
+        Open the database and upgrade its schema to the latest version.
         :param database_url:
         :param foreign_keys:
+        :param wal: Use the write-ahead log so that reads do not wait for writes
+        :param readers: Size of the read-only connection pool, 0 reads on the writer
+        :param timeout: Seconds to wait for a lock held by another connection
+        :param in_memory: Load the file into memory and serve every read and
+            write from there, see WorkingSet. Commits cost no disk sync; the
+            file is written every persist_interval seconds and on
+            close_connection, and a crash is recovered from the redo
+            journal. The file is locked meanwhile and readers is ignored.
+        :param persist_interval: Seconds between writes of the file in memory mode
         :return:
         """
-        self._connection = sqlite3.connect(database_url)
+        self._database_url = database_url
+        if in_memory and database_url != ":memory:":
+            self._working_set = WorkingSet(
+                database_url,
+                timeout,
+                ("PRAGMA journal_mode = WAL",) + WAL_PRAGMAS if wal else (),
+                persist_interval,
+                self._report_error,
+            )
+            self._connection = self._working_set.load()
+        else:
+            self._connection = sqlite3.connect(
+                database_url, timeout=timeout, check_same_thread=False
+            )
         if foreign_keys:
             self._connection.execute("PRAGMA foreign_keys = 1")
+        # Applies when the file is created; an older database switches at
+        # its next vacuum. archive_done then frees pages without a VACUUM.
+        self._connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        if wal and not self._working_set:
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            for pragma in WAL_PRAGMAS:
+                self._connection.execute(pragma)
+        version = get_schema_version(self._connection)
+        migrated = migrate(self._connection) != version
         self._cursor = self._connection.cursor()
+        if self._working_set:
+            if self._working_set.replay() or migrated:
+                self._working_set.persist()
+            self._working_set.start(self._persist_in_background)
+        elif readers and database_url != ":memory:":
+            self._readers = ConnectionPool(
+                database_url, size=readers, pragmas=WAL_PRAGMAS if wal else ()
+            )
+        if self._instrumentation:
+            self._set_trace_callback(self._instrumentation.trace)
+        self._change_seq = None
+        if self._working_set:
+            self._stop_recording = self.subscribe(self._working_set.record)
+        if self._subscribers:
+            self._read_changes()
 
+    @instrumented
+    @synchronized
     def add_check_list(self, check_list: CheckList) -> Tuple[int, str]:
         """
         """
@@ -139,25 +1534,401 @@ class TaskController(object):
                     sql_statement, (check_list.name, check_list.description)
                 )
                 self.commit()
+                check_list.cid = self._cursor.lastrowid
+                if self._cache:
+                    self._cache.invalidate_check_lists()
             except sqlite3.Error as e:
+                self._rollback()
                 return 1, "Database error: {0}".format(e)
             return 0, ""
         return 1, "There is no connection."
 
+    def cache_stats(self) -> Dict[str, int]:
+        """
+
+        :return: Dict with hits, misses, entries and size of the read cache
+        """
+        if self._cache is None:
+            return {"hits": 0, "misses": 0, "entries": 0, "size": 0}
+        return self._cache.stats()
+
+    @instrumented
+    def archive_done(
+        self,
+        min_age: int = DEFAULT_ARCHIVE_AGE,
+        batch_size: int = DEFAULT_ARCHIVE_BATCH_SIZE,
+        today: date = None,
+    ) -> Tuple[int, str, int]:
+        """
+        Move the tasks done at least min_age days ago from Tasks to
+        ArchivedTasks, so that the hot table and its indexes only hold open
+        and recently done tasks. Each batch is its own transaction and the
+        lock is released between batches, so writers never wait long. The
+        pages a batch frees are given back to the file system with an
+        incremental vacuum instead of a blocking VACUUM.
+        Archived tasks leave their check list, its counters and the change
+        feed like deleted tasks; pass include_archived to read them.
+        :param min_age: Days since a task was marked done
+        :param batch_size: Tasks moved per transaction
+        :param today: Reference date, defaults to the local date
+        :return: Tuple[Error, Message, Number of archived tasks]
+        """
+        if not self._cursor:
+            return 1, "There is no connection.", 0
+        if batch_size < 1:
+            return 1, "Batch size must be positive.", 0
+        if self._transaction_depth:
+            return 1, "Tasks can not be archived inside a transaction.", 0
+        today_day = to_epoch_day(today) if today else today_epoch_day()
+        archived = 0
+        count = batch_size
+        try:
+            while count == batch_size:
+                with self.transaction():
+                    self._cursor.execute(
+                        """
+                        SELECT ID FROM Tasks
+                        WHERE done != 0 AND doneDay <= ?
+                        ORDER BY doneDay
+                        LIMIT ?
+                        """,
+                        (today_day - min_age, batch_size),
+                    )
+                    tids = json.dumps([row[0] for row in self._cursor.fetchall()])
+                    self._cursor.execute(
+                        """
+                        INSERT INTO ArchivedTasks (ID, dueDate, dueDay, description,
+                                                   done, checkListID, doneDay,
+                                                   archivedDay)
+                        SELECT ID, dueDate, dueDay, description, done, checkListID,
+                               doneDay, ?
+                        FROM Tasks WHERE ID IN (SELECT value FROM json_each(?))
+                        """,
+                        (today_day, tids),
+                    )
+                    count = self._cursor.rowcount
+                    self._cursor.execute(
+                        """
+                        DELETE FROM Tasks
+                        WHERE ID IN (SELECT value FROM json_each(?))
+                        """,
+                        (tids,),
+                    )
+                    # Frees one page per step, so it is stepped to the end
+                    self._cursor.execute("PRAGMA incremental_vacuum").fetchall()
+                archived += count
+        except sqlite3.Error as e:
+            return 1, "Database error: {0}".format(e), archived
+        finally:
+            if self._cache and archived:
+                self._cache.clear()
+        return 0, "", archived
+
+    @instrumented
+    @synchronized
+    def vacuum(
+        self, removals_kept: int = DEFAULT_REMOVALS_KEPT
+    ) -> Tuple[int, str]:
+        """
+        Compact the database: prune the change feed's old removal rows,
+        merge the full-text index segments, rebuild the file with VACUUM,
+        refresh the query planner statistics and truncate the write-ahead
+        log. Feeds further behind than removals_kept changes get a RESET.
+        The rebuild also switches a database created before incremental
+        auto-vacuum was enabled.
+        :param removals_kept: Number of recent changes whose removals are kept
+        :return: Tuple[Error, Message]
+        """
+        if not self._cursor:
+            return 1, "There is no connection."
+        if self._transaction_depth:
+            return 1, "The database can not be vacuumed inside a transaction."
+        self._flush_queued()
+        try:
+            if self._connection.in_transaction:
+                self._connection.commit()
+            self._cursor.execute(
+                "UPDATE ChangeCounter SET prunedSeq = MAX(prunedSeq, seq - ?)",
+                (removals_kept,),
+            )
+            for table in ("TaskRemovals", "CheckListRemovals"):
+                self._cursor.execute(
+                    "DELETE FROM {0} WHERE changeSeq <= "
+                    "(SELECT prunedSeq FROM ChangeCounter)".format(table)
+                )
+            self._cursor.execute("INSERT INTO TasksFTS (TasksFTS) VALUES ('optimize')")
+            self.commit()
+            self._cursor.execute("VACUUM")
+            self._cursor.execute("PRAGMA optimize")
+            self._cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            self._rollback()
+            return 1, "Database error: {0}".format(e)
+        if self._working_set:
+            # The file is only compacted when it is overwritten
+            return self.persist()
+        return 0, ""
+
+    def _rollback(self) -> None:
+        """
+        Roll back after a failed write outside a transaction block, so that
+        the transaction sqlite3 began for it does not keep the write lock and
+        hold back the change feed. A failed statement undid its own changes;
+        inside a block the rest of the transaction is up to the block.
+        :return: None
+        """
+        if not self._transaction_depth and self._connection.in_transaction:
+            self._connection.rollback()
+
+    @synchronized
     def commit(self) -> None:
         """
+        Commit, unless the call is inside a transaction block.
+        :return: None
+        """
+        if not self._transaction_depth:
+            self._connection.commit()
+            self._publish_changes()
+
+    @instrumented
+    @synchronized
+    def persist(self) -> Tuple[int, str]:
+        """
+        Write a database kept in memory to its file now and empty the redo
+        journal. Runs on its own every persist interval while there are
+        changes, and on close_connection.
+        :return: Tuple[Error, Message]
+        """
+        if not self._working_set:
+            return 1, "The database is not kept in memory."
+        if self._transaction_depth:
+            return 1, "The database can not be persisted inside a transaction."
+        try:
+            self._working_set.persist()
+        except (sqlite3.Error, OSError) as e:
+            return 1, "Persisting failed: {0}".format(e)
+        return 0, ""
+
+    def _persist_in_background(self) -> Tuple[int, str]:
+        """
+        persist for the working set's thread. The connection may have been
+        closed while the thread waited for the lock; then there is nothing
+        to persist and no error.
+        :return: Tuple[Error, Message]
+        """
+        with self._lock:
+            if not self._working_set:
+                return 0, ""
+            return self.persist()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Run several writes as one transaction. The commits of the methods
+        called in the block are deferred to its end, so related writes are
+        applied together or not at all and pay for one commit. The block
+        holds the lock and its reads see its own writes. If it raises, its
+        writes are rolled back, the read cache is cleared and the exception
+        propagates. A nested block is a savepoint, so if it raises only its
+        own writes are rolled back. A failing commit raises sqlite3.Error.
 
+        A method that fails inside the block returns its error as usual and
+        leaves the other writes in place; raise to roll them back.
         :return: None
         """
-        self._connection.commit()
+        with self._lock:
+            if not self._cursor:
+                raise sqlite3.ProgrammingError("There is no connection.")
+            if self._transaction_depth:
+                self._transaction_depth += 1
+                try:
+                    with self._savepoint():
+                        yield
+                except BaseException:
+                    if self._cache:
+                        self._cache.clear()
+                    raise
+                finally:
+                    self._transaction_depth -= 1
+                return
+            self._flush_queued()
+            if self._connection.in_transaction:
+                self._connection.commit()
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._transaction_depth = 1
+            self._transaction_owner = threading.get_ident()
+            try:
+                yield
+            except BaseException:
+                self._connection.rollback()
+                if self._cache:
+                    self._cache.clear()
+                raise
+            finally:
+                self._transaction_depth = 0
+                self._transaction_owner = None
+            try:
+                self._connection.commit()
+            except sqlite3.Error:
+                self._connection.rollback()
+                if self._cache:
+                    self._cache.clear()
+                raise
+            self._publish_changes()
 
-    def close_connection(self) -> None:
+    @contextmanager
+    def _savepoint(self) -> Iterator[None]:
+        """
+        Make the statements of the block atomic without ending an enclosing
+        transaction: if the block raises, only its changes are rolled back.
+        Outside a transaction the savepoint starts one and releasing it
+        commits, so the block must not call commit itself.
+        :return: None
+        """
+        self._savepoints += 1
+        name = "sp{0}".format(self._savepoints)
+        try:
+            self._cursor.execute("SAVEPOINT " + name)
+            try:
+                yield
+            except BaseException:
+                self._cursor.execute("ROLLBACK TO " + name)
+                self._cursor.execute("RELEASE " + name)
+                raise
+            self._cursor.execute("RELEASE " + name)
+        finally:
+            self._savepoints -= 1
+
+    def unit_of_work(self) -> UnitOfWork:
         """
 
+        :return: Empty UnitOfWork writing through this controller
+        """
+        return UnitOfWork(self)
+
+    def backup(
+        self,
+        directory: str,
+        pages: int = DEFAULT_BACKUP_PAGES,
+        progress: Progress = None,
+        keep: int = DEFAULT_KEEP,
+        sleep: float = DEFAULT_BACKUP_SLEEP,
+    ) -> BackupJob:
+        """
+        Start writing a snapshot of the database into directory on a
+        background thread. Reads and writes go on while it runs. After a
+        successful backup only the newest keep snapshots are kept.
+        :param directory: Backup directory, created if missing
+        :param pages: Pages copied per step
+        :param progress: Optional callback called with (pages copied, total
+            pages) on the backup thread
+        :param keep: Number of snapshots kept, 0 keeps all
+        :param sleep: Seconds between steps
+        :return: BackupJob, its wait() returns Tuple[Error, Message or path]
+        """
+        os.makedirs(directory, exist_ok=True)
+        database_url = self._database_url
+
+        def on_done(job: BackupJob) -> None:
+            if job.result[0] == 0:
+                rotate_snapshots(directory, database_url, keep)
+
+        job = BackupJob(
+            open_source=self._open_backup_source,
+            target_path=os.path.join(directory, snapshot_name(database_url)),
+            pages=pages,
+            progress=progress,
+            sleep=sleep,
+            on_done=on_done,
+        )
+        return job.start()
+
+    def _open_backup_source(self) -> Tuple[sqlite3.Connection, Callable[[], None]]:
+        """
+        Runs on the backup thread. In WAL mode the source is a new read-only
+        connection holding a read transaction, which pins one snapshot of
+        the database without blocking writers. In rollback journal mode a
+        read transaction would block commits for the whole backup, so none is
+        held and the backup API restarts the copy when the database changes.
+        An in-memory database can only be copied from the writer connection.
+        :return: Tuple[Connection, Function releasing it]
+        """
+        self._flush_queued()
+        if self._database_url == ":memory:" or self._working_set:
+            return self._connection, lambda: None
+        with self._lock:
+            journal_mode = self._connection.execute("PRAGMA journal_mode").fetchone()
+        uri = "{0}?mode=ro".format(Path(self._database_url).resolve().as_uri())
+        source = sqlite3.connect(uri, uri=True, isolation_level=None)
+        if journal_mode[0].lower() == "wal":
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        return source, source.close
+
+    @synchronized
+    def restore(self, snapshot_path: str) -> Tuple[int, str]:
+        """
+        Replace the contents of the database with a snapshot written by
+        backup. The snapshot is checked first and upgraded to the current
+        schema after the copy; the read cache is cleared.
+        :param snapshot_path: Path of the snapshot
+        :return: Tuple[Error, Message]
+        """
+        if not self._cursor:
+            return 1, "There is no connection."
+        if self._transaction_depth:
+            return 1, "The database can not be restored inside a transaction."
+        if not os.path.isfile(snapshot_path):
+            return 1, "There is no snapshot {0}.".format(snapshot_path)
+        self._flush_queued()
+        uri = "{0}?mode=ro".format(Path(snapshot_path).resolve().as_uri())
+        try:
+            snapshot = sqlite3.connect(uri, uri=True)
+            try:
+                check = snapshot.execute("PRAGMA quick_check").fetchone()[0]
+                if check != "ok":
+                    return 1, "The snapshot is damaged: {0}".format(check)
+                if self._connection.in_transaction:
+                    self._connection.commit()
+                snapshot.backup(self._connection)
+            finally:
+                snapshot.close()
+            migrate(self._connection)
+        except sqlite3.Error as e:
+            self._rollback()
+            return 1, "Restore failed: {0}".format(e)
+        finally:
+            if self._cache:
+                self._cache.clear()
+        self._publish_changes(reset=True)
+        return 0, ""
+
+    @synchronized
+    def close_connection(self) -> None:
+        """
+        Write the queued updates and close the connection.
         :return: None
         """
+        if self._connection is None:
+            return
+        err, message = self.flush()
+        if err:
+            self._report_error("close_connection", message)
+        if self._readers:
+            self._readers.close()
+            self._readers = None
+        if self._working_set:
+            self._stop_recording()
+            err, message = self.persist()
+            if err:
+                self._report_error("close_connection", message)
+            self._working_set.close(persisted=not err)
+            self._working_set = None
         self._connection.close()
+        self._connection = None
+        self._cursor = None
 
+    @synchronized
     def create_tasks_table(self) -> None:
         """
         :return:
@@ -179,8 +1950,9 @@ class TaskController(object):
 
             self._cursor.execute(sql_statement)
         except sqlite3.Error as e:
-            print(e)
+            self._report_error("create_tasks_table", "Database error: {0}".format(e))
 
+    @synchronized
     def create_check_lists_table(self) -> None:
         """
         :return:
@@ -196,4 +1968,6 @@ class TaskController(object):
                             """
             self._cursor.execute(sql_statement)
         except sqlite3.Error as e:
-            print(e)
+            self._report_error(
+                "create_check_lists_table", "Database error: {0}".format(e)
+            )
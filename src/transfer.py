@@ -0,0 +1,331 @@
+import csv
+import io
+import json
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from src.check_list import CheckList
+from src.due_date import normalize_due_date
+from src.task import Task
+from src.task_controller import DEFAULT_CHUNK_SIZE, TaskController
+
+CSV = "csv"
+JSONL = "jsonl"
+FORMATS = (CSV, JSONL)
+FIELDS = ("check_list", "description", "due_date", "done")
+TRUE_VALUES = frozenset(("1", "true", "yes", "y", "x", "done"))
+FALSE_VALUES = frozenset(("", "0", "false", "no", "n"))
+
+# (line number, check list name, description, due date, done)
+Record = Tuple[int, str, str, str, bool]
+
+
+class TransferError(ValueError):
+    """
+    A record of the input can not be imported.
+    """
+
+
+def format_of(path: str, default: str = CSV) -> str:
+    """
+
+    :param path: File name
+    :return: CSV or JSONL, from the extension
+    """
+    if path.endswith((".jsonl", ".ndjson", ".json")):
+        return JSONL
+    if path.endswith(".csv"):
+        return CSV
+    return default
+
+
+def open_text(path: str, mode: str) -> TextIO:
+    """
+    Open an import or export file as UTF-8 text without newline translation,
+    which the csv module needs.
+    :param path: File path, - for stdin or stdout
+    :param mode: r or w
+    :return: TextIO; stdin and stdout are not closed with it
+    """
+    if path == "-":
+        stream = sys.stdin if mode == "r" else sys.stdout
+        return open(stream.fileno(), mode, encoding="utf-8", newline="", closefd=False)
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def _done(value, line: int) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else "").strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise TransferError("Line {0}: Invalid done value {1!r}.".format(line, value))
+
+
+def _record(line: int, values: dict) -> Record:
+    """
+
+    :param line: Line number of the record
+    :param values: Dict with the FIELDS
+    :return: Record
+    """
+    if not isinstance(values, dict):
+        raise TransferError("Line {0}: The record is not an object.".format(line))
+    description = values.get("description")
+    if not description:
+        raise TransferError("Line {0}: The description is missing.".format(line))
+    check_list = values.get("check_list")
+    if not check_list:
+        raise TransferError("Line {0}: The check list is missing.".format(line))
+    due_date = values.get("due_date") or ""
+    if not isinstance(due_date, str):
+        raise TransferError(
+            "Line {0}: Invalid due date {1!r}.".format(line, values["due_date"])
+        )
+    due_date = normalize_due_date(due_date)
+    done = _done(values.get("done"), line)
+    return line, str(check_list), str(description), due_date, done
+
+
+def parse_chunk(format_: str, header: Optional[List[str]], first_line: int, text: str):
+    """
+    Parse a chunk of whole records. Runs in a worker process when importing
+    in parallel, so it only takes and returns plain values.
+    :param format_: CSV or JSONL
+    :param header: CSV column names
+    :param first_line: Line number of the first line of text
+    :param text: Records, one per line (CSV records may span lines)
+    :return: List of Records or the TransferError message
+    """
+    records = []
+    try:
+        if format_ == CSV:
+            reader = csv.DictReader(io.StringIO(text), fieldnames=header)
+            for values in reader:
+                records.append(_record(first_line + reader.line_num - 1, values))
+        else:
+            for offset, line in enumerate(text.split("\n")):
+                if not line.strip():
+                    continue
+                try:
+                    values = json.loads(line)
+                except ValueError as e:
+                    raise TransferError(
+                        "Line {0}: {1}".format(first_line + offset, e)
+                    ) from None
+                records.append(_record(first_line + offset, values))
+    except TransferError as e:
+        return str(e)
+    return records
+
+
+def _text_chunks(
+    file: TextIO, format_: str, chunk_size: int
+) -> Iterator[Tuple[int, str]]:
+    """
+    Split the input into chunks of about chunk_size records without parsing
+    them. A CSV chunk only ends where the number of quotes read is even, so
+    quoted fields that span lines stay in one chunk.
+    :param file: Input positioned after the CSV header
+    :param format_: CSV or JSONL
+    :param chunk_size: Records per chunk
+    :return: Iterator of (line number of the first line, text)
+    """
+    lines = []
+    quotes = 0
+    line_number = first_line = 2 if format_ == CSV else 1
+    for line in file:
+        if format_ == CSV:
+            quotes += line.count('"')
+        lines.append(line)
+        line_number += 1
+        if len(lines) >= chunk_size and quotes % 2 == 0:
+            yield first_line, "".join(lines)
+            lines = []
+            first_line = line_number
+    if lines:
+        yield first_line, "".join(lines)
+
+
+def _parsed_chunks(
+    file: TextIO, format_: str, chunk_size: int, workers: int
+) -> Iterator[List[Record]]:
+    """
+
+    :param file: Input
+    :param format_: CSV or JSONL
+    :param chunk_size: Records per chunk
+    :param workers: Parsing processes, 0 parses in this process
+    :return: Iterator of lists of Records, in input order
+    """
+    header = None
+    if format_ == CSV:
+        header = next(csv.reader([file.readline()]), None)
+        if "description" not in (header or ()):
+            raise TransferError("Line 1: The CSV header has no description column.")
+    chunks = _text_chunks(file, format_, chunk_size)
+
+    if not workers:
+        for first_line, text in chunks:
+            yield _checked(parse_chunk(format_, header, first_line, text))
+        return
+
+    # At most two chunks per worker are in flight, so memory stays bounded
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for first_line, text in chunks:
+            pending.append(
+                executor.submit(parse_chunk, format_, header, first_line, text)
+            )
+            if len(pending) >= 2 * workers:
+                yield _checked(pending.pop(0).result())
+        for future in pending:
+            yield _checked(future.result())
+
+
+def _checked(result) -> List[Record]:
+    if isinstance(result, str):
+        raise TransferError(result)
+    return result
+
+
+def _check_list_ids(task_controller: TaskController) -> Dict[str, int]:
+    """
+
+    :param task_controller: TaskController Object
+    :return: Dict of check list name -> ID
+    """
+    err, message, check_lists = task_controller.get_check_lists()
+    if err:
+        raise TransferError(message)
+    return {check_list.name: check_list.cid for check_list in check_lists}
+
+
+def import_tasks(
+    task_controller: TaskController,
+    file: TextIO,
+    format_: str = CSV,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 0,
+    create_check_lists: bool = True,
+) -> Tuple[int, str, int]:
+    """
+    Stream tasks from CSV or JSON Lines into the database, one transaction
+    per chunk. Records name their check list, which is looked up in a name
+    to ID map read once; unknown check lists are created. Memory use does
+    not grow with the input. The import stops at the first invalid record,
+    after the chunks before it were written.
+    1 = Invalid input or database error
+    0 = No error
+    :param task_controller: TaskController Object
+    :param file: Text input with a header line for CSV
+    :param format_: CSV or JSONL
+    :param chunk_size: Records per transaction
+    :param workers: Processes parsing chunks in parallel, 0 for none
+    :param create_check_lists: Create missing check lists instead of failing
+    :return: Tuple[Error, Message, Number of imported tasks]
+    """
+    if format_ not in FORMATS:
+        return 1, "Unknown format {0!r}.".format(format_), 0
+    imported = 0
+    try:
+        check_list_ids = _check_list_ids(task_controller)
+        for records in _parsed_chunks(file, format_, chunk_size, workers):
+            tasks = []
+            for line, name, description, due_date, done in records:
+                cid = check_list_ids.get(name)
+                if cid is None:
+                    if not create_check_lists:
+                        raise TransferError(
+                            "Line {0}: Unknown check list {1!r}.".format(line, name)
+                        )
+                    cid = _create_check_list(task_controller, name, line)
+                    check_list_ids[name] = cid
+                tasks.append(
+                    Task(
+                        description=description,
+                        due_date=due_date,
+                        check_list_id=cid,
+                        done=done,
+                    )
+                )
+            err, message, ids = task_controller.add_tasks(tasks, chunk_size, bulk=True)
+            imported += len(ids)
+            if err:
+                return err, message, imported
+    except TransferError as e:
+        return 1, str(e), imported
+    except (csv.Error, UnicodeDecodeError) as e:
+        return 1, "Invalid input: {0}".format(e), imported
+    return 0, "", imported
+
+
+def _create_check_list(task_controller: TaskController, name: str, line: int) -> int:
+    """
+
+    :param task_controller: TaskController Object
+    :param name: Check list name
+    :param line: Line number of the record naming it
+    :return: ID of the new check list
+    """
+    err, message, ids = task_controller.add_check_lists([CheckList(name, "")])
+    if err:
+        raise TransferError("Line {0}: {1}".format(line, message))
+    return ids[0]
+
+
+def export_tasks(
+    task_controller: TaskController,
+    file: TextIO,
+    format_: str = CSV,
+    check_list_id: int = None,
+    include_archived: bool = False,
+) -> Tuple[int, str, int]:
+    """
+    Stream every task, or the tasks of one check list, to CSV or JSON Lines
+    in ID order. Rows are read page by page, so memory use does not grow
+    with the database.
+    1 = Database error
+    0 = No error
+    :param task_controller: TaskController Object
+    :param file: Text output
+    :param format_: CSV or JSONL
+    :param check_list_id: ID of the check list or None for all tasks
+    :param include_archived: Also export archived tasks
+    :return: Tuple[Error, Message, Number of exported tasks]
+    """
+    if format_ not in FORMATS:
+        return 1, "Unknown format {0!r}.".format(format_), 0
+    exported = 0
+    rows = task_controller.iter_task_rows(
+        check_list_id=check_list_id, include_archived=include_archived
+    )
+    try:
+        if format_ == CSV:
+            writer = csv.writer(file, lineterminator="\n")
+            writer.writerow(FIELDS)
+            for _, name, description, due_date, done in rows:
+                writer.writerow((name, description, due_date or "", 1 if done else 0))
+                exported += 1
+        else:
+            for _, name, description, due_date, done in rows:
+                file.write(
+                    json.dumps(
+                        {
+                            "check_list": name,
+                            "description": description,
+                            "due_date": due_date or "",
+                            "done": bool(done),
+                        }
+                    )
+                    + "\n"
+                )
+                exported += 1
+    except sqlite3.Error as e:
+        return 1, "Database error: {0}".format(e), exported
+    return 0, "", exported
+
@@ -0,0 +1,157 @@
+import sqlite3
+from itertools import groupby
+from operator import itemgetter
+from typing import TYPE_CHECKING, List, Tuple
+
+from src.check_list import CheckList
+from src.task import FIELDS, Task
+
+if TYPE_CHECKING:
+    from src.task_controller import TaskController
+
+ADD_CHECK_LIST = "add_check_list"
+ADD_TASK = "add_task"
+UPDATE_TASK = "update_task"
+DELETE_TASK = "delete_task"
+
+
+class _WriteFailed(Exception):
+    """
+    A write of the unit returned an error; raised to roll back the others.
+    """
+
+
+class UnitOfWork(object):
+    """
+    Collects task and check list writes and applies them in the order they
+    were made with commit, in one transaction: either every write is made
+    or none is. Consecutive writes of the same kind share one statement or
+    executemany. Nothing touches the database before commit, so collecting
+    writes holds no lock.
+    """
+
+    def __init__(self, task_controller: "TaskController"):
+        """
+
+        :param task_controller: Controller the writes go through
+        """
+        self._task_controller = task_controller
+        # (kind, Task or CheckList, CheckList the task goes to or None)
+        self._operations = []  # type: List[tuple]
+
+    def __len__(self) -> int:
+        return len(self._operations)
+
+    def add_check_list(self, check_list: CheckList) -> None:
+        """
+        Insert the check list and set its cid on commit.
+        :param check_list: CheckList object
+        :return: None
+        """
+        self._operations.append((ADD_CHECK_LIST, check_list, None))
+
+    def add_task(self, task: Task, check_list: CheckList = None) -> None:
+        """
+        Insert the task and set its tid on commit.
+        :param task: Task object
+        :param check_list: Check list added by this unit, whose cid is not
+            known yet; it becomes the task's check_list_id on commit
+        :return: None
+        """
+        self._operations.append((ADD_TASK, task, check_list))
+
+    def update_task(self, task: Task) -> None:
+        """
+        Write the fields of the task that changed since it was read, on commit.
+        :param task: Task object
+        :return: None
+        """
+        self._operations.append((UPDATE_TASK, task, None))
+
+    def delete_task(self, task: Task) -> None:
+        """
+        Delete the task on commit.
+        :param task: Task object with a tid
+        :return: None
+        """
+        self._operations.append((DELETE_TASK, task, None))
+
+    def discard(self) -> None:
+        """
+        Forget the collected writes.
+        :return: None
+        """
+        self._operations = []
+
+    def commit(self) -> Tuple[int, str]:
+        """
+        Apply the collected writes in one transaction. If one fails, every
+        write is rolled back, the IDs set by the unit are cleared and the
+        writes stay collected, so commit can be retried.
+        1 = Error
+        0 = No error
+        :return: Tuple[Error, Message]
+        """
+        if not self._operations:
+            return 0, ""
+        dirty = [
+            item.dirty_fields if kind == UPDATE_TASK else None
+            for kind, item, _ in self._operations
+        ]
+        try:
+            with self._task_controller.transaction():
+                for kind, group in groupby(self._operations, itemgetter(0)):
+                    err, message = self._write(kind, list(group))
+                    if err:
+                        raise _WriteFailed(message)
+        except _WriteFailed as e:
+            self._undo(dirty)
+            return 1, str(e)
+        except sqlite3.Error as e:
+            self._undo(dirty)
+            return 1, "Database error: {0}".format(e)
+        self._operations = []
+        return 0, ""
+
+    def _write(self, kind: str, operations: List[tuple]) -> Tuple[int, str]:
+        """
+
+        :param kind: Kind of every operation of the run
+        :param operations: Run of consecutive operations of one kind
+        :return: Tuple[Error, Message]
+        """
+        task_controller = self._task_controller
+        items = [item for _, item, _ in operations]
+        if kind == ADD_CHECK_LIST:
+            for check_list in items:
+                err, message = task_controller.add_check_list(check_list)
+                if err:
+                    return err, message
+            return 0, ""
+        if kind == ADD_TASK:
+            for _, task, check_list in operations:
+                if check_list is not None:
+                    task.check_list_id = check_list.cid
+            err, message, ids = task_controller.add_tasks(items, chunk_size=len(items))
+            for task, tid in zip(items, ids):
+                task.tid = tid
+                task.mark_clean()
+            return err, message
+        if kind == UPDATE_TASK:
+            return task_controller.update_tasks(items)
+        return task_controller.delete_tasks(task.tid for task in items)[:2]
+
+    def _undo(self, dirty: list) -> None:
+        """
+        Reset the objects written by a rolled back commit.
+        :param dirty: Dirty fields of each updated task before the commit
+        :return: None
+        """
+        for (kind, item, _), fields in zip(self._operations, dirty):
+            if kind == ADD_CHECK_LIST:
+                item.cid = None
+            elif kind == ADD_TASK:
+                item.tid = None
+                item.mark_dirty(FIELDS)
+            elif kind == UPDATE_TASK:
+                item.mark_dirty(fields)
@@ -0,0 +1,351 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Tuple
+
+from src.changes import RESET, TASK_DELETED, Change
+from src.due_date import normalize_due_date, to_epoch_day, today_epoch_day
+
+DEFAULT_PERSIST_INTERVAL = 5.0  # Seconds
+JOURNAL_SUFFIX = "-redo.jsonl"
+
+# Journal records are JSON arrays whose first item says what they hold
+TASK = "task"  # [TASK, ID, dueDate, description, done, checkListID, doneDay]
+TASK_REMOVED = "task_removed"  # [TASK_REMOVED, ID]
+TASK_ARCHIVED = "task_archived"  # [TASK_ARCHIVED, <ArchivedTasks columns>]
+CHECK_LIST = "check_list"  # [CHECK_LIST, ID, name, description]
+CHECK_LIST_REMOVED = "check_list_removed"  # [CHECK_LIST_REMOVED, ID]
+
+ARCHIVED_COLUMNS = (
+    "ID, dueDate, dueDay, description, done, checkListID, doneDay, archivedDay"
+)
+
+
+class WorkingSet(object):
+    """
+    A database file served from memory. load copies the file into an
+    in-memory database with the backup API and persist copies it back the
+    same way. In between, the row images of every commit, taken from the
+    change feed, are appended to a redo journal next to the file and
+    flushed, so a crash of the process loses nothing that was committed;
+    the journal is replayed by the next load. A crash of the machine can
+    lose the changes since the last persist that the OS had not written.
+
+    The file is locked while the working set is open, so that no other
+    connection writes to it and has its changes overwritten by a persist.
+
+    A failed journal write or persist is passed to on_error and leaves the
+    working set degraded until the next successful persist: meanwhile a
+    crash can lose committed changes.
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        timeout: float,
+        pragmas: Tuple[str, ...] = (),
+        persist_interval: float = DEFAULT_PERSIST_INTERVAL,
+        on_error: Callable[[str, str], None] = None,
+    ):
+        """
+
+        :param database_url: Path of the database file
+        :param timeout: Seconds to wait for a lock held by another connection
+        :param pragmas: Statements run on the file's connection when it opens
+        :param persist_interval: Seconds between persists of a changed database
+        :param on_error: Called with the failing operation and the message of
+            a journal or background persist error
+        """
+        self._database_url = database_url
+        self._journal_path = database_url + JOURNAL_SUFFIX
+        self._timeout = timeout
+        self._pragmas = pragmas
+        self._persist_interval = persist_interval
+        self._disk = None
+        self._memory = None
+        self._journal = None
+        self._stopped = threading.Event()
+        self._dirty = False
+        self._degraded = False
+        self._on_error = on_error
+        self.persists = 0
+
+    @property
+    def dirty(self) -> bool:
+        """
+        Whether changes were committed since the last persist.
+        :return: bool
+        """
+        return self._dirty
+
+    @property
+    def degraded(self) -> bool:
+        """
+        Whether a journal write or persist failed since the last successful
+        persist, so that a crash can lose committed changes.
+        :return: bool
+        """
+        return self._degraded
+
+    def _report(self, operation: str, message: str) -> None:
+        """
+
+        :param operation: What failed
+        :param message: Error message
+        :return: None
+        """
+        self._degraded = True
+        if self._on_error is not None:
+            self._on_error(operation, message)
+
+    def load(self) -> sqlite3.Connection:
+        """
+        Open and lock the file and copy it into a new in-memory database.
+        :return: Connection to the in-memory database
+        """
+        self._disk = sqlite3.connect(
+            self._database_url, timeout=self._timeout, check_same_thread=False
+        )
+        self._disk.execute("PRAGMA locking_mode = EXCLUSIVE")
+        for pragma in self._pragmas:
+            self._disk.execute(pragma)
+        self._memory = sqlite3.connect(":memory:", check_same_thread=False)
+        self._disk.backup(self._memory)
+        return self._memory
+
+    def replay(self) -> int:
+        """
+        Apply the journal left by a crash to the in-memory database in one
+        transaction. Records are row images, so replaying a journal twice
+        does no harm; a record torn by the crash ends the replay.
+        :return: Number of replayed records
+        """
+        if not os.path.exists(self._journal_path):
+            return 0
+        records = []
+        with open(self._journal_path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+        if not records:
+            return 0
+        self._memory.execute("BEGIN")
+        try:
+            # A record may refer to a check list recorded after it
+            self._memory.execute("PRAGMA defer_foreign_keys = ON")
+            for record in records:
+                self._apply(record)
+            self._memory.commit()
+        except sqlite3.Error:
+            self._memory.rollback()
+            raise
+        self._dirty = True
+        return len(records)
+
+    def _apply(self, record: list) -> None:
+        """
+
+        :param record: Journal record
+        :return: None
+        """
+        kind, values = record[0], record[1:]
+        if kind == TASK:
+            if len(values) == 5:
+                # Written before doneDay was recorded
+                values = values + [today_epoch_day() if values[3] else None]
+            tid, due_date, description, done, check_list_id, done_day = values
+            self._memory.execute(
+                """
+                INSERT INTO Tasks (ID, dueDate, dueDay, description, done,
+                                   checkListID, doneDay)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (ID) DO UPDATE
+                SET dueDate = excluded.dueDate,
+                    dueDay = excluded.dueDay,
+                    description = excluded.description,
+                    done = excluded.done,
+                    checkListID = excluded.checkListID,
+                    doneDay = excluded.doneDay
+                """,
+                (
+                    tid,
+                    normalize_due_date(due_date),
+                    to_epoch_day(due_date),
+                    description,
+                    done,
+                    check_list_id,
+                    done_day,
+                ),
+            )
+            # Changing done sets doneDay to today by trigger; the stored day
+            # of an update of doneDay alone is kept
+            self._memory.execute(
+                "UPDATE Tasks SET doneDay = ? WHERE ID = ? AND doneDay IS NOT ?",
+                (done_day, tid, done_day),
+            )
+        elif kind == TASK_REMOVED:
+            self._memory.execute("DELETE FROM Tasks WHERE ID = ?", values)
+        elif kind == TASK_ARCHIVED:
+            self._memory.execute(
+                "INSERT OR REPLACE INTO ArchivedTasks ({0}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)".format(ARCHIVED_COLUMNS),
+                values,
+            )
+            self._memory.execute("DELETE FROM Tasks WHERE ID = ?", values[:1])
+        elif kind == CHECK_LIST:
+            self._memory.execute(
+                """
+                INSERT INTO CheckLists (ID, name, description) VALUES (?, ?, ?)
+                ON CONFLICT (ID) DO UPDATE
+                SET name = excluded.name, description = excluded.description
+                """,
+                values,
+            )
+        elif kind == CHECK_LIST_REMOVED:
+            self._memory.execute("DELETE FROM CheckLists WHERE ID = ?", values)
+
+    def record(self, changes: List[Change]) -> None:
+        """
+        Subscriber of the change feed: append the changes of a commit to the
+        journal. RESET, sent when the database was replaced, persists it
+        instead.
+        :param changes: Changes of one commit
+        :return: None
+        """
+        records = []
+        done_days = self._done_days(changes)
+        for change in changes:
+            if change.kind == RESET:
+                try:
+                    self.persist()
+                except (sqlite3.Error, OSError) as e:
+                    self._dirty = True
+                    self._report(
+                        "working_set.persist", "Persisting failed: {0}".format(e)
+                    )
+                return
+            if change.task is not None:
+                task = change.task
+                records.append(
+                    [
+                        TASK,
+                        task.tid,
+                        task.due_date,
+                        task.description,
+                        task.done,
+                        task.check_list_id,
+                        done_days.get(task.tid),
+                    ]
+                )
+            elif change.kind == TASK_DELETED:
+                row = self._memory.execute(
+                    "SELECT {0} FROM ArchivedTasks WHERE ID = ?".format(
+                        ARCHIVED_COLUMNS
+                    ),
+                    (change.tid,),
+                ).fetchone()
+                if row:
+                    records.append([TASK_ARCHIVED] + list(row))
+                else:
+                    records.append([TASK_REMOVED, change.tid])
+            elif change.check_list is not None:
+                check_list = change.check_list
+                records.append(
+                    [
+                        CHECK_LIST,
+                        check_list.cid,
+                        check_list.name,
+                        check_list.description,
+                    ]
+                )
+            else:
+                records.append([CHECK_LIST_REMOVED, change.cid])
+        self._dirty = True
+        try:
+            if self._journal is None:
+                self._journal = open(self._journal_path, "a", encoding="utf-8")
+            self._journal.write("".join(json.dumps(r) + "\n" for r in records))
+            self._journal.flush()
+        except OSError as e:
+            self._report(
+                "working_set.record", "Writing the journal failed: {0}".format(e)
+            )
+
+    def _done_days(self, changes: List[Change]) -> Dict[int, int]:
+        """
+        Read the doneDay of the changed tasks, which the change feed does not
+        carry, so that replaying a record keeps the day a task was done.
+        :param changes: Changes of one commit
+        :return: Dict[Task ID, doneDay] of the done tasks
+        """
+        tids = [change.task.tid for change in changes if change.task is not None]
+        if not tids:
+            return {}
+        return dict(
+            self._memory.execute(
+                """
+                SELECT ID, doneDay FROM Tasks
+                WHERE ID IN (SELECT value FROM json_each(?)) AND doneDay IS NOT NULL
+                """,
+                (json.dumps(tids),),
+            ).fetchall()
+        )
+
+    def persist(self) -> None:
+        """
+        Copy the in-memory database over the file in one step, then empty
+        the journal. Must not run while the in-memory database has an open
+        transaction. Errors are raised as sqlite3.Error or OSError and leave
+        the working set degraded.
+        :return: None
+        """
+        try:
+            self._memory.backup(self._disk)
+            if self._journal is not None:
+                self._journal.seek(0)
+                self._journal.truncate()
+            elif os.path.exists(self._journal_path):
+                os.remove(self._journal_path)
+        except (sqlite3.Error, OSError):
+            self._degraded = True
+            raise
+        self._dirty = False
+        self._degraded = False
+        self.persists += 1
+
+    def start(self, persist: Callable[[], Tuple[int, str]]) -> None:
+        """
+        Call persist on a background thread every persist interval while
+        the database is dirty.
+        :param persist: Persists under the owner's lock, returns
+            Tuple[Error, Message]
+        :return: None
+        """
+
+        def run() -> None:
+            while not self._stopped.wait(self._persist_interval):
+                if self._dirty and not self._stopped.is_set():
+                    err, message = persist()
+                    if err:
+                        self._report("working_set.persist", message)
+
+        threading.Thread(target=run, name="TasksPersist", daemon=True).start()
+
+    def close(self, persisted: bool) -> None:
+        """
+        Stop the background thread and close the file and the journal; the
+        in-memory database is closed by its owner. The journal is removed
+        only if the database was persisted.
+        :param persisted: Whether the last persist succeeded
+        :return: None
+        """
+        self._stopped.set()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if persisted and os.path.exists(self._journal_path):
+            os.remove(self._journal_path)
+        self._disk.close()
@@ -0,0 +1,103 @@
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from src.task import Task
+
+DEFAULT_MAX_PENDING = 200
+DEFAULT_FLUSH_INTERVAL = 0.5  # Seconds
+
+
+class WriteBehindQueue(object):
+    """
+    Buffers task updates and writes them in batches. Updates of the same
+    task are collapsed, only its latest state is written.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[Task]], Tuple[int, str]],
+        max_pending: int = DEFAULT_MAX_PENDING,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        """
+
+        :param write: Writes a batch of tasks in one transaction
+        :param max_pending: Number of queued tasks that triggers a flush
+        :param flush_interval: Seconds a queued update may wait before it is due
+        """
+        self._write = write
+        self._max_pending = max_pending
+        self._flush_interval = flush_interval
+        self._pending = OrderedDict()  # type: OrderedDict[int, Task]
+        self._oldest = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def flush_interval(self) -> float:
+        """
+
+        :return: float
+        """
+        return self._flush_interval
+
+    @property
+    def due(self) -> bool:
+        """
+        Whether the oldest queued update has waited flush_interval seconds.
+        :return: bool
+        """
+        return (
+            self._oldest is not None
+            and time.monotonic() - self._oldest >= self._flush_interval
+        )
+
+    def get(self, tid: int) -> Optional[Task]:
+        """
+
+        :param tid: Task ID
+        :return: Queued state of the task or None
+        """
+        return self._pending.get(tid)
+
+    def put(self, task: Task) -> Tuple[int, str]:
+        """
+        Queue an update, flushing when the size threshold is reached. A
+        newer state of a queued task replaces it and inherits its dirty
+        fields.
+        :param task: Task object with a tid
+        :return: Tuple[Error, Message] of the flush, if any
+        """
+        if not self._pending:
+            self._oldest = time.monotonic()
+        previous = self._pending.get(task.tid)
+        if previous is not None and previous is not task:
+            # The latest state is written, with every field either changed
+            task.mark_dirty(previous.dirty_fields)
+        self._pending[task.tid] = task
+        if len(self._pending) >= self._max_pending:
+            return self.flush()
+        return 0, ""
+
+    def flush(self) -> Tuple[int, str]:
+        """
+        Write every queued update. If the write fails, the tasks it did not
+        write stay queued for the next flush and the error is returned to
+        the caller.
+        :return: Tuple[Error, Message]
+        """
+        if not self._pending:
+            return 0, ""
+        tasks = list(self._pending.values())
+        self._pending.clear()
+        oldest, self._oldest = self._oldest, None
+        err, message = self._write(tasks)
+        if err:
+            for task in tasks:
+                if task.dirty_fields and task.tid not in self._pending:
+                    self._pending[task.tid] = task
+            if self._pending:
+                self._oldest = oldest
+        return err, message
@@ -0,0 +1,42 @@
+import pytest
+
+from src.check_list import CheckList
+from src.task import Task
+from src.task_controller import TaskController
+
+
+@pytest.fixture
+def database_url(tmp_path) -> str:
+    return str(tmp_path / "tasks.db")
+
+
+@pytest.fixture
+def controller(database_url) -> TaskController:
+    """
+    Controller on a new database file with the check lists "a" (ID 1) and
+    "b" (ID 2).
+    """
+    task_controller = TaskController()
+    task_controller.create_connection(database_url, timeout=0.2)
+    for name in ("a", "b"):
+        err, message = task_controller.add_check_list(CheckList(name, ""))
+        assert not err, message
+    yield task_controller
+    task_controller.close_connection()
+
+
+def add_tasks(task_controller: TaskController, count: int, check_list_id: int = 1):
+    """
+
+    :param task_controller: TaskController
+    :param count: Number of tasks
+    :param check_list_id: Check list of the tasks
+    :return: The added Task objects
+    """
+    tasks = [
+        Task("task {0}".format(i), check_list_id=check_list_id) for i in range(count)
+    ]
+    for task in tasks:
+        err, message = task_controller.add_task(task)
+        assert not err, message
+    return tasks
@@ -0,0 +1,29 @@
+from datetime import date, timedelta
+
+from tests.conftest import add_tasks
+
+
+def test_archive_done_moves_only_old_done_tasks(controller):
+    tasks = add_tasks(controller, 5)
+    controller.set_done([task.tid for task in tasks[:3]], True)
+    assert controller.archive_done(min_age=30)[:2] == (0, "")
+    assert controller.count_tasks(1)[2] == 5
+
+    later = date.today() + timedelta(days=30)
+    err, message, archived = controller.archive_done(
+        min_age=30, batch_size=2, today=later
+    )
+    assert (err, message, archived) == (0, "", 3)
+    assert [task.tid for task in controller.get_tasks(1)[2]] == [
+        task.tid for task in tasks[3:]
+    ]
+    assert controller.count_tasks(1)[2] == 2
+    _, _, with_archived = controller.get_tasks(1, include_archived=True)
+    assert [task.tid for task in with_archived] == [task.tid for task in tasks]
+    _, _, check_lists = controller.get_check_lists(with_counts=True)
+    assert (check_lists[0].total, check_lists[0].done) == (2, 0)
+
+
+def test_archive_done_is_refused_inside_a_transaction(controller):
+    with controller.transaction():
+        assert controller.archive_done()[0]
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from src.async_controller import AsyncTaskController
+from src.check_list import CheckList
+from src.task import Task
+from src.task_controller import NOT_FOUND
+
+
+def run_with_controller(database_url, scenario, **kwargs):
+    async def main():
+        controller = AsyncTaskController(**kwargs)
+        await controller.create_connection(database_url)
+        try:
+            assert not (await controller.add_check_list(CheckList("a", "")))[0]
+            return await scenario(controller)
+        finally:
+            await controller.close_connection()
+
+    return asyncio.run(main())
+
+
+def test_update_of_a_missing_task_is_not_found(controller):
+    task = Task("gone", tid=999)
+    assert controller.update_task(task)[0] == NOT_FOUND
+
+
+def test_concurrent_writes_share_commits(database_url):
+    async def scenario(controller):
+        tasks = [Task("t{0}".format(i), check_list_id=1) for i in range(50)]
+        results = await asyncio.gather(*(controller.add_task(t) for t in tasks))
+        assert results == [(0, "")] * 50
+        assert controller.writes == 51
+        assert controller.groups < 10
+        _, _, stored = await controller.get_tasks(1)
+        assert [task.tid for task in stored] == [task.tid for task in tasks]
+
+    run_with_controller(database_url, scenario, max_group=20)
+
+
+def test_failing_write_does_not_affect_its_group(database_url):
+    async def scenario(controller):
+        tasks = [
+            Task("before", check_list_id=1),
+            Task("wrong type", due_date=20200101, check_list_id=1),
+            Task("missing list", check_list_id=99),
+            Task("after", check_list_id=1),
+        ]
+        results = await asyncio.gather(*(controller.add_task(t) for t in tasks))
+        assert results[0] == results[3] == (0, "")
+        assert results[1][0] and results[1][1].startswith("Internal error: ")
+        assert results[2][0]
+        _, _, stored = await controller.get_tasks(1)
+        assert [task.description for task in stored] == ["before", "after"]
+
+    run_with_controller(database_url, scenario)
+
+
+def test_writer_goes_on_after_a_group_raises(database_url):
+    async def scenario(controller):
+        write_group = controller._write_group
+        calls = []
+
+        def failing_once(group):
+            calls.append(len(group))
+            if len(calls) == 1:
+                raise RuntimeError("writer thread failed")
+            return write_group(group)
+
+        controller._write_group = failing_once
+        first, second = (
+            asyncio.ensure_future(controller.add_task(Task(name, check_list_id=1)))
+            for name in ("lost", "kept")
+        )
+        with pytest.raises(RuntimeError):
+            await first
+        assert await second == (0, "")
+        assert controller._pending == [] and controller._writer is None
+        _, _, stored = await controller.get_tasks(1)
+        assert [task.description for task in stored] == ["kept"]
+        assert calls == [1, 1]
+
+    run_with_controller(database_url, scenario, max_group=1)
+
+
+def test_pages_stream_in_id_order(database_url):
+    async def scenario(controller):
+        for i in range(7):
+            await controller.add_task(Task("t{0}".format(i), check_list_id=1))
+        pages = [page async for page in controller.iter_task_rows(page_size=3)]
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert [row[2] for page in pages for row in page] == [
+            "t{0}".format(i) for i in range(7)
+        ]
+
+    run_with_controller(database_url, scenario)
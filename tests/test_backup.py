@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import threading
+
+from src.backup import (
+    BackupJob,
+    copy_database,
+    list_snapshots,
+    rotate_snapshots,
+    snapshot_name,
+)
+from src.task import Task
+
+from tests.conftest import add_tasks
+
+
+def descriptions(task_controller, check_list_id=1):
+    return [task.description for task in task_controller.get_tasks(check_list_id)[2]]
+
+
+def test_snapshot_names_sort_in_time_order():
+    names = [
+        snapshot_name("/data/pytasks.db", timestamp)
+        for timestamp in (1700000000.0, 1700000000.25, 1700000000.5, 1700000001.0)
+    ]
+    assert len(set(names)) == 4
+    assert names == sorted(names)
+    assert names[1].startswith("pytasks-") and names[1].endswith("-250000.db")
+
+
+def test_backup_writes_a_snapshot_while_writes_go_on(controller, tmp_path):
+    add_tasks(controller, 200)
+    steps = []
+    directory = str(tmp_path / "backups")
+    job = controller.backup(
+        directory, pages=1, progress=lambda copied, total: steps.append(copied)
+    )
+    controller.add_task(Task("during", check_list_id=2))
+    err, path = job.wait(10)
+    assert not err, path
+    assert job.done and len(steps) > 1 and steps[-1] == job.total
+    assert list_snapshots(directory, controller._database_url) == [path]
+    assert not os.path.exists(path + ".partial")
+    snapshot = sqlite3.connect(path)
+    assert snapshot.execute("SELECT COUNT(*) FROM Tasks").fetchone()[0] in (200, 201)
+    snapshot.close()
+
+
+def test_rotation_keeps_the_newest_snapshots(controller, tmp_path):
+    directory = str(tmp_path / "backups")
+    paths = []
+    for _ in range(4):
+        err, path = controller.backup(directory, keep=2).wait(10)
+        assert not err, path
+        paths.append(path)
+    assert len(set(paths)) == 4
+    assert list_snapshots(directory, controller._database_url) == paths[2:]
+    assert rotate_snapshots(directory, controller._database_url, 0) == []
+    assert rotate_snapshots(directory, controller._database_url, 1) == paths[2:3]
+
+
+def test_cancelled_backup_leaves_no_file(controller, tmp_path):
+    add_tasks(controller, 200)
+    directory = str(tmp_path / "backups")
+    started = threading.Event()
+    resume = threading.Event()
+
+    def progress(copied, total):
+        started.set()
+        resume.wait(10)
+
+    job = controller.backup(directory, pages=1, progress=progress)
+    assert started.wait(10)
+    job.cancel()
+    resume.set()
+    assert job.wait(10) == (1, "The backup was cancelled.")
+    assert os.listdir(directory) == []
+
+
+def test_failing_progress_callback_ends_the_job(controller, tmp_path):
+    done = []
+
+    def progress(copied, total):
+        raise RuntimeError("callback failed")
+
+    job = BackupJob(
+        lambda: (controller._connection, lambda: None),
+        str(tmp_path / "snapshot.db"),
+        progress=progress,
+        on_done=done.append,
+    ).start()
+    assert job.wait(10) == (1, "Backup failed: callback failed")
+    assert done == [job]
+    assert not os.path.exists(str(tmp_path / "snapshot.db.partial"))
+
+
+def test_restore_replaces_the_database(controller, tmp_path):
+    add_tasks(controller, 2)
+    err, path = controller.backup(str(tmp_path / "backups")).wait(10)
+    assert not err, path
+    controller.add_task(Task("after the backup", check_list_id=1))
+    controller.get_tasks(1)
+    assert controller.restore(path) == (0, "")
+    assert descriptions(controller) == ["task 0", "task 1"]
+    assert not controller.add_task(Task("after the restore", check_list_id=1))[0]
+    assert descriptions(controller)[-1] == "after the restore"
+
+
+def test_restore_rejects_a_damaged_or_missing_snapshot(controller, tmp_path):
+    add_tasks(controller, 1)
+    missing = str(tmp_path / "missing.db")
+    assert controller.restore(missing) == (1, "There is no snapshot " + missing + ".")
+    damaged = tmp_path / "damaged.db"
+    damaged.write_bytes(b"not a database" * 100)
+    err, message = controller.restore(str(damaged))
+    assert err and message.startswith("Restore failed: ")
+    assert descriptions(controller) == ["task 0"]
+
+
+def test_copy_database(controller, tmp_path):
+    add_tasks(controller, 3)
+    target = str(tmp_path / "copy.db")
+    copy_database(controller._connection, target)
+    copy = sqlite3.connect(target)
+    assert copy.execute("SELECT COUNT(*) FROM Tasks").fetchone()[0] == 3
+    copy.close()
@@ -0,0 +1,43 @@
+import json
+
+from src.benchmarks.generator import generate_database
+from src.benchmarks.run import main
+from src.task_controller import TaskController
+
+
+def test_generated_database_is_complete_and_reused(tmp_path):
+    path = generate_database(str(tmp_path), 500, 4, 1)
+    assert generate_database(str(tmp_path), 500, 4, 1) == path
+    task_controller = TaskController(cache_size=0)
+    task_controller.create_connection(path)
+    try:
+        _, _, check_lists = task_controller.get_check_lists(with_counts=True)
+        assert len(check_lists) == 4
+        assert sum(check_list.total for check_list in check_lists) == 500
+        word = task_controller.get_tasks(1)[2][0].description.split()[0]
+        assert task_controller.search_tasks(word)[2]
+    finally:
+        task_controller.close_connection()
+
+
+def test_benchmarks_write_their_results(tmp_path):
+    output = tmp_path / "results.json"
+    status = main(
+        [
+            "--sizes",
+            "300",
+            "--check-lists",
+            "3",
+            "--repeat",
+            "1",
+            "--benchmarks",
+            "add_task,get_tasks,update_tasks,set_done",
+            "--data-dir",
+            str(tmp_path / "data"),
+            "--output",
+            str(output),
+        ]
+    )
+    assert status == 0
+    results = json.loads(output.read_text())["results"]["300"]
+    assert sorted(results) == ["add_task", "get_tasks", "set_done", "update_tasks"]
@@ -0,0 +1,50 @@
+from src.task import Task
+
+
+def test_bulk_insert_returns_the_ids_of_the_rows(controller):
+    tasks = [Task("bulk {0}".format(i), check_list_id=1 + i % 2) for i in range(25)]
+    err, message, ids = controller.add_tasks(tasks, chunk_size=10, bulk=True)
+    assert not err, message
+    assert len(ids) == 25
+    rows = controller._connection.execute(
+        "SELECT ID, description FROM Tasks ORDER BY ID"
+    ).fetchall()
+    assert rows == [(tid, task.description) for tid, task in zip(ids, tasks)]
+    # The index and counters the switched off triggers maintain are caught up
+    err, _, results = controller.search_tasks("bulk")
+    assert not err
+    assert len(results) == 25
+    assert controller.count_tasks(2)[2] == 12
+    _, _, check_lists = controller.get_check_lists(with_counts=True)
+    assert [check_list.total for check_list in check_lists] == [13, 12]
+
+
+def test_bulk_insert_does_not_change_the_schema(controller):
+    def schema_version():
+        return controller._connection.execute("PRAGMA schema_version").fetchone()[0]
+
+    version = schema_version()
+    tasks = [Task("t{0}".format(i), check_list_id=1) for i in range(10)]
+    assert not controller.add_tasks(tasks, chunk_size=3, bulk=True)[0]
+    assert schema_version() == version
+
+
+def test_failed_bulk_chunk_is_rolled_back(controller):
+    tasks = [Task("t{0}".format(i), check_list_id=1) for i in range(4)]
+    tasks[3].check_list_id = 99
+    err, _, ids = controller.add_tasks(tasks, chunk_size=2, bulk=True)
+    assert err
+    assert len(ids) == 2
+    assert controller.count_tasks(1)[2] == 2
+    # The triggers are on again for the following inserts
+    assert not controller.add_task(Task("single", check_list_id=1))[0]
+    _, _, results = controller.search_tasks("single")
+    assert len(results) == 1
+
+
+def test_rows_share_one_transaction_per_chunk(controller):
+    tasks = [Task("t{0}".format(i), check_list_id=1) for i in range(5)]
+    err, message, ids = controller.add_tasks(tasks, chunk_size=5)
+    assert not err, message
+    assert ids == list(range(ids[0], ids[0] + 5))
+    assert [task.tid for task in controller.get_tasks(1)[2]] == ids
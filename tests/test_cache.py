@@ -0,0 +1,64 @@
+from src.check_list import CheckList
+from src.task_controller import TaskController
+
+from tests.conftest import add_tasks
+
+
+def test_cache_sees_updates(controller):
+    task = add_tasks(controller, 3)[0]
+    assert not controller.get_tasks(1)[2][0].done
+    task.done = True
+    assert controller.update_task(task) == (0, "")
+    assert controller.get_tasks(1)[2][0].done
+    assert controller.get_tasks_page(1, 2)[2][0].done
+
+
+def test_cache_drops_both_lists_of_a_moved_task(controller):
+    tasks = add_tasks(controller, 5)
+    # Cache the count and a first page that does not hold the moved task
+    assert controller.count_tasks(1)[2] == 5
+    assert controller.count_tasks(2)[2] == 0
+    controller.get_tasks_page(1, 2)
+    tasks[4].check_list_id = 2
+    assert controller.update_task(tasks[4]) == (0, "")
+    assert controller.count_tasks(1)[2] == 4
+    assert controller.count_tasks(2)[2] == 1
+    assert [task.tid for task in controller.get_tasks(2)[2]] == [tasks[4].tid]
+
+
+def test_cache_sees_queued_moves(controller):
+    tasks = add_tasks(controller, 5)
+    controller.enable_write_behind()
+    assert controller.count_tasks(1)[2] == 5
+    tasks[4].check_list_id = 2
+    assert controller.queue_update_task(tasks[4]) == (0, "")
+    assert controller.count_tasks(1)[2] == 4
+    assert controller.count_tasks(2)[2] == 1
+
+
+def test_cache_is_invalidated_by_set_based_writes(controller):
+    tasks = add_tasks(controller, 3)
+    controller.get_tasks(1)
+    err, _, count = controller.set_done([task.tid for task in tasks[:2]], True)
+    assert (err, count) == (0, 2)
+    assert [task.done for task in controller.get_tasks(1)[2]] == [1, 1, 0]
+
+
+def test_check_lists_are_cached_until_one_is_added(controller):
+    assert [c.name for c in controller.get_check_lists()[2]] == ["a", "b"]
+    controller.add_check_list(CheckList("c", ""))
+    assert [c.name for c in controller.get_check_lists()[2]] == ["a", "b", "c"]
+
+
+def test_cache_stays_within_its_budget(controller, database_url):
+    add_tasks(controller, 10)
+    add_tasks(controller, 10, check_list_id=2)
+    # Room for one list of about 10 * ROW_OVERHEAD bytes, not for two
+    task_controller = TaskController(cache_size=3000)
+    task_controller.create_connection(database_url)
+    try:
+        for check_list_id in (1, 2, 1):
+            assert len(task_controller.get_tasks(check_list_id)[2]) == 10
+        assert 0 < task_controller.cache_stats()["size"] <= 3000
+    finally:
+        task_controller.close_connection()
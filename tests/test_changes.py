@@ -0,0 +1,82 @@
+import sqlite3
+
+from src.changes import (
+    CHECK_LIST_ADDED,
+    TASK_ADDED,
+    TASK_DELETED,
+    TASK_MOVED,
+    TASK_UPDATED,
+)
+from src.task import Task
+from src.task_controller import TaskController
+
+from tests.conftest import add_tasks
+
+
+def test_subscribers_get_the_deltas_of_each_commit(controller):
+    batches = []
+    controller.subscribe(batches.append)
+    task = add_tasks(controller, 1)[0]
+    task.done = True
+    controller.update_task(task)
+    task.check_list_id = 2
+    controller.update_task(task)
+    controller.delete_tasks([task.tid])
+    assert [[change.kind for change in batch] for batch in batches] == [
+        [TASK_ADDED],
+        [TASK_UPDATED],
+        [TASK_MOVED],
+        [TASK_DELETED],
+    ]
+    moved = batches[2][0]
+    assert (moved.tid, moved.cid, moved.task.check_list_id) == (task.tid, 1, 2)
+    assert batches[1][0].task.done
+
+
+def test_a_transaction_is_published_once(controller):
+    batches = []
+    controller.subscribe(batches.append)
+    with controller.transaction():
+        add_tasks(controller, 3)
+    assert len(batches) == 1
+    assert [change.kind for change in batches[0]] == [TASK_ADDED] * 3
+
+
+def test_a_failed_write_does_not_hold_back_the_feed(controller):
+    batches = []
+    controller.subscribe(batches.append)
+    assert controller.add_task(Task("orphan", check_list_id=99))[0]
+    add_tasks(controller, 1)
+    assert [change.kind for change in batches[-1]] == [TASK_ADDED]
+
+
+def test_poll_reads_the_commits_of_other_connections(controller, database_url):
+    assert controller.poll_changes() == (0, "", [])
+    other = TaskController(cache_size=0)
+    other.create_connection(database_url, timeout=0.2)
+    try:
+        add_tasks(other, 2)
+    finally:
+        other.close_connection()
+    connection = sqlite3.connect(database_url)
+    connection.execute("INSERT INTO CheckLists (name, description) VALUES ('c', '')")
+    connection.commit()
+    connection.close()
+    err, _, changes = controller.poll_changes()
+    assert not err
+    assert [change.kind for change in changes] == [TASK_ADDED] * 2 + [
+        CHECK_LIST_ADDED
+    ]
+    assert controller.count_tasks(1)[2] == 2
+
+
+def test_failed_write_releases_the_write_lock(controller, database_url):
+    err, _ = controller.add_task(Task("orphan", check_list_id=99))
+    assert err
+    assert not controller._connection.in_transaction
+    other = sqlite3.connect(database_url, timeout=0.2)
+    try:
+        other.execute("INSERT INTO CheckLists (name, description) VALUES ('c', '')")
+        other.commit()
+    finally:
+        other.close()
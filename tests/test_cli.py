@@ -0,0 +1,114 @@
+import io
+import json
+
+from src.cli import main
+
+
+def run(database_url, *argv):
+    return main(["--database", database_url] + list(argv))
+
+
+def test_add_reads_descriptions_from_stdin(database_url, monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.StringIO("one\n\n  \ntwo\r\nthree\n"))
+    assert run(database_url, "add", "--list", "home", "--ids", "--chunk-size", "2") == 0
+    out, err = capsys.readouterr()
+    assert out == "1\n2\n3\n"
+    assert err == "Added 3 tasks.\n"
+
+    assert run(database_url, "add", "--list", "home", "--due", "2020-13-01", "x") == 1
+    assert capsys.readouterr().err == "Invalid due date '2020-13-01'.\n"
+
+
+def test_list_formats_and_states(database_url, capsys):
+    run(database_url, "add", "--list", "home", "open one", "open, two")
+    run(database_url, "add", "--list", "work", "--done", "--due", "2021-02-03", "d")
+    capsys.readouterr()
+
+    assert run(database_url, "list", "--format", "csv", "--open") == 0
+    assert capsys.readouterr().out == (
+        "id,check_list,description,due_date,done\n"
+        "1,home,open one,,0\n"
+        '2,home,"open, two",,0\n'
+    )
+    assert run(database_url, "list", "--format", "jsonl", "--done") == 0
+    assert [json.loads(line) for line in capsys.readouterr().out.splitlines()] == [
+        {
+            "id": 3,
+            "check_list": "work",
+            "description": "d",
+            "due_date": "2021-02-03",
+            "done": True,
+        }
+    ]
+    assert run(database_url, "list", "--list", "home") == 0
+    assert len(capsys.readouterr().out.splitlines()) == 2
+    assert run(database_url, "list", "--list", "nowhere") == 1
+    assert capsys.readouterr().err == "Unknown check list 'nowhere'.\n"
+
+
+def test_done_and_undo(database_url, monkeypatch, capsys):
+    run(database_url, "add", "--list", "home", "a", "b", "c")
+    assert run(database_url, "done", "1", "3") == 0
+    assert capsys.readouterr().err.endswith("Changed 2 tasks.\n")
+    run(database_url, "list", "--format", "csv", "--done")
+    assert [line[0] for line in capsys.readouterr().out.splitlines()[1:]] == ["1", "3"]
+
+    monkeypatch.setattr("sys.stdin", io.StringIO("3\n"))
+    assert run(database_url, "done", "--undo") == 0
+    assert capsys.readouterr().err == "Changed 1 tasks.\n"
+    assert run(database_url, "done", "x") == 1
+    assert capsys.readouterr().err.startswith("Invalid task ID: ")
+
+    assert run(database_url, "done", "--all", "--list", "home") == 0
+    assert capsys.readouterr().err == "Changed 2 tasks.\n"
+
+
+def test_done_all_needs_a_list(database_url, capsys):
+    assert run(database_url, "done", "--all") == 1
+    assert capsys.readouterr().err == "--all needs --list and can not be undone.\n"
+
+
+def test_stats(database_url, capsys):
+    run(database_url, "add", "--list", "home", "a", "b")
+    run(database_url, "add", "--list", "home", "--done", "c")
+    run(database_url, "add", "--list", "work", "--due", "2000-01-01", "late")
+    capsys.readouterr()
+    assert run(database_url, "stats", "--format", "jsonl") == 0
+    assert [json.loads(line) for line in capsys.readouterr().out.splitlines()] == [
+        {"id": 1, "check_list": "home", "total": 3, "done": 1, "open": 2, "overdue": 0},
+        {"id": 2, "check_list": "work", "total": 1, "done": 0, "open": 1, "overdue": 1},
+    ]
+    assert run(database_url, "stats") == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == [
+        "ID",
+        "Check",
+        "list",
+        "Total",
+        "Done",
+        "Open",
+        "Overdue",
+    ]
+    assert lines[1].split() == ["1", "home", "3", "1", "2", "0"]
+
+
+def test_closed_stdout_ends_quietly(database_url, tmp_path, monkeypatch):
+    run(database_url, "add", "--list", "home", "a")
+    path = tmp_path / "stdout"
+
+    class ClosedPipe(object):
+        def __init__(self, file):
+            self._file = file
+
+        def write(self, text):
+            raise BrokenPipeError()
+
+        def fileno(self):
+            return self._file.fileno()
+
+    with open(str(path), "w") as file:
+        monkeypatch.setattr("sys.stdout", ClosedPipe(file))
+        assert run(database_url, "list") == 0
+        # Later writes to the descriptor go to /dev/null
+        file.write("discarded")
+    assert path.read_text() == ""
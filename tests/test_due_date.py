@@ -0,0 +1,85 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from src.due_date import normalize_due_date, parse_due_date, to_epoch_day
+from src.migrations import MIGRATIONS
+from src.task import Task
+from src.task_controller import TaskController
+
+LEGACY_VALUES = [
+    "2019-12-12",
+    "2019-12-12 10:00",
+    "2019-12-12T10:00:00",
+    "2019-02-30",
+    "20191212",
+    "2019-W50-4",
+    "12/12/2019",
+    "soon",
+    "",
+]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2019-12-12", date(2019, 12, 12)),
+        ("2019-12-12 10:00", date(2019, 12, 12)),
+        ("2019-02-30", None),
+        ("20191212", None),
+        ("2019-W50-4", None),
+        ("soon", None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_parse_due_date(value, expected):
+    assert parse_due_date(value) == expected
+
+
+def test_normalize_keeps_strings_that_are_not_dates():
+    assert normalize_due_date("2019-12-12 10:00") == "2019-12-12"
+    assert normalize_due_date("soon") == "soon"
+
+
+def test_migration_and_runtime_agree(database_url):
+    connection = sqlite3.connect(database_url)
+    for statement in MIGRATIONS[0][2]:
+        connection.execute(statement)
+    connection.execute("INSERT INTO CheckLists (name, description) VALUES ('a', '')")
+    connection.executemany(
+        "INSERT INTO Tasks (dueDate, description, done, checkListID) "
+        "VALUES (?, ?, 0, 1)",
+        [(value, "migrated") for value in LEGACY_VALUES],
+    )
+    connection.commit()
+    connection.close()
+
+    task_controller = TaskController()
+    task_controller.create_connection(database_url)
+    try:
+        task_controller.add_tasks(
+            Task("added", due_date=value, check_list_id=1) for value in LEGACY_VALUES
+        )
+        rows = task_controller._connection.execute(
+            "SELECT description, dueDate, dueDay FROM Tasks ORDER BY ID"
+        ).fetchall()
+        migrated = [row[1:] for row in rows if row[0] == "migrated"]
+        added = [row[1:] for row in rows if row[0] == "added"]
+        assert migrated == added
+        assert [day for _, day in added] == [to_epoch_day(v) for v in LEGACY_VALUES]
+        _, _, due = task_controller.get_tasks_due("2019-12-12", "2019-12-12")
+        assert len(due) == 6
+    finally:
+        task_controller.close_connection()
+
+
+def test_due_range_queries(controller):
+    for due_date in ("2020-01-01", "2020-01-05", "2020-02-01", ""):
+        controller.add_task(Task(due_date or "none", due_date, check_list_id=1))
+    _, _, tasks = controller.get_tasks_due("2020-01-01", "2020-01-31")
+    assert [task.due_date for task in tasks] == ["2020-01-01", "2020-01-05"]
+    _, _, tasks = controller.get_overdue(today=date(2020, 1, 10))
+    assert [task.due_date for task in tasks] == ["2020-01-01", "2020-01-05"]
+    assert controller.get_tasks_due("soon", "2020-01-01")[0]
@@ -0,0 +1,133 @@
+import json
+
+from src.check_list import CheckList
+from src.instrumentation import (
+    Histogram,
+    Instrumentation,
+    JsonLinesSink,
+    MemorySink,
+    PrometheusSink,
+    normalize_statement,
+    prometheus_text,
+)
+
+from tests.conftest import add_tasks
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+    assert histogram.buckets() == [(0.1, 1), (1.0, 3), (float("inf"), 4)]
+    assert (histogram.count, histogram.max) == (4, 3.0)
+    assert histogram.sum == 4.25
+
+
+def test_statements_are_normalized():
+    assert normalize_statement(
+        "SELECT * FROM Tasks\n  WHERE ID = 12 AND name = 'it''s' AND x IS NULL"
+    ) == "SELECT * FROM Tasks WHERE ID = ? AND name = ? AND x IS NULL"
+
+
+def test_trace_times_statements_up_to_the_next_one_of_the_call():
+    clock = FakeClock()
+    instrumentation = Instrumentation(clock=clock)
+    instrumentation.enter_call()
+    instrumentation.trace("SELECT 1")
+    clock.now = 2.0
+    instrumentation.trace("-- TRIGGER")
+    instrumentation.trace("SELECT 2")
+    clock.now = 2.5
+    instrumentation.exit_call(clock.now)
+    statements = instrumentation.snapshot()["statements"]
+    assert statements["SELECT ?"]["latency"]["count"] == 2
+    assert statements["SELECT ?"]["latency"]["sum"] == 2.5
+
+
+def test_statement_outside_a_call_is_not_charged_idle_time():
+    clock = FakeClock()
+    instrumentation = Instrumentation(clock=clock)
+    instrumentation.trace("SELECT 1")
+    clock.now = 60.0
+    instrumentation.trace("SELECT 2")
+    instrumentation.end_statement(60.5)
+    latency = instrumentation.snapshot()["statements"]["SELECT ?"]["latency"]
+    assert (latency["count"], latency["sum"]) == (1, 0.5)
+
+
+def test_slow_threshold(controller):
+    sink = MemorySink()
+    instrumentation = controller.enable_instrumentation(
+        sinks=[sink], slow_threshold=3600
+    )
+    add_tasks(controller, 2)
+    assert instrumentation.snapshot()["slow"] == 0
+    assert not [e for e in sink.events if e["event"] in ("slow_call", "slow_query")]
+
+    instrumentation = controller.enable_instrumentation(sinks=[sink], slow_threshold=0)
+    add_tasks(controller, 1)
+    kinds = {event["event"] for event in sink.events}
+    assert {"slow_call", "slow_query"} <= kinds
+    assert instrumentation.snapshot()["slow"] >= 2
+
+
+def test_controller_calls_and_errors_are_recorded(controller):
+    sink = MemorySink()
+    instrumentation = controller.enable_instrumentation(sinks=[sink])
+    add_tasks(controller, 3)
+    controller.get_tasks(1)
+    controller.add_check_list(CheckList("", ""))
+    calls = instrumentation.snapshot()["calls"]
+    assert calls["add_task"]["latency"]["count"] == 3
+    assert calls["get_tasks"]["rows"] == 3
+    assert calls["add_check_list"]["errors"] == 1
+    assert [event["method"] for event in sink.events if event["event"] == "error"] == [
+        "add_check_list"
+    ]
+    controller.disable_instrumentation()
+    controller.get_tasks(1)
+    assert instrumentation.snapshot()["calls"]["get_tasks"]["latency"]["count"] == 1
+
+
+def test_memory_sink_keeps_the_latest_events_and_snapshot():
+    sink = MemorySink(max_events=2)
+    instrumentation = Instrumentation(sinks=[sink])
+    for method in ("a", "b", "c"):
+        instrumentation.record_error(method, "failed")
+    assert [event["method"] for event in sink.events] == ["b", "c"]
+    snapshot = instrumentation.dump()
+    assert sink.snapshot == snapshot
+    assert snapshot["calls"]["a"]["errors"] == 1
+
+
+def test_json_lines_sink_appends_events_and_snapshots(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    instrumentation = Instrumentation(sinks=[JsonLinesSink(str(path))])
+    instrumentation.record_call("get_tasks", 0.01, 5, False)
+    instrumentation.record_error("flush", "disk full")
+    instrumentation.dump()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["event"] for line in lines] == ["error", "snapshot"]
+    assert lines[1]["metrics"]["calls"]["get_tasks"]["rows"] == 5
+
+
+def test_prometheus_sink_writes_the_text_format(tmp_path):
+    path = tmp_path / "tasks.prom"
+    instrumentation = Instrumentation(sinks=[PrometheusSink(str(path))])
+    instrumentation.record_call("get_tasks", 0.002, 5, False)
+    instrumentation.dump()
+    text = path.read_text()
+    assert text == prometheus_text(instrumentation.snapshot())
+    assert "# TYPE tasks_call_duration_seconds histogram" in text
+    assert 'tasks_call_duration_seconds_bucket{method="get_tasks",le="0.0025"} 1' in text
+    assert 'tasks_call_duration_seconds_count{method="get_tasks"} 1' in text
+    assert 'tasks_call_rows_total{method="get_tasks"} 5' in text
+    assert not (tmp_path / "tasks.prom.partial").exists()
@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+from src.migrations import MIGRATIONS, get_schema_version, migrate
+from src.task_controller import TaskController
+
+# Schema of a database written before migrations existed
+BASELINE_SCHEMA = MIGRATIONS[0][2]
+
+
+def test_baseline_database_is_upgraded(database_url):
+    connection = sqlite3.connect(database_url)
+    for statement in BASELINE_SCHEMA:
+        connection.execute(statement)
+    connection.execute("INSERT INTO CheckLists (name, description) VALUES ('a', '')")
+    connection.executemany(
+        "INSERT INTO Tasks (dueDate, description, done, checkListID) "
+        "VALUES (?, ?, ?, 1)",
+        [("2020-01-02", "buy milk", 0), ("", "walk dog", 1)],
+    )
+    connection.commit()
+    connection.close()
+
+    task_controller = TaskController()
+    task_controller.create_connection(database_url)
+    try:
+        assert get_schema_version(task_controller._connection) == MIGRATIONS[-1][0]
+        err, _, tasks = task_controller.get_tasks(1)
+        assert not err
+        assert [(t.description, t.due_date, bool(t.done)) for t in tasks] == [
+            ("buy milk", "2020-01-02", False),
+            ("walk dog", "", True),
+        ]
+        err, _, results = task_controller.search_tasks("milk")
+        assert not err
+        assert [task.description for task, _ in results] == ["buy milk"]
+        _, _, check_lists = task_controller.get_check_lists(with_counts=True)
+        assert (check_lists[0].total, check_lists[0].done) == (2, 1)
+    finally:
+        task_controller.close_connection()
+
+
+def test_current_database_is_not_migrated_again(database_url):
+    task_controller = TaskController()
+    task_controller.create_connection(database_url)
+    task_controller.close_connection()
+    connection = sqlite3.connect(database_url)
+    version = get_schema_version(connection)
+    connection.close()
+
+    task_controller.create_connection(database_url)
+    try:
+        assert get_schema_version(task_controller._connection) == version
+    finally:
+        task_controller.close_connection()
+
+
+def test_interrupted_upgrade_resumes(database_url):
+    connection = sqlite3.connect(database_url)
+    broken = MIGRATIONS[:3] + [(4, "Fails", ("CREATE TABLE Tasks (x);",))]
+    with pytest.raises(sqlite3.Error):
+        migrate(connection, broken)
+    assert get_schema_version(connection) == 3
+    assert migrate(connection) == MIGRATIONS[-1][0]
+    connection.close()
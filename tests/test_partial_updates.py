@@ -0,0 +1,55 @@
+import copy
+
+from tests.conftest import add_tasks
+
+
+def test_update_writes_only_the_changed_fields(controller):
+    task = add_tasks(controller, 1)[0]
+    other = copy.copy(task)
+    other.description = "renamed elsewhere"
+    assert controller.update_task(other) == (0, "")
+    task.done = True
+    assert task.dirty_fields == frozenset(("done",))
+    assert controller.update_task(task) == (0, "")
+    assert not task.dirty_fields
+    stored = controller.get_tasks(1)[2][0]
+    assert (stored.description, bool(stored.done)) == ("renamed elsewhere", True)
+
+
+def test_update_without_changes_writes_nothing(controller):
+    task = add_tasks(controller, 1)[0]
+    statements = []
+    controller._connection.set_trace_callback(statements.append)
+    assert controller.update_task(task) == (0, "")
+    assert statements == []
+
+
+def test_update_tasks_groups_tasks_by_changed_fields(controller):
+    tasks = add_tasks(controller, 4)
+    for task in tasks[:2]:
+        task.done = True
+    for task in tasks[2:]:
+        task.description = task.description.upper()
+    assert controller.update_tasks(tasks) == (0, "")
+    stored = controller.get_tasks(1)[2]
+    assert [(task.description, bool(task.done)) for task in stored] == [
+        ("task 0", True),
+        ("task 1", True),
+        ("TASK 2", False),
+        ("TASK 3", False),
+    ]
+    assert all(not task.dirty_fields for task in tasks)
+
+
+def test_bulk_status_operations(controller):
+    tasks = add_tasks(controller, 5)
+    tids = [task.tid for task in tasks]
+    assert controller.set_done(tids[:2], True) == (0, "", 2)
+    # Tasks that already have the flag are not counted
+    assert controller.set_done(tids[:3], True) == (0, "", 1)
+    assert controller.move_tasks(tids[3:], 2) == (0, "", 2)
+    assert controller.mark_all_done(2) == (0, "", 2)
+    assert controller.delete_done(1) == (0, "", 3)
+    assert controller.count_tasks(1)[2] == 0
+    assert [bool(task.done) for task in controller.get_tasks(2)[2]] == [True, True]
+    assert controller.delete_tasks(tids) == (0, "", 2)
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from src.check_list import CheckList
+from src.task import Task
+from src.task_controller import TaskController
+
+
+@pytest.fixture
+def pooled(database_url) -> TaskController:
+    """
+    Controller in WAL mode with two reader connections and no read cache,
+    so that every read goes to the pool.
+    """
+    task_controller = TaskController(cache_size=0)
+    task_controller.create_connection(database_url, wal=True, readers=2)
+    task_controller.add_check_list(CheckList("a", ""))
+    task_controller.add_task(Task("committed", check_list_id=1))
+    yield task_controller
+    task_controller.close_connection()
+
+
+def read_in_thread(task_controller: TaskController) -> list:
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(task_controller.get_tasks(1))
+    )
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive(), "The read waited for the writer"
+    return results[0]
+
+
+def test_reads_from_other_threads_do_not_wait_for_a_write(pooled):
+    with pooled.transaction():
+        pooled.add_task(Task("uncommitted", check_list_id=1))
+        err, _, tasks = read_in_thread(pooled)
+        assert not err
+        # A pooled reader sees the last commit, not the open transaction
+        assert [task.description for task in tasks] == ["committed"]
+        # The writer's own reads see its writes
+        assert len(pooled.get_tasks(1)[2]) == 2
+    _, _, tasks = read_in_thread(pooled)
+    assert [task.description for task in tasks] == ["committed", "uncommitted"]
+
+
+def test_a_read_transaction_keeps_its_snapshot(pooled):
+    with pooled._readers.connection() as connection:
+        connection.execute("BEGIN")
+        count = "SELECT COUNT(*) FROM Tasks"
+        assert connection.execute(count).fetchone() == (1,)
+        pooled.add_task(Task("later", check_list_id=1))
+        assert connection.execute(count).fetchone() == (1,)
+        connection.commit()
+        assert connection.execute(count).fetchone() == (2,)
+
+
+def test_concurrent_writers_are_serialized(pooled):
+    def add(index):
+        for i in range(20):
+            pooled.add_task(Task("t{0}-{1}".format(index, i), check_list_id=1))
+
+    threads = [threading.Thread(target=add, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pooled.count_tasks(1)[2] == 81
+
+
+def test_calls_after_close_report_no_connection(pooled):
+    pooled.close_connection()
+    pooled.close_connection()
+    assert pooled.get_tasks(1) == (1, "There is no connection.", [])
+    assert pooled.add_task(Task("x", check_list_id=1)) == (
+        1,
+        "There is no connection.",
+    )
@@ -0,0 +1,210 @@
+import asyncio
+import json
+
+from src.async_controller import AsyncTaskController
+from src.server import TasksServer
+from src.task import Task
+
+
+class Client(object):
+    """
+    Minimal HTTP/1.1 client on one keep-alive connection.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    async def request(self, method: str, path: str, body=None):
+        """
+
+        :return: Tuple[Status, Headers, Body bytes]
+        """
+        data = b"" if body is None else json.dumps(body).encode()
+        self.writer.write(
+            "{0} {1} HTTP/1.1\r\nHost: test\r\nContent-Length: {2}\r\n\r\n".format(
+                method, path, len(data)
+            ).encode()
+            + data
+        )
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode()
+            if line == "\r\n":
+                break
+            name, _, value = line.partition(":")
+            headers[name.lower()] = value.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int(await self.reader.readline(), 16)
+                chunks.append(await self.reader.readexactly(size + 2))
+                if not size:
+                    return status, headers, b"".join(c[:-2] for c in chunks)
+        return status, headers, await self.reader.readexactly(
+            int(headers["content-length"])
+        )
+
+    async def json(self, method: str, path: str, body=None):
+        status, _, data = await self.request(method, path, body)
+        return status, json.loads(data)
+
+
+def run_with_server(database_url, scenario):
+    async def main():
+        controller = AsyncTaskController(readers=2)
+        await controller.create_connection(database_url)
+        server = TasksServer(controller)
+        port = await server.start("127.0.0.1", 0)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            return await scenario(Client(reader, writer), controller, port)
+        finally:
+            writer.close()
+            await server.close()
+            await controller.close_connection()
+
+    return asyncio.run(asyncio.wait_for(main(), 10))
+
+
+def test_create_and_read(database_url):
+    async def scenario(client, controller, port):
+        assert await client.json("POST", "/check_lists", {"name": "home"}) == (
+            201,
+            {"id": 1, "name": "home", "description": ""},
+        )
+        status, task = await client.json(
+            "POST",
+            "/tasks",
+            {"check_list_id": 1, "description": "milk", "due_date": "2020-01-02"},
+        )
+        assert status == 201
+        assert task == {
+            "id": 1,
+            "check_list_id": 1,
+            "description": "milk",
+            "due_date": "2020-01-02",
+            "done": False,
+        }
+        assert await client.json("GET", "/check_lists/1/tasks") == (200, [task])
+        status, check_lists = await client.json("GET", "/check_lists?counts=1")
+        assert (status, check_lists[0]["total"], check_lists[0]["open"]) == (200, 1, 1)
+
+    run_with_server(database_url, scenario)
+
+
+def test_invalid_requests(database_url):
+    async def scenario(client, controller, port):
+        await client.json("POST", "/check_lists", {"name": "home"})
+        task = {"check_list_id": 1, "description": "x"}
+        for body, error in (
+            ({"check_list_id": 1}, "The description is missing."),
+            (dict(task, check_list_id="1"), "check_list_id must be an integer."),
+            (dict(task, done=1), "done must be a boolean."),
+            (dict(task, due_date="soon"), "Invalid due date 'soon'."),
+            (dict(task, check_list_id=99), None),
+            ([1], "Expected a JSON object."),
+        ):
+            status, response = await client.json("POST", "/tasks", body)
+            assert status == 400
+            assert error is None or response == {"error": error}
+        assert await client.json("GET", "/tasks/1") == (405, {"error": "Use PATCH."})
+        assert (await client.json("GET", "/nowhere"))[0] == 404
+        assert (await client.json("GET", "/check_lists/x/tasks"))[0] == 404
+
+    run_with_server(database_url, scenario)
+
+
+def test_patch_writes_the_given_fields(database_url):
+    async def scenario(client, controller, port):
+        await client.json("POST", "/check_lists", {"name": "home"})
+        await client.json("POST", "/tasks", {"check_list_id": 1, "description": "a"})
+        assert await client.json("PATCH", "/tasks/1", {"done": True}) == (
+            200,
+            {"id": 1, "done": True},
+        )
+        _, tasks = await client.json("GET", "/check_lists/1/tasks")
+        assert (tasks[0]["description"], tasks[0]["done"]) == ("a", True)
+        assert (await client.json("PATCH", "/tasks/99", {"done": True}))[0] == 404
+        for tid in (1, 99):
+            assert await client.json("PATCH", "/tasks/{0}".format(tid), {}) == (
+                400,
+                {"error": "There are no fields to update."},
+            )
+
+    run_with_server(database_url, scenario)
+
+
+def test_tasks_are_streamed_as_json_lines(database_url):
+    async def scenario(client, controller, port):
+        await client.json("POST", "/check_lists", {"name": "home"})
+        await client.json("POST", "/check_lists", {"name": "work"})
+        for i in range(1200):
+            await controller.add_task(
+                Task("t{0}".format(i), check_list_id=1 + i % 2)
+            )
+        status, headers, data = await client.request("GET", "/tasks")
+        assert (status, headers["content-type"]) == (200, "application/x-ndjson")
+        lines = [json.loads(line) for line in data.decode().splitlines()]
+        assert [line["id"] for line in lines] == list(range(1, 1201))
+        assert lines[1] == {
+            "id": 2,
+            "check_list": "work",
+            "description": "t1",
+            "due_date": "",
+            "done": False,
+        }
+        status, _, data = await client.request("GET", "/tasks?check_list_id=2")
+        assert len(data.splitlines()) == 600
+        # The connection is still usable after the chunked response
+        assert (await client.json("GET", "/check_lists"))[0] == 200
+
+    run_with_server(database_url, scenario)
+
+
+def test_concurrent_posts_are_committed_in_groups(database_url):
+    async def scenario(client, controller, port):
+        await client.json("POST", "/check_lists", {"name": "home"})
+        groups = controller.groups
+
+        async def post(i):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            try:
+                return await Client(reader, writer).json(
+                    "POST",
+                    "/tasks",
+                    {"check_list_id": 1, "description": "t{0}".format(i)},
+                )
+            finally:
+                writer.close()
+
+        results = await asyncio.gather(*(post(i) for i in range(40)))
+        assert [status for status, _ in results] == [201] * 40
+        assert len({task["id"] for _, task in results}) == 40
+        assert controller.groups - groups < 40
+
+    run_with_server(database_url, scenario)
+
+
+def test_a_raising_write_gets_a_response(database_url):
+    async def scenario(client, controller, port):
+        await client.json("POST", "/check_lists", {"name": "home"})
+        result = await controller.add_task(
+            Task("wrong type", due_date=20200101, check_list_id=1)
+        )
+        assert result[0]
+        assert await client.json(
+            "POST", "/tasks", {"check_list_id": 1, "description": "ok"}
+        ) == (
+            201,
+            {
+                "id": 1,
+                "check_list_id": 1,
+                "description": "ok",
+                "due_date": "",
+                "done": False,
+            },
+        )
+
+    run_with_server(database_url, scenario)
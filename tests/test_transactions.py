@@ -0,0 +1,75 @@
+import pytest
+
+from src.check_list import CheckList
+from src.task import Task
+
+from tests.conftest import add_tasks
+
+
+class Abort(Exception):
+    pass
+
+
+def descriptions(task_controller, check_list_id=1):
+    return [task.description for task in task_controller.get_tasks(check_list_id)[2]]
+
+
+def test_transaction_commits_its_writes_together(controller):
+    with controller.transaction():
+        controller.add_task(Task("one", check_list_id=1))
+        controller.add_task(Task("two", check_list_id=1))
+    assert descriptions(controller) == ["one", "two"]
+
+
+def test_raising_rolls_back_the_transaction(controller):
+    with pytest.raises(Abort):
+        with controller.transaction():
+            controller.add_task(Task("one", check_list_id=1))
+            raise Abort()
+    assert descriptions(controller) == []
+    assert not controller._connection.in_transaction
+
+
+def test_nested_block_rolls_back_only_its_writes(controller):
+    with controller.transaction():
+        controller.add_task(Task("outer", check_list_id=1))
+        with pytest.raises(Abort):
+            with controller.transaction():
+                controller.add_task(Task("inner", check_list_id=1))
+                assert descriptions(controller) == ["outer", "inner"]
+                raise Abort()
+        controller.add_task(Task("after", check_list_id=1))
+    assert descriptions(controller) == ["outer", "after"]
+
+
+def test_outer_rollback_undoes_a_completed_nested_block(controller):
+    with pytest.raises(Abort):
+        with controller.transaction():
+            with controller.transaction():
+                controller.add_task(Task("inner", check_list_id=1))
+            raise Abort()
+    assert descriptions(controller) == []
+
+
+def test_unit_of_work_applies_all_or_nothing(controller):
+    task = add_tasks(controller, 1)[0]
+    unit = controller.unit_of_work()
+    check_list = CheckList("c", "")
+    unit.add_check_list(check_list)
+    new_task = Task("new")
+    unit.add_task(new_task, check_list)
+    task.description = "changed"
+    unit.update_task(task)
+    unit.add_task(Task("orphan", check_list_id=99))
+    assert unit.commit()[0]
+    assert (check_list.cid, new_task.tid) == (None, None)
+    assert "description" in task.dirty_fields
+    assert descriptions(controller) == ["task 0"]
+
+    unit.discard()
+    unit.add_check_list(check_list)
+    unit.add_task(new_task, check_list)
+    unit.update_task(task)
+    assert unit.commit() == (0, "")
+    assert descriptions(controller) == ["changed"]
+    assert descriptions(controller, check_list.cid) == ["new"]
@@ -0,0 +1,112 @@
+import io
+
+import pytest
+
+from src import transfer
+from src.task import Task
+
+from tests.conftest import add_tasks
+
+
+def rows(task_controller):
+    return [row[1:] for row in task_controller.iter_task_rows()]
+
+
+@pytest.mark.parametrize("format_", transfer.FORMATS)
+def test_export_and_import_round_trip(controller, tmp_path, format_):
+    add_tasks(controller, 3)
+    controller.add_task(
+        Task('quote " and, comma', due_date="2020-01-02", check_list_id=2)
+    )
+    controller.set_done([1], True)
+    exported = io.StringIO()
+    assert transfer.export_tasks(controller, exported, format_) == (0, "", 4)
+
+    exported.seek(0)
+    assert transfer.import_tasks(controller, exported, format_, chunk_size=3) == (
+        0,
+        "",
+        4,
+    )
+    assert rows(controller)[4:] == rows(controller)[:4]
+
+
+def test_multi_line_csv_field_across_a_chunk_boundary(controller):
+    text = (
+        "check_list,description,due_date,done\n"
+        "a,one,,0\n"
+        'a,"two\nlines\n\nand ""quotes""",2021-03-04,1\n'
+        "b,three,,yes\n"
+    )
+    err, message, count = transfer.import_tasks(
+        controller, io.StringIO(text), chunk_size=2
+    )
+    assert (err, count) == (0, 3), message
+    assert rows(controller) == [
+        ("a", "one", "", 0),
+        ("a", 'two\nlines\n\nand "quotes"', "2021-03-04", 1),
+        ("b", "three", "", 1),
+    ]
+
+
+@pytest.mark.parametrize("format_", transfer.FORMATS)
+def test_import_with_workers_keeps_the_input_order(controller, format_):
+    source = io.StringIO()
+    for i in range(50):
+        controller.add_task(Task("task {0}".format(i), check_list_id=1 + i % 2))
+    transfer.export_tasks(controller, source, format_)
+    source.seek(0)
+    err, message, count = transfer.import_tasks(
+        controller, source, format_, chunk_size=7, workers=2
+    )
+    assert (err, count) == (0, 50), message
+    assert rows(controller)[50:] == rows(controller)[:50]
+
+
+def test_unknown_check_lists_are_created(controller):
+    text = '{"check_list": "new", "description": "x"}\n'
+    assert transfer.import_tasks(controller, io.StringIO(text), transfer.JSONL) == (
+        0,
+        "",
+        1,
+    )
+    _, _, check_lists = controller.get_check_lists()
+    assert [check_list.name for check_list in check_lists] == ["a", "b", "new"]
+
+    text = '{"check_list": "other", "description": "x"}\n'
+    err, message, count = transfer.import_tasks(
+        controller, io.StringIO(text), transfer.JSONL, create_check_lists=False
+    )
+    assert (err, message, count) == (1, "Line 1: Unknown check list 'other'.", 0)
+
+
+@pytest.mark.parametrize("workers", (0, 2))
+def test_import_stops_at_the_first_invalid_record(controller, workers):
+    lines = ['{{"check_list": "a", "description": "t{0}"}}'.format(i) for i in range(6)]
+    lines[4] = '{"check_list": "a", "description": "bad", "done": "maybe"}'
+    lines.append("not json")
+    err, message, count = transfer.import_tasks(
+        controller,
+        io.StringIO("\n".join(lines) + "\n"),
+        transfer.JSONL,
+        chunk_size=2,
+        workers=workers,
+    )
+    assert (err, count) == (1, 4)
+    assert message == "Line 5: Invalid done value 'maybe'."
+    assert [row[1] for row in rows(controller)] == ["t0", "t1", "t2", "t3"]
+
+
+def test_csv_without_a_description_column_is_rejected(controller):
+    text = "check_list,name\na,b\n"
+    err, message, count = transfer.import_tasks(controller, io.StringIO(text))
+    assert (err, count) == (1, 0)
+    assert message == "Line 1: The CSV header has no description column."
+
+
+def test_export_of_one_check_list(controller):
+    add_tasks(controller, 2, check_list_id=1)
+    add_tasks(controller, 1, check_list_id=2)
+    out = io.StringIO()
+    assert transfer.export_tasks(controller, out, check_list_id=2) == (0, "", 1)
+    assert out.getvalue() == "check_list,description,due_date,done\nb,task 0,,0\n"
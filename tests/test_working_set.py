@@ -0,0 +1,113 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from src.check_list import CheckList
+from src.instrumentation import MemorySink
+from src.task_controller import TaskController
+from src.working_set import JOURNAL_SUFFIX
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Commits in memory mode and exits without persisting, as a crash would
+CRASHING_SESSION = """
+import os
+from src.check_list import CheckList
+from src.task import Task
+from src.task_controller import TaskController
+
+task_controller = TaskController()
+task_controller.create_connection({0!r}, in_memory=True, persist_interval=60)
+task_controller.add_check_list(CheckList("a", ""))
+kept, removed = Task("kept", check_list_id=1), Task("removed", check_list_id=1)
+task_controller.add_task(kept)
+task_controller.add_task(removed)
+task_controller.persist()
+kept.done = True
+task_controller.update_task(kept)
+task_controller.delete_tasks([removed.tid])
+os._exit(0)
+"""
+
+
+def crash(database_url: str) -> None:
+    subprocess.run(
+        [sys.executable, "-c", CRASHING_SESSION.format(database_url)],
+        cwd=ROOT,
+        check=True,
+    )
+
+
+def test_replay_recovers_the_commits_after_the_last_persist(database_url):
+    crash(database_url)
+    assert os.path.exists(database_url + JOURNAL_SUFFIX)
+
+    task_controller = TaskController()
+    task_controller.create_connection(database_url, in_memory=True)
+    try:
+        _, _, tasks = task_controller.get_tasks(1)
+        assert [(task.description, bool(task.done)) for task in tasks] == [
+            ("kept", True)
+        ]
+    finally:
+        task_controller.close_connection()
+    assert not os.path.exists(database_url + JOURNAL_SUFFIX)
+
+
+def test_replay_keeps_the_day_a_task_was_done(database_url):
+    crash(database_url)
+    journal = database_url + JOURNAL_SUFFIX
+    with open(journal) as file:
+        records = [json.loads(line) for line in file]
+    done_day = records[0][-1]
+    assert done_day is not None
+    records[0][-1] = done_day - 40
+    with open(journal, "w") as file:
+        file.write("".join(json.dumps(record) + "\n" for record in records))
+
+    task_controller = TaskController()
+    task_controller.create_connection(database_url, in_memory=True)
+    try:
+        row = task_controller._connection.execute(
+            "SELECT doneDay FROM Tasks WHERE description = 'kept'"
+        ).fetchone()
+        assert row == (done_day - 40,)
+        assert task_controller.archive_done(min_age=30)[2] == 1
+    finally:
+        task_controller.close_connection()
+
+
+def test_torn_last_record_ends_the_replay(database_url):
+    crash(database_url)
+    with open(database_url + JOURNAL_SUFFIX, "a") as file:
+        file.write('["task", 99, "", "torn"')
+
+    task_controller = TaskController()
+    task_controller.create_connection(database_url, in_memory=True)
+    try:
+        assert [task.description for task in task_controller.get_tasks(1)[2]] == [
+            "kept"
+        ]
+    finally:
+        task_controller.close_connection()
+
+
+def test_closing_while_a_persist_waits_is_not_an_error(database_url):
+    task_controller = TaskController()
+    task_controller.create_connection(
+        database_url, in_memory=True, persist_interval=0.01
+    )
+    sink = MemorySink()
+    task_controller.enable_instrumentation(sinks=[sink])
+    with task_controller._lock:
+        task_controller.add_check_list(CheckList("a", ""))
+        # The persist thread wakes up and waits for the lock
+        time.sleep(0.1)
+        task_controller.close_connection()
+    for thread in threading.enumerate():
+        if thread.name == "TasksPersist":
+            thread.join(5)
+    assert [event for event in sink.events if event["event"] == "error"] == []
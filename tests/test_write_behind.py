@@ -0,0 +1,44 @@
+import sqlite3
+
+from tests.conftest import add_tasks
+
+
+def done_flags(database_url):
+    connection = sqlite3.connect(database_url)
+    try:
+        return [row[0] for row in connection.execute("SELECT done FROM Tasks")]
+    finally:
+        connection.close()
+
+
+def test_queued_updates_of_a_task_are_collapsed(controller, database_url):
+    task = add_tasks(controller, 1)[0]
+    controller.enable_write_behind()
+    task.done = True
+    controller.queue_update_task(task)
+    task.description = "changed"
+    controller.queue_update_task(task)
+    assert done_flags(database_url) == [0]
+    assert controller.flush() == (0, "")
+    assert done_flags(database_url) == [1]
+    assert controller.get_tasks(1)[2][0].description == "changed"
+
+
+def test_failed_flush_keeps_the_updates_queued(controller, database_url):
+    tasks = add_tasks(controller, 2)
+    controller.enable_write_behind()
+    for task in tasks:
+        task.done = True
+        controller.queue_update_task(task)
+    other = sqlite3.connect(database_url, timeout=0.2)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        err, message = controller.flush()
+        assert err
+        assert "locked" in message
+    finally:
+        other.rollback()
+        other.close()
+    assert controller.flush() == (0, "")
+    assert done_flags(database_url) == [1, 1]
+    assert controller.flush() == (0, "")